@@ -3,6 +3,7 @@ LstGen generates php, python, go, or java code from PAP XML
 """
 import re
 import ast
+import hashlib
 from lxml import etree
 
 # matches java-like long or double numbers, e.g.
@@ -39,11 +40,12 @@ def parse_eval_stmt(source):
 
 def parse_condition_stmt(source):
     """ Parse java-like code in expr attribute
-        of an IF tag.
+        of an IF tag. compareTo() comparisons are
+        rewritten to DecimalCompare nodes.
     """
     source = prepare_expr(source)
     tree = ast.parse(source)
-    return tree.body[0].value
+    return rewrite_comparisons(tree.body[0].value)
 
 def prev_comment(element):
     """ Return previous comment for an element """
@@ -275,7 +277,7 @@ class PapParser(object):
     @property
     def methods(self):
         """ Accessor for methods """
-        if not self._methods:
+        if self._methods is None:
             self._methods = []
             for method in self.tree_root.xpath('/PAP/METHODS/METHOD'):
                 self._methods.append(Method.from_element(method))
@@ -288,28 +290,28 @@ class PapParser(object):
     @property
     def input_vars(self):
         """ Accessor for input variables """
-        if not self._input_vars:
+        if self._input_vars is None:
             self._input_vars = list(self._get_vars('/PAP/VARIABLES/INPUTS/INPUT'))
         return self._input_vars
 
     @property
     def output_vars(self):
         """ Accessor for output variables """
-        if not self._output_vars:
+        if self._output_vars is None:
             self._output_vars = list(self._get_vars('/PAP/VARIABLES/OUTPUTS/OUTPUT'))
         return self._output_vars
 
     @property
     def internal_vars(self):
         """ Accessor for internal variables """
-        if not self._internal_vars:
+        if self._internal_vars is None:
             self._internal_vars = list(self._get_vars('/PAP/VARIABLES/INTERNALS/INTERNAL'))
         return self._internal_vars
 
     @property
     def constants(self):
         """ Accessor for constants variables """
-        if not self._constants:
+        if self._constants is None:
             self._constants = [
                 Const.from_element(const)
                 for const in self.tree_root.xpath('/PAP/CONSTANTS/CONSTANT')
@@ -320,3 +322,34 @@ class PapParser(object):
     def constant_names(self):
         """ Accessor for a set of constant names """
         return set(const.name for const in self.constants)
+
+    @property
+    def xml_hash(self):
+        """ SHA-256 hex digest of the canonicalized PAP XML, identifies
+            the PAP version e.g. in caches
+        """
+        return hashlib.sha256(etree.tostring(self.tree_root, method='c14n')).hexdigest()
+
+
+from .passes.compare import rewrite_comparisons
+
+LAZY_EXPORTS = {
+    'load_calculator': 'loader',
+    'AdaptiveCalculator': 'adaptive',
+    'CachedCalculator': 'resultcache',
+    'GrossSolver': 'solver',
+    'solve_gross': 'solver',
+}
+""" Names of the runtime helpers and their submodules, imported on first
+    access only (module __getattr__, python 3.7+) so that code generation
+    does not load them
+"""
+
+
+def __getattr__(name):
+    if name not in LAZY_EXPORTS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    import importlib
+    value = getattr(importlib.import_module('.' + LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,87 @@
+# coding: utf-8
+"""
+Calculators specializing themselves for frequent input combinations
+
+Payrolls mostly use a few combinations of the categorical inputs (tax
+class, payroll period, insurance flags). AdaptiveCalculator counts the
+combinations it is called with and loads a calculator specialized for
+a combination (see lstgen.passes.specialize) once it was seen often
+enough. The specialized calculators are kept in a bounded LRU.
+"""
+import inspect
+from collections import OrderedDict
+
+from .loader import load_calculator
+
+DEFAULT_KEYS = ('STKL', 'LZZ', 'KRV', 'PKV', 'R', 'af')
+""" Categorical inputs specialized on by default (the ones the PAP declares) """
+
+
+class AdaptiveCalculator(object):
+    """ Calculate with the generic compute() function of a PAP (see
+        load_calculator(), mode='function') until a combination of the
+        key inputs was seen threshold times, then with a function
+        specialized for it. At most max_variants specialized functions
+        are kept, the least recently used is dropped first.
+
+        Instances are not thread-safe.
+    """
+
+    def __init__(self, source, keys=DEFAULT_KEYS, threshold=100, max_variants=16, **options):
+        if options.get('mode', 'function') != 'function':
+            raise ValueError("Adaptive calculators require mode='function'")
+        options['mode'] = 'function'
+        options.pop('specialize', None)
+        self.source = source
+        self.options = options
+        self.threshold = threshold
+        self.max_variants = max_variants
+        self.generic = load_calculator(source, **options)
+        params = inspect.signature(self.generic).parameters
+        self.keys = tuple(name for name in keys if name in params)
+        self._fixed = frozenset(self.keys)
+        self.counts = {}
+        """ Number of generic calculations by combination """
+        self.variants = OrderedDict()
+        """ Specialized functions by combination, least recently used first """
+        self.hits = 0
+        self.misses = 0
+
+    def _specialized(self, key):
+        """ Load the function for a combination, the generic one if
+            the values cannot be specialized on
+        """
+        try:
+            return load_calculator(
+                self.source, specialize=list(zip(self.keys, key)), **self.options
+            )
+        except ValueError:
+            return self.generic
+
+    def _call(self, func, inputs):
+        if func is self.generic:
+            return func(**inputs)
+        fixed = self._fixed
+        return func(**{name: value for (name, value) in inputs.items() if name not in fixed})
+
+    def __call__(self, **inputs):
+        key = tuple([inputs.get(name) for name in self.keys])
+        if None in key:
+            # unset inputs use their defaults, the generic function knows them
+            self.misses += 1
+            return self.generic(**inputs)
+        func = self.variants.get(key)
+        if func is not None:
+            self.variants.move_to_end(key)
+            self.hits += 1
+            return self._call(func, inputs)
+        self.misses += 1
+        count = self.counts.get(key, 0) + 1
+        if count < self.threshold:
+            self.counts[key] = count
+            return self.generic(**inputs)
+        self.counts.pop(key, None)
+        func = self.variants[key] = self._specialized(key)
+        if len(self.variants) > self.max_variants:
+            self.variants.popitem(last=False)
+        return self._call(func, inputs)
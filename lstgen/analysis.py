@@ -0,0 +1,291 @@
+# coding: utf-8
+"""
+Static analysis of parsed PAP methods
+"""
+import ast
+
+from . import (
+    prepare_expr,
+    parse_condition_stmt,
+    parse_eval_stmt,
+    remove_size_literal,
+    EvalStmt,
+    IfStmt,
+    ThenStmt,
+    ElseStmt,
+    ExecuteStmt,
+)
+
+
+INT = 'int'
+DOUBLE = 'double'
+DECIMAL = 'BigDecimal'
+BOOLEAN = 'boolean'
+""" Types of PAP expressions, arrays are the element type followed by [] """
+
+METHOD_TYPES = {
+    'add': DECIMAL,
+    'subtract': DECIMAL,
+    'multiply': DECIMAL,
+    'divide': DECIMAL,
+    'setScale': DECIMAL,
+    'valueOf': DECIMAL,
+    'abs': DECIMAL,
+    'negate': DECIMAL,
+    'longValue': INT,
+    'intValue': INT,
+    'compareTo': INT,
+    'signum': INT,
+    'doubleValue': DOUBLE,
+}
+""" Return types of BigDecimal methods """
+
+DECLARED_TYPES = {
+    'long': INT,
+}
+""" Declared types mapped to the inferred type of their values """
+
+
+def node_names(node):
+    """ Return the set of identifiers used in an AST node """
+    return set(sub.id for sub in ast.walk(node) if isinstance(sub, ast.Name))
+
+
+def expr_names(source):
+    """ Return the set of identifiers used in a java-like expression """
+    return node_names(ast.parse(prepare_expr(remove_size_literal(source))))
+
+
+def stmt_names(stmt):
+    """ Return the (reads, writes) name sets of a single EVAL or IF statement """
+    if isinstance(stmt, EvalStmt):
+        (target, value) = parse_eval_stmt(remove_size_literal(stmt.expr))
+        return (node_names(value), set([target]))
+    if isinstance(stmt, IfStmt):
+        return (expr_names(stmt.condition), set())
+    return (set(), set())
+
+
+def executed_methods(stmt):
+    """ Yield the names of the methods EXECUTEd in a statement body,
+        once per call site
+    """
+    for part in stmt.body:
+        if isinstance(part, ExecuteStmt):
+            yield part.method_name
+        elif isinstance(part, (IfStmt, ThenStmt, ElseStmt)):
+            for name in executed_methods(part):
+                yield name
+
+
+class TypeInference(object):
+    """ Infers the types of PAP expressions from the declarations of
+        variables and constants and the signatures of BigDecimal methods
+    """
+
+    def __init__(self, parser):
+        self.var_types = {}
+        for prop in parser.input_vars + parser.output_vars + parser.internal_vars + \
+                parser.constants:
+            self.var_types[prop.name] = DECLARED_TYPES.get(prop.type, prop.type)
+
+    def type_of(self, node):
+        """ Return the type of an AST node, or None if it is unknown """
+        if isinstance(node, ast.Num):
+            if isinstance(node.n, bool):
+                return BOOLEAN
+            return INT if isinstance(node.n, int) else DOUBLE
+        if isinstance(node, ast.Name):
+            return self.var_types.get(node.id)
+        if isinstance(node, ast.Attribute):
+            if isinstance(node.value, ast.Name) and node.value.id == 'BigDecimal':
+                if node.attr.startswith('ROUND_'):
+                    return INT
+                return DECIMAL
+            return None
+        if isinstance(node, ast.Subscript):
+            array = self.type_of(node.value)
+            if array is not None and array.endswith('[]'):
+                return array[:-2]
+            return None
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name):
+                return DECIMAL if node.func.id == 'BigDecimalConstructor' else None
+            return METHOD_TYPES.get(node.func.attr)
+        if isinstance(node, ast.UnaryOp):
+            return self.type_of(node.operand)
+        if isinstance(node, ast.BinOp):
+            types = set([self.type_of(node.left), self.type_of(node.right)])
+            if types == set([INT]):
+                # java's integer division truncates, the result is an int too
+                return INT
+            if types <= set([INT, DOUBLE]):
+                return DOUBLE
+            return None
+        if isinstance(node, (ast.Compare, ast.BoolOp)):
+            return BOOLEAN
+        return None
+
+    def is_integral(self, node):
+        """ True if a node provably evaluates to an integer """
+        return self.type_of(node) == INT
+
+    def annotate(self, node):
+        """ Store the type of each node of a tree in its pap_type attribute """
+        for sub in ast.walk(node):
+            sub.pap_type = self.type_of(sub)
+        return node
+
+    def condition(self, source):
+        """ Parse and annotate the condition of an IF statement """
+        return self.annotate(parse_condition_stmt(remove_size_literal(source)))
+
+    def eval_stmt(self, source):
+        """ Parse an EVAL statement and return (target, annotated value) """
+        (target, node) = parse_eval_stmt(remove_size_literal(source))
+        return (target, self.annotate(node))
+
+
+class MethodEffects(object):
+    """ Variables read and written by each method of a PAP, including
+        the effects of the methods it EXECUTEs
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.var_names = set(
+            var.name for var in parser.input_vars + parser.output_vars + parser.internal_vars
+        )
+        self.methods = dict((method.name, method) for method in parser.methods)
+        self.methods[parser.main_method.name] = parser.main_method
+        self.reads = {}
+        self.writes = {}
+        self.calls = {}
+        for (name, method) in self.methods.items():
+            (reads, writes, calls) = self._direct(method)
+            self.reads[name] = reads
+            self.writes[name] = writes
+            self.calls[name] = calls
+        # propagate the effects of called methods until nothing changes
+        changed = True
+        while changed:
+            changed = False
+            for name in self.methods:
+                for callee in self.calls[name]:
+                    if not (self.reads[callee] <= self.reads[name] and
+                            self.writes[callee] <= self.writes[name]):
+                        self.reads[name] |= self.reads[callee]
+                        self.writes[name] |= self.writes[callee]
+                        changed = True
+
+    def _direct(self, stmt):
+        reads = set()
+        writes = set()
+        calls = set()
+        for part in stmt.body:
+            if isinstance(part, ExecuteStmt):
+                calls.add(part.method_name)
+            elif isinstance(part, (EvalStmt, IfStmt)):
+                (stmt_reads, stmt_writes) = stmt_names(part)
+                reads |= stmt_reads & self.var_names
+                writes |= stmt_writes & self.var_names
+            if isinstance(part, (IfStmt, ThenStmt, ElseStmt)):
+                (sub_reads, sub_writes, sub_calls) = self._direct(part)
+                reads |= sub_reads
+                writes |= sub_writes
+                calls |= sub_calls
+        return (reads, writes, calls)
+
+    def body_effects(self, stmt):
+        """ (reads, writes) of the body of a statement, including the
+            effects of the methods it EXECUTEs
+        """
+        (reads, writes, calls) = self._direct(stmt)
+        for callee in calls:
+            reads |= self.reads[callee]
+            writes |= self.writes[callee]
+        return (reads, writes)
+
+    def is_recursive(self, name):
+        """ True if a method (indirectly) executes itself """
+        seen = set()
+        todo = list(self.calls[name])
+        while todo:
+            callee = todo.pop()
+            if callee == name:
+                return True
+            if callee not in seen:
+                seen.add(callee)
+                todo.extend(self.calls[callee])
+        return False
+
+    def reachable(self):
+        """ Names of the methods (indirectly) executed by MAIN """
+        seen = set()
+        todo = list(self.calls[self.parser.main_method.name])
+        while todo:
+            callee = todo.pop()
+            if callee not in seen and callee in self.calls:
+                seen.add(callee)
+                todo.extend(self.calls[callee])
+        return seen
+
+    def call_sites(self):
+        """ Return a dict of method names and the number of places
+            executing them
+        """
+        sites = {}
+        for method in self.methods.values():
+            for callee in executed_methods(method):
+                sites[callee] = sites.get(callee, 0) + 1
+        return sites
+
+
+class DefiniteAssignment(object):
+    """ Finds the internal variables MAIN always assigns before it reads
+        them, their default values are never used. EXECUTEs are followed
+        into the executed methods.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.effects = MethodEffects(parser)
+        self.read_first = set()
+        self._stack = []
+        self._body(parser.main_method.body, set())
+
+    def _read(self, names, assigned):
+        self.read_first |= names - assigned
+
+    def _body(self, body, assigned):
+        """ Return the variables definitely assigned after a body """
+        for part in body:
+            if isinstance(part, EvalStmt):
+                (reads, writes) = stmt_names(part)
+                self._read(reads, assigned)
+                assigned = assigned | writes
+            elif isinstance(part, IfStmt):
+                self._read(stmt_names(part)[0], assigned)
+                branches = [
+                    self._body(branch.body, assigned) for branch in part.body
+                    if isinstance(branch, (ThenStmt, ElseStmt))
+                ]
+                if not any(isinstance(branch, ElseStmt) for branch in part.body):
+                    branches.append(assigned)
+                assigned = set.intersection(*branches)
+            elif isinstance(part, ExecuteStmt):
+                name = part.method_name
+                if name in self._stack:
+                    # recursion, nothing more is assigned for sure
+                    self._read(self.effects.reads[name], assigned)
+                    continue
+                self._stack.append(name)
+                assigned = self._body(self.effects.methods[name].body, assigned)
+                self._stack.pop()
+        return assigned
+
+    def assigned_before_read(self):
+        """ Names of the internal variables that need no default value """
+        return set(
+            var.name for var in self.parser.internal_vars if var.name not in self.read_first
+        )
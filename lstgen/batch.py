@@ -0,0 +1,285 @@
+# coding: utf-8
+"""
+Batch calculations of CSV and .npy files
+
+The rows of the input file are read lazily and calculated in chunks by
+a pool of worker processes, each of which loads the calculator once
+(see lstgen.load_calculator(), mode='function'). Only a bounded number
+of chunks is in flight, so memory use does not grow with the size of
+the input, and the results are written in input order.
+
+Columns named like the inputs of the PAP are converted to their
+declared types, empty values use the defaults of the PAP. All other
+columns (e.g. a personnel number) are copied to the output, followed
+by the outputs of the PAP.
+
+Structured numpy arrays in .npy files (see input_dtype()) are
+calculated with the python-numpy calculator instead. The files are
+memory-mapped, the workers receive row ranges only and read their
+inputs and write their outputs in place without copying or pickling.
+"""
+import sys
+import csv
+import multiprocessing
+from collections import deque
+
+from lxml import etree
+
+from . import PapParser
+from .loader import load_calculator
+from .resultcache import CachedCalculator, DEFAULT_CACHE_SIZE
+
+INPUT_TYPES = {
+    'int': int,
+    'double': float,
+    'BigDecimal': str,
+}
+""" Conversion of CSV values by declared input type, BigDecimal inputs
+    are passed as strings to keep all decimal places
+"""
+
+NPY_INPUT_TYPES = {
+    'int': '<i8',
+    'double': '<f8',
+    'BigDecimal': '<f8',
+}
+""" .npy column types by declared input type, decimal inputs must not
+    have more decimal places than the calculator uses for them
+"""
+
+SCALE_TITLE = '{}/10**{}'
+""" Title of an output column of a .npy file, e.g. "VKVLZZ/10**2" for
+    int64 values of VKVLZZ scaled by 10**2 (titles have to be unique)
+"""
+
+_worker = None
+""" Calculator of a worker process """
+
+
+class BatchCalculator(object):
+    """ Calculates rows of input values with a calculator function """
+
+    def __init__(self, xml_content, columns, result_cache=None,
+                 result_cache_size=DEFAULT_CACHE_SIZE, **options):
+        parser = PapParser(etree.fromstring(xml_content))
+        types = dict((var.name, INPUT_TYPES[var.type]) for var in parser.input_vars)
+        self.inputs = [(idx, name, types[name]) for (idx, name) in enumerate(columns)
+                       if name in types]
+        self.passthrough = [idx for (idx, name) in enumerate(columns) if name not in types]
+        self.output_names = [var.name for var in parser.output_vars]
+        options['mode'] = 'function'
+        if result_cache:
+            self.compute = CachedCalculator(
+                xml_content, result_cache, size=result_cache_size, **options
+            )
+        else:
+            self.compute = load_calculator(xml_content, **options)
+
+    def header(self, columns):
+        """ Column names of the output """
+        return [columns[idx] for idx in self.passthrough] + self.output_names
+
+    def calculate(self, rows):
+        """ Return the result values of a list of rows, as strings """
+        compute = self.compute
+        ret = []
+        for row in rows:
+            inputs = {}
+            for (idx, name, convert) in self.inputs:
+                if row[idx] != '':
+                    inputs[name] = convert(row[idx])
+            ret.append([str(value) for value in compute(**inputs)])
+        return ret
+
+
+def _init_worker(xml_content, columns, options):
+    global _worker
+    _worker = BatchCalculator(xml_content, columns, **options)
+
+
+def _calculate_chunk(rows):
+    return _worker.calculate(rows)
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(xml_content, infile, outfile, processes=None, chunk_size=1000, **options):
+    """ Calculate all rows of a CSV file object and write the results
+        to another one. processes=1 calculates in the current process,
+        None uses one process per CPU. result_cache is the path of a
+        ResultCache file shared by the processes (see lstgen.resultcache)
+        with result_cache_size slots. The remaining options are passed
+        to load_calculator(). Returns the number of rows.
+    """
+    reader = csv.reader(infile)
+    writer = csv.writer(outfile, lineterminator='\n')
+    columns = next(reader, None)
+    if columns is None:
+        return 0
+    # generates the code once, the workers load it from the cache
+    calculator = BatchCalculator(xml_content, columns, **options)
+    writer.writerow(calculator.header(columns))
+    passthrough = calculator.passthrough
+    count = 0
+
+    def write(chunk, results):
+        for (row, result) in zip(chunk, results):
+            writer.writerow([row[idx] for idx in passthrough] + result)
+        return len(chunk)
+
+    if processes == 1:
+        for chunk in _chunks(reader, chunk_size):
+            count += write(chunk, calculator.calculate(chunk))
+        return count
+
+    pool = multiprocessing.Pool(
+        processes, initializer=_init_worker, initargs=(xml_content, columns, options)
+    )
+    try:
+        max_pending = 2 * (processes or multiprocessing.cpu_count())
+        pending = deque()
+        for chunk in _chunks(reader, chunk_size):
+            pending.append((chunk, pool.apply_async(_calculate_chunk, (chunk,))))
+            if len(pending) >= max_pending:
+                (done, result) = pending.popleft()
+                count += write(done, result.get())
+        while pending:
+            (done, result) = pending.popleft()
+            count += write(done, result.get())
+    finally:
+        pool.terminate()
+        pool.join()
+    return count
+
+
+def input_dtype(xml_content):
+    """ numpy dtype of the input columns of a PAP, further columns
+        of an input array are copied to the output
+    """
+    import numpy as np
+    parser = PapParser(etree.fromstring(xml_content))
+    return np.dtype([(var.name, NPY_INPUT_TYPES[var.type]) for var in parser.input_vars])
+
+
+def input_array(xml_content, size, passthrough=()):
+    """ Structured array of size rows with the passthrough columns, a
+        list of (name, dtype) pairs, followed by the input columns (see
+        input_dtype()). Inputs are set to their defaults in the PAP,
+        inputs without a default to zero.
+    """
+    import numpy as np
+    from .engine import ClosureCompiler
+    compiler = ClosureCompiler(PapParser(etree.fromstring(xml_content)))
+    dtype = np.dtype(list(passthrough) + input_dtype(xml_content).descr)
+    ret = np.zeros(size, dtype)
+    for (var, value) in zip(compiler.variables, compiler.defaults()):
+        if var.name in dtype.names and value is not None:
+            ret[var.name] = float(value) if dtype[var.name].kind == 'f' else int(value)
+    return ret
+
+
+def output_scales(dtype):
+    """ Decimal places of the outputs of an output array by name """
+    ret = {}
+    for (name, field) in dtype.fields.items():
+        title = field[2] if len(field) > 2 else None
+        if title and title.startswith(SCALE_TITLE.format(name, '')):
+            ret[name] = int(title[len(SCALE_TITLE.format(name, '')):])
+    return ret
+
+
+class ColumnCalculator(object):
+    """ Calculates row ranges of memory-mapped .npy files """
+
+    def __init__(self, xml_content, input_path, output_path, **options):
+        import numpy as np
+        cls = load_calculator(xml_content, lang='python-numpy', **options)
+        self.compute = sys.modules[cls.__module__].compute
+        self.scales = cls.OUTPUT_SCALES
+        parser = PapParser(etree.fromstring(xml_content))
+        self.inputs = np.load(input_path, mmap_mode='r')
+        names = set(var.name for var in parser.input_vars)
+        self.input_names = [name for name in self.inputs.dtype.names if name in names]
+        self.passthrough = [name for name in self.inputs.dtype.names if name not in names]
+        self.output_names = [var.name for var in parser.output_vars]
+        self.output_path = output_path
+        self.outputs = None
+
+    def output_dtype(self):
+        """ Passthrough columns followed by the int64 output columns """
+        import numpy as np
+        return np.dtype(
+            [(name, self.inputs.dtype[name]) for name in self.passthrough] +
+            [((SCALE_TITLE.format(name, self.scales[name]), name), '<i8')
+             for name in self.output_names]
+        )
+
+    def open_outputs(self, mode='r+'):
+        """ Memory-map the output file, mode 'w+' creates it """
+        from numpy.lib.format import open_memmap
+        if mode == 'w+':
+            return open_memmap(self.output_path, mode=mode, dtype=self.output_dtype(),
+                               shape=(len(self.inputs),))
+        return open_memmap(self.output_path, mode=mode)
+
+    def calculate(self, start, stop):
+        """ Calculate the rows start to stop and write them to the output """
+        if self.outputs is None:
+            self.outputs = self.open_outputs()
+        inputs = self.inputs[start:stop]
+        outputs = self.outputs[start:stop]
+        result = self.compute(**dict((name, inputs[name]) for name in self.input_names))
+        for name in self.passthrough:
+            outputs[name] = inputs[name]
+        for (name, value) in zip(self.output_names, result):
+            outputs[name] = value
+        self.outputs.flush()
+        return stop - start
+
+
+def _init_column_worker(xml_content, input_path, output_path, options):
+    global _worker
+    _worker = ColumnCalculator(xml_content, input_path, output_path, **options)
+
+
+def _calculate_range(bounds):
+    return _worker.calculate(*bounds)
+
+
+def run_columns(xml_content, input_path, output_path, processes=None, chunk_size=100000,
+                **options):
+    """ Calculate a .npy file of a structured array with input columns
+        (see input_dtype() and input_array()) and write the outputs to
+        another .npy file, decimal outputs are int64 scaled by
+        10**output_scales()[name]. Inputs missing from the array use
+        their defaults in the PAP.
+        The remaining options are passed to load_calculator(). Returns
+        the number of rows.
+    """
+    calculator = ColumnCalculator(xml_content, input_path, output_path, **options)
+    size = len(calculator.inputs)
+    outputs = calculator.open_outputs('w+')
+    outputs.flush()
+    del outputs
+    bounds = [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+    if processes == 1:
+        return sum(calculator.calculate(*bound) for bound in bounds)
+    pool = multiprocessing.Pool(
+        processes, initializer=_init_column_worker,
+        initargs=(xml_content, input_path, output_path, options)
+    )
+    try:
+        # the rows are written in place, the order of completion does not matter
+        return sum(pool.imap_unordered(_calculate_range, bounds))
+    finally:
+        pool.terminate()
+        pool.join()
@@ -13,6 +13,10 @@ from lxml import etree
 from . import PapParser
 from . import pap
 from .generators import GENERATORS
+from .passes import optimize, OPTIMIZE_LEVELS
+from .passes.specialize import specialize, parse_values
+from .passes.slicing import slice_outputs
+from .passes.profile import number_branches, load_profile, apply_profile
 
 LANGUAGES = sorted(GENERATORS.keys())
 
@@ -26,21 +30,8 @@ def error(msg):
 def get_version():
     return pkg_resources.get_distribution('lstgen').version
 
-def main():
-    """ main lstgen function """
-    parser = argparse.ArgumentParser(
-        description='Erzeugt validen Code für die Lohnsteuerberechung aus PAP XML'
-    )
-    parser.add_argument(
-        '-V', '--version',
-        action='version',
-        version='LstGen Version {}'.format(get_version()))
-    parser.add_argument(
-        '-l', '--lang',
-        dest='lang',
-        choices=LANGUAGES,
-        metavar='LANG',
-        help='Programmiersprache ({})'.format(', '.join(LANGUAGES)))
+def add_pap_arguments(parser):
+    """ Add the options selecting the PAP """
     parser.add_argument(
         '-p', '--pap-version',
         dest='pap_version',
@@ -55,6 +46,142 @@ def main():
         metavar='XML_PATH',
         help='Pfad zur PAP XML, falls keine PAP Version ausgewählt wurde.'
     )
+
+def read_pap_xml(args):
+    """ Return the XML of the PAP selected by -p or -x """
+    if (not args.pap_version and not args.pap_xml_path) or (args.pap_version and args.pap_xml_path):
+        error("Bitte entweder eine PAP Version (-p) oder Pfad zu einer PAP XML Datei angeben (-x).")
+
+    xml_content = None
+    if args.pap_xml_path:
+        if not os.path.isfile(args.pap_xml_path):
+            error("Kann Datei nicht öffnen: '{}'".format(args.pap_xml_path))
+        else:
+            xml_content = open(args.pap_xml_path, 'r').read()
+
+    if args.pap_version:
+        try:
+            xml_content = pap.get_pap_xml(args.pap_version)
+        except ValueError as err:
+            error(err)
+    return xml_content
+
+def run(argv):
+    """ lstgen run: calculate the rows of a CSV file """
+    # imported here, code generation does not need multiprocessing and the loader
+    from .batch import run_batch, run_columns
+    from .resultcache import DEFAULT_CACHE_SIZE
+    parser = argparse.ArgumentParser(
+        prog='lstgen run',
+        description=('Berechnet alle Zeilen einer CSV Datei, die Spalten werden den '
+                     'Eingabevariablen des PAP zugeordnet, weitere Spalten werden übernommen. '
+                     'Dateien mit der Endung .npy (strukturierte numpy Arrays) werden mit '
+                     'python-numpy berechnet.')
+    )
+    add_pap_arguments(parser)
+    parser.add_argument(
+        '--input',
+        dest='input',
+        metavar='CSV',
+        help='Eingabedatei (CSV mit Kopfzeile oder .npy), default: STDIN'
+    )
+    parser.add_argument(
+        '--output',
+        dest='output',
+        metavar='CSV',
+        help='Ausgabedatei (CSV oder .npy), default: STDOUT'
+    )
+    parser.add_argument(
+        '--processes',
+        dest='processes',
+        type=int,
+        default=None,
+        help='Anzahl der Prozesse, 1 rechnet im aktuellen Prozess, default: Anzahl der CPUs'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        dest='chunk_size',
+        type=int,
+        default=None,
+        help=('Anzahl der Zeilen, die ein Prozess auf einmal berechnet, default: 1000 '
+              '(CSV) bzw. 100000 (.npy)')
+    )
+    parser.add_argument(
+        '--numeric',
+        dest='numeric',
+        choices=('decimal', 'fixed'),
+        default='decimal',
+        help=("Zahlendarstellung des Rechners für CSV Dateien (siehe lstgen --numeric), "
+              "default: decimal"),
+    )
+    parser.add_argument(
+        '-O', '--optimize',
+        dest='optimize',
+        type=int,
+        choices=OPTIMIZE_LEVELS,
+        default=0,
+        help='Optimierungsstufe des Rechners (siehe lstgen -O), default: 0',
+    )
+    parser.add_argument(
+        '--result-cache',
+        dest='result_cache',
+        metavar='DATEI',
+        help=("Ergebnisse in einer von allen Prozessen und späteren Läufen gemeinsam "
+              "genutzten Datei zwischenspeichern (nur CSV, siehe lstgen.resultcache)"),
+    )
+    parser.add_argument(
+        '--result-cache-size',
+        dest='result_cache_size',
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help=("Maximale Anzahl der Einträge der --result-cache Datei, ältere Ergebnisse "
+              "werden verdrängt, default: {}".format(DEFAULT_CACHE_SIZE)),
+    )
+    args = parser.parse_args(argv)
+    if any(value is not None and value < 1 for value in (
+            args.processes, args.chunk_size, args.result_cache_size)):
+        error("--processes, --chunk-size und --result-cache-size müssen größer als 0 sein.")
+    xml_content = read_pap_xml(args)
+    options = dict(processes=args.processes, optimize=args.optimize)
+    if args.chunk_size:
+        options['chunk_size'] = args.chunk_size
+    if args.input and args.input.endswith('.npy'):
+        if not args.output or not args.output.endswith('.npy'):
+            error("Die Ausgabedatei einer .npy Eingabedatei muss eine .npy Datei sein.")
+        if args.result_cache:
+            error("--result-cache wird für .npy Dateien nicht unterstützt.")
+        try:
+            run_columns(xml_content, args.input, args.output, **options)
+        except ImportError:
+            error("Für .npy Dateien wird numpy benötigt (pip install lstgen[numpy]).")
+        return
+    infile = open(args.input, 'r', newline='') if args.input else sys.stdin
+    outfile = open(args.output, 'w', newline='') if args.output else sys.stdout
+    with infile, outfile:
+        run_batch(xml_content, infile, outfile, numeric=args.numeric,
+                  result_cache=args.result_cache, result_cache_size=args.result_cache_size,
+                  **options)
+
+def main():
+    """ main lstgen function """
+    if sys.argv[1:2] == ['run']:
+        run(sys.argv[2:])
+        return
+    parser = argparse.ArgumentParser(
+        description='Erzeugt validen Code für die Lohnsteuerberechung aus PAP XML',
+        epilog="Berechnungen von CSV Dateien: 'lstgen run --help'"
+    )
+    parser.add_argument(
+        '-V', '--version',
+        action='version',
+        version='LstGen Version {}'.format(get_version()))
+    parser.add_argument(
+        '-l', '--lang',
+        dest='lang',
+        choices=LANGUAGES,
+        metavar='LANG',
+        help='Programmiersprache ({})'.format(', '.join(LANGUAGES)))
+    add_pap_arguments(parser)
     parser.add_argument(
         '--pap-versions',
         dest='show_pap_versions',
@@ -98,6 +225,83 @@ def main():
         metavar='PHP_NAMESPACE',
         help="Namespace-Name (falls LANG=php)",
     )
+    parser.add_argument(
+        '--python-runtime',
+        dest='python_runtime',
+        choices=('inline', 'import'),
+        default='inline',
+        help=("Laufzeitumgebung (falls LANG=python oder python-numpy): 'inline' kopiert sie in den "
+              "generierten Code, 'import' importiert sie aus lstgen.runtime, default: inline"),
+    )
+    parser.add_argument(
+        '--python-mode',
+        dest='python_mode',
+        choices=('class', 'function'),
+        default='class',
+        help=("Art des generierten Codes (falls LANG=python): 'class' erzeugt eine Klasse, "
+              "'function' eine zustandslose Funktion compute(), default: class"),
+    )
+    parser.add_argument(
+        '--numeric',
+        dest='numeric',
+        choices=('decimal', 'fixed'),
+        default='decimal',
+        help=("Zahlendarstellung (falls LANG=python): 'decimal' verwendet BigDecimal, 'fixed' "
+              "skalierte Ganzzahlen mit fester Anzahl Nachkommastellen, default: decimal"),
+    )
+    parser.add_argument(
+        '-O', '--optimize',
+        dest='optimize',
+        type=int,
+        choices=OPTIMIZE_LEVELS,
+        default=0,
+        help=("Optimierungsstufe (alle Sprachen): 0 keine, 1 berechnet konstante Ausdrücke vorab "
+              "und lagert sie in Konstanten aus, 2 fügt zusätzlich kleine oder nur einmal "
+              "aufgerufene Methoden ein, 3 speichert zusätzlich mehrfach berechnete Ausdrücke "
+              "in Hilfsvariablen, default: 0"),
+    )
+    parser.add_argument(
+        '--specialize',
+        dest='specialize',
+        metavar='NAME=WERT,...',
+        help=("Feste Werte für Eingabevariablen, z.B. 'LZZ=2,STKL=1' (alle Sprachen): die "
+              "Werte werden eingesetzt, Verzweigungen mit konstanter Bedingung aufgelöst und "
+              "nicht mehr aufgerufene Methoden entfernt. Die Variablen sind danach keine "
+              "Eingaben mehr."),
+    )
+    parser.add_argument(
+        '--outputs',
+        dest='outputs',
+        metavar='NAME,...',
+        help=("Nur die angegebenen Ausgabevariablen berechnen, z.B. 'LSTLZZ,SOLZLZZ' (alle "
+              "Sprachen): Anweisungen, Verzweigungen und Methoden, von denen sie nicht abhängen, "
+              "werden entfernt."),
+    )
+    parser.add_argument(
+        '--profile',
+        dest='profile',
+        action='store_true',
+        default=False,
+        help=("Erzeugt Code, der zählt, wie oft die Bedingungen der Verzweigungen wahr oder "
+              "falsch sind (falls LANG=python), siehe lstgen.passes.profile.save_profile."),
+    )
+    parser.add_argument(
+        '--profile-data',
+        dest='profile_data',
+        metavar='PROFILE_JSON',
+        help=("Mit --profile aufgezeichnete Zählungen (alle Sprachen): Verzweigungen, deren "
+              "ELSE-Zweig häufiger ausgeführt wird, werden umgedreht und die Operanden von "
+              "&&/|| so sortiert, dass der meist entscheidende zuerst ausgewertet wird."),
+    )
+    parser.add_argument(
+        '--memoize',
+        dest='memoize',
+        type=int,
+        metavar='N',
+        help=("Die Ergebnisse der letzten N verschiedenen Eingabekombinationen aufbewahren und "
+              "bei gleichen Eingaben wiederverwenden (falls LANG=python, java oder golang), "
+              "Treffer und Fehlschläge werden gezählt."),
+    )
 
     args = parser.parse_args()
 
@@ -107,24 +311,37 @@ def main():
             print(version)
         sys.exit(0)
 
-    if (not args.pap_version and not args.pap_xml_path) or (args.pap_version and args.pap_xml_path):
-        error("Bitte entweder eine PAP Version (-p) oder Pfad zu einer PAP XML Datei angeben (-x).")
-
-    xml_content = None
-    if args.pap_xml_path:
-        if not os.path.isfile(args.pap_xml_path):
-            error("Kann Datei nicht öffnen: '{}'".format(args.pap_xml_path))
-        else:
-            xml_content = open(args.pap_xml_path, 'r').read()
-
-    if args.pap_version:
-        try:
-            xml_content = pap.get_pap_xml(args.pap_version)
-        except ValueError as err:
-            error(err)
-
+    xml_content = read_pap_xml(args)
     lang = args.lang.lower()
+    if args.profile and lang != 'python':
+        error("--profile wird nur für LANG=python unterstützt.")
+    if args.profile and args.profile_data:
+        error("--profile und --profile-data können nicht kombiniert werden.")
+    if args.memoize is not None:
+        if lang not in ('python', 'java', 'golang'):
+            error("--memoize wird nur für LANG=python, java und golang unterstützt.")
+        if args.memoize < 1:
+            error("--memoize erwartet eine positive Anzahl.")
     pap_parser = PapParser(etree.fromstring(xml_content))
+    # branch ids refer to the IF statements of the original PAP
+    number_branches(pap_parser)
+    if args.profile_data:
+        try:
+            apply_profile(pap_parser, load_profile(args.profile_data))
+        except (IOError, OSError, ValueError) as err:
+            error(str(err))
+    if args.specialize:
+        try:
+            specialize(pap_parser, parse_values(args.specialize))
+        except ValueError as err:
+            error(str(err))
+    if args.outputs:
+        try:
+            slice_outputs(pap_parser, [name.strip() for name in args.outputs.split(',')
+                                       if name.strip()])
+        except ValueError as err:
+            error(str(err))
+    optimize(pap_parser, args.optimize)
     if not args.outfile:
         outfp = sys.stdout
     else:
@@ -147,7 +364,20 @@ def main():
                 pap_parser,
                 outfp,
                 class_name=args.class_name,
-                indent=args.indent
+                indent=args.indent,
+                runtime=args.python_runtime,
+                numeric=args.numeric,
+                mode=args.python_mode,
+                profile=args.profile,
+                memoize=args.memoize
+            )
+        elif lang == 'python-numpy':
+            generator = gen_class(
+                pap_parser,
+                outfp,
+                class_name=args.class_name,
+                indent=args.indent,
+                runtime=args.python_runtime
             )
         elif lang == 'golang':
             generator = gen_class(
@@ -155,7 +385,8 @@ def main():
                 outfp,
                 class_name=args.class_name,
                 package_name=args.go_package,
-                indent=args.indent
+                indent=args.indent,
+                memoize=args.memoize
             )    
         elif lang == 'java':
             generator = gen_class(
@@ -163,7 +394,8 @@ def main():
                 outfp,
                 class_name=args.class_name,
                 package_name=args.java_package,
-                indent=args.indent
+                indent=args.indent,
+                memoize=args.memoize
             )
         elif lang == 'javascript':
             generator = gen_class(
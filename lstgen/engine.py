@@ -0,0 +1,268 @@
+# coding: utf-8
+"""
+Execution of parsed PAPs without generating code
+
+ClosureCompiler turns the statements and expressions of a PAP into
+nested python closures once. The state of a calculation is a list with
+one slot per variable, constants are bound into the closures. The
+results match the ones of the python generator (decimal mode), which
+makes the engine a reference for it, and a PAP XML can be evaluated
+right after parsing it::
+
+    compute = compile_pap(PapParser(etree.fromstring(xml_content)))
+    print(compute(RE4=4000000, STKL=1, LZZ=1).LSTLZZ)
+"""
+import ast
+import operator
+from collections import namedtuple
+
+from . import (
+    parse_eval_stmt,
+    parse_condition_stmt,
+    prepare_expr,
+    remove_size_literal,
+    EvalStmt,
+    IfStmt,
+    ThenStmt,
+    ElseStmt,
+    ExecuteStmt,
+)
+from .runtime import BigDecimal, idiv
+
+BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+}
+
+NATIVE_METHODS = {
+    'add': operator.add,
+    'subtract': operator.sub,
+    'multiply': operator.mul,
+    'longValue': int,
+}
+""" BigDecimal methods replaced by decimal.Decimal operators, their
+    results are exact like the ones of the methods
+"""
+
+COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+
+def _divide(left, right):
+    """ Division of java numbers, integer divisions truncate """
+    if type(left) is int and type(right) is int:
+        return idiv(left, right)
+    return left / right
+
+
+class ClosureCompiler(object):
+    """ Compiles the methods of a parsed PAP into closures taking
+        the list of variable values
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.variables = [
+            var for variables in (parser.input_vars, parser.output_vars, parser.internal_vars)
+            for var in variables
+        ]
+        self.slots = dict((var.name, idx) for (idx, var) in enumerate(self.variables))
+        self.constants = {}
+        for const in parser.constants:
+            value = const.value
+            if const.type.endswith('[]'):
+                value = '[{}]'.format(value[1:-1])
+            self.constants[const.name] = self.evaluate(value)
+        self.methods = {}
+        for method in parser.methods:
+            self.methods[method.name] = self.method(method)
+        self.main = self.method(parser.main_method)
+
+    def evaluate(self, source):
+        """ Value of a constant java-like expression """
+        node = ast.parse(prepare_expr(remove_size_literal(source))).body[0].value
+        return self.expr(node)(None)
+
+    def _constant(self, node):
+        """ Value of a node that does not depend on variables, else None """
+        if isinstance(node, ast.Num):
+            return node.n
+        if isinstance(node, ast.Name) and node.id in self.constants:
+            return self.constants[node.id]
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and \
+                node.value.id == 'BigDecimal':
+            return getattr(BigDecimal, node.attr)
+        return None
+
+    def expr(self, node):
+        """ Compile an expression to a function of the variable values """
+        value = self._constant(node)
+        if value is not None:
+            return lambda env: value
+        if isinstance(node, ast.Name):
+            if node.id not in self.slots:
+                raise NameError("Undefined name {}".format(node.id))
+            return operator.itemgetter(self.slots[node.id])
+        if isinstance(node, ast.Call):
+            return self._call(node)
+        if isinstance(node, ast.BinOp):
+            (left, right) = (self.expr(node.left), self.expr(node.right))
+            oper = _divide if isinstance(node.op, ast.Div) else BINARY_OPS[type(node.op)]
+            return lambda env: oper(left(env), right(env))
+        if isinstance(node, ast.UnaryOp):
+            operand = self.expr(node.operand)
+            if isinstance(node.op, ast.USub):
+                return lambda env: -operand(env)
+            return operand
+        if isinstance(node, ast.Compare):
+            if len(node.ops) != 1:
+                raise NotImplementedError("Chained comparisons are not supported")
+            (left, right) = (self.expr(node.left), self.expr(node.comparators[0]))
+            oper = COMPARE_OPS[type(node.ops[0])]
+            return lambda env: oper(left(env), right(env))
+        if isinstance(node, ast.BoolOp):
+            values = tuple(self.expr(value) for value in node.values)
+            if len(values) == 2:
+                (first, second) = values
+                if isinstance(node.op, ast.And):
+                    return lambda env: first(env) and second(env)
+                return lambda env: first(env) or second(env)
+            if isinstance(node.op, ast.And):
+                return lambda env: all(value(env) for value in values)
+            return lambda env: any(value(env) for value in values)
+        if isinstance(node, ast.Subscript):
+            idx = node.slice
+            if isinstance(idx, ast.Index):
+                # python < 3.9 wraps subscripts in ast.Index
+                idx = idx.value
+            (array, index) = (self.expr(node.value), self.expr(idx))
+            return lambda env: array(env)[index(env)]
+        if isinstance(node, ast.List):
+            elements = tuple(self.expr(elt) for elt in node.elts)
+            return lambda env: [element(env) for element in elements]
+        raise NotImplementedError(u'Unsupported AST element: {}'.format(ast.dump(node)))
+
+    def _call(self, node):
+        args = tuple(self.expr(arg) for arg in node.args)
+        if isinstance(node.func, ast.Name) and node.func.id == 'BigDecimalConstructor':
+            func = BigDecimal
+        elif isinstance(node.func, ast.Attribute):
+            func = NATIVE_METHODS.get(node.func.attr) or getattr(BigDecimal, node.func.attr, None)
+            if func is None:
+                raise NotImplementedError("Unsupported method {}".format(node.func.attr))
+            if not (isinstance(node.func.value, ast.Name) and node.func.value.id == 'BigDecimal'):
+                # instance method, the receiver is the first argument
+                args = (self.expr(node.func.value),) + args
+        else:
+            raise NotImplementedError(u'Unsupported call: {}'.format(ast.dump(node)))
+        if len(args) == 1:
+            arg = args[0]
+            return lambda env: func(arg(env))
+        if len(args) == 2:
+            (first, second) = args
+            return lambda env: func(first(env), second(env))
+        return lambda env: func(*[arg(env) for arg in args])
+
+    def stmt(self, stmt):
+        """ Compile a statement to a function of the variable values """
+        if isinstance(stmt, EvalStmt):
+            (target, node) = parse_eval_stmt(remove_size_literal(stmt.expr))
+            if target not in self.slots:
+                raise NameError("Undefined variable {}".format(target))
+            (slot, value) = (self.slots[target], self.expr(node))
+
+            def run_eval(env):
+                env[slot] = value(env)
+            return run_eval
+        if isinstance(stmt, IfStmt):
+            condition = self.expr(parse_condition_stmt(remove_size_literal(stmt.condition)))
+            then = self.body([])
+            other = None
+            for part in stmt.body:
+                if isinstance(part, ThenStmt):
+                    then = self.body(part.body)
+                elif isinstance(part, ElseStmt) and part.body:
+                    other = self.body(part.body)
+            if other is None:
+                def run_if(env):
+                    if condition(env):
+                        then(env)
+            else:
+                def run_if(env):
+                    if condition(env):
+                        then(env)
+                    else:
+                        other(env)
+            return run_if
+        if isinstance(stmt, ExecuteStmt):
+            # looked up when executed, methods may be compiled later
+            (methods, name) = (self.methods, stmt.method_name)
+            return lambda env: methods[name](env)
+        raise NotImplementedError("Unsupported statement {}".format(stmt))
+
+    def body(self, body):
+        """ Compile a statement body """
+        stmts = tuple(self.stmt(part) for part in body)
+        if len(stmts) == 1:
+            return stmts[0]
+
+        def run_body(env):
+            for stmt in stmts:
+                stmt(env)
+        return run_body
+
+    def method(self, method):
+        """ Compile the body of a method """
+        return self.body(method.body)
+
+    def defaults(self):
+        """ Initial values of all variables """
+        return [None if var.default is None else self.evaluate(var.default)
+                for var in self.variables]
+
+    def compute_function(self):
+        """ Return compute(**inputs) calculating the PAP, it returns
+            a namedtuple of the outputs like the python generator's
+            compute() function (mode='function')
+        """
+        name = self.parser.internal_name or 'Pap'
+        result_class = namedtuple(
+            '{}Result'.format(name), [var.name for var in self.parser.output_vars]
+        )
+        defaults = self.defaults()
+        inputs = dict(
+            (var.name, (self.slots[var.name], var.type == 'BigDecimal'))
+            for var in self.parser.input_vars
+        )
+        outputs = operator.itemgetter(*[self.slots[var.name] for var in self.parser.output_vars])
+        single = len(self.parser.output_vars) == 1
+        main = self.main
+
+        def compute(**values):
+            env = list(defaults)
+            for (key, value) in values.items():
+                if value is None:
+                    continue
+                try:
+                    (slot, is_decimal) = inputs[key]
+                except KeyError:
+                    raise TypeError("compute() got an unexpected keyword argument '{}'".format(key))
+                env[slot] = BigDecimal(value) if is_decimal else value
+            main(env)
+            if single:
+                return result_class(outputs(env))
+            return result_class(*outputs(env))
+        compute.__name__ = 'compute'
+        return compute
+
+
+def compile_pap(parser):
+    """ Compile a parsed PAP to a compute(**inputs) function """
+    return ClosureCompiler(parser).compute_function()
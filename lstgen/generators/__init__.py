@@ -4,6 +4,7 @@ Base code generators module
 """
 from .php import PhpGenerator
 from .python import PythonGenerator
+from .python.vectorized import PythonNumpyGenerator
 from .golang import GoLangGenerator
 from .java import JavaGenerator
 from .javascript import JavascriptGenerator
@@ -11,6 +12,7 @@ from .javascript import JavascriptGenerator
 __all__ = [
     'PhpGenerator',
     'PythonGenerator',
+    'PythonNumpyGenerator',
     'GoLangGenerator',
     'JavaGenerator',
     'JavascriptGenerator'
@@ -19,6 +21,7 @@ __all__ = [
 GENERATORS = {
     'php': PhpGenerator,
     'python': PythonGenerator,
+    'python-numpy': PythonNumpyGenerator,
     'golang': GoLangGenerator,
     'java': JavaGenerator,
     'javascript': JavascriptGenerator
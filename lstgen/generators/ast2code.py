@@ -4,6 +4,9 @@ AST to code converter base class
 """
 import ast
 
+from ..analysis import TypeInference
+from ..passes.compare import DecimalCompare
+
 
 class AstToCode(object):
     """ converts an AST to code """
@@ -35,6 +38,11 @@ class AstToCode(object):
     div_op = '/'
     """ Division operator (usually a "/") """
 
+    int_div_format = None
+    """ Format of a truncating division of two integers, e.g. "intdiv({}, {})",
+        None if the division operator already truncates integers
+    """
+
     list_subscription_parens = ('[', ']')
     """ Parenthesis to access a list/array member (subscription) """
 
@@ -76,6 +84,7 @@ class AstToCode(object):
     def __init__(self, parser, class_name=None):
         self.parser = parser
         self.class_name = class_name if class_name else self.parser.internal_name
+        self.types = TypeInference(parser)
 
     @property
     def inst_prefix(self):
@@ -92,6 +101,12 @@ class AstToCode(object):
         )
 
     def _conv_binop(self, node):
+        if self.int_div_format and isinstance(node.op, ast.Div) and \
+                self.types.is_integral(node):
+            return [self.int_div_format.format(
+                ''.join(self.to_code(node.left)),
+                ''.join(self.to_code(node.right))
+            )]
         return (
             self.to_code(node.left) +
             self.to_code(node.op) +
@@ -164,6 +179,19 @@ class AstToCode(object):
             self.to_code(node.comparators[0])
         )
 
+    def _conv_decimal_comp(self, node):
+        """ BigDecimals can't be compared with operators in most
+            languages, use compareTo() with a zero
+        """
+        return (
+            self.to_code(node.left) +
+            [self.property_accessor_op, 'compareTo', self.callable_exec_parens[0]] +
+            self.to_code(node.comparators[0]) +
+            [self.callable_exec_parens[1]] +
+            self.to_code(node.ops[0]) +
+            ['0']
+        )
+
     def _conv_list(self, node):
         ret = [self.list_const_parens[0]]
         for (idx, elt) in enumerate(node.elts):
@@ -232,6 +260,9 @@ class AstToCode(object):
         if isinstance(node, ast.List):
             return self._conv_list(node)
 
+        if isinstance(node, DecimalCompare):
+            return self._conv_decimal_comp(node)
+
         if isinstance(node, ast.Compare):
             return self._conv_comp(node)
 
@@ -2,13 +2,16 @@
 """
 Base writers module
 """
+import ast
 from contextlib import contextmanager
 
 from .ast2code import AstToCode
+from ..analysis import DefiniteAssignment
 
 from .. import (
     parse_eval_stmt,
-    parse_condition_stmt
+    parse_condition_stmt,
+    remove_size_literal
 )
 from .. import (
     EvalStmt,
@@ -82,9 +85,128 @@ class Writer(object):
 class BaseGenerator(AstToCode):
     """ Base code generator class """
 
+    switch_min_cases = 3
+    """ Minimum number of cases of an IF/ELSE IF chain comparing an integer
+        variable to literals to be written as a switch statement
+    """
+
+    switch_format = 'switch ({})'
+    """ Head of a switch statement on a variable """
+
+    case_format = 'case {}:'
+    """ Label of a case, see case_values_delim """
+
+    case_values_delim = None
+    """ Delimiter of the values of a case with several values, None
+        if each of them needs its own label
+    """
+
+    case_break = 'break;'
+    """ Statement ending a case (None if cases do not fall through) """
+
     def __init__(self, parser, outfile, class_name=None, indent=None, block_chars=(' {', '}')):
         super(BaseGenerator, self).__init__(parser, class_name)
         self.writer = Writer(outfile, indent, block_chars)
+        self._assigned_before_read = None
+
+    def _needs_default(self, var):
+        """ False for internal variables MAIN always assigns before it
+            reads them, initializing these would be wasted work
+        """
+        if self._assigned_before_read is None:
+            self._assigned_before_read = DefiniteAssignment(self.parser).assigned_before_read()
+        return var.name not in self._assigned_before_read
+
+    def _else_if(self, stmt):
+        """ Return the IF that is the only statement of the ELSE
+            branch of an IF statement or None
+        """
+        for part in stmt.body:
+            if isinstance(part, ElseStmt) and len(part.body) == 1 and \
+                    isinstance(part.body[0], IfStmt):
+                return part.body[0]
+        return None
+
+    def _case_values(self, node):
+        """ Return (variable name, integer literals) if a condition
+            compares an int variable to literals with == and ||, else None
+        """
+        if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.Or):
+            name = None
+            values = []
+            for value in node.values:
+                case = self._case_values(value)
+                if case is None or name not in (None, case[0]):
+                    return None
+                name = case[0]
+                values.extend(case[1])
+            return (name, values)
+        if not (isinstance(node, ast.Compare) and len(node.ops) == 1 and
+                isinstance(node.ops[0], ast.Eq)):
+            return None
+        (left, right) = (node.left, node.comparators[0])
+        if isinstance(left, ast.Num):
+            (left, right) = (right, left)
+        if isinstance(left, ast.Name) and self.types.is_integral(left) and \
+                isinstance(right, ast.Num) and type(right.n) is int:
+            return (left.id, [right.n])
+        return None
+
+    def _switch_chain(self, stmt):
+        """ Return (variable name, [(values, body), ...], default body)
+            for an IF/ELSE IF chain comparing one int variable to literals,
+            None if the chain is too short to be written as a switch
+        """
+        name = None
+        cases = []
+        seen = set()
+        while True:
+            case = self._case_values(parse_condition_stmt(remove_size_literal(stmt.condition)))
+            if case is None or name not in (None, case[0]):
+                break
+            name = case[0]
+            # values of earlier cases never reach a later one
+            values = [value for value in case[1] if value not in seen]
+            seen.update(values)
+            body = [part for part in stmt.body if isinstance(part, ThenStmt)]
+            if values:
+                cases.append((values, body[0].body if body else []))
+            following = self._else_if(stmt)
+            if following is None:
+                default = [part for part in stmt.body if isinstance(part, ElseStmt)]
+                return self._switch_or_none(name, cases, default[0].body if default else [])
+            stmt = following
+        # the remaining IF is the default
+        return self._switch_or_none(name, cases, [stmt])
+
+    def _switch_or_none(self, name, cases, default):
+        if len(cases) < self.switch_min_cases:
+            return None
+        return (name, cases, default)
+
+    def _write_switch(self, name, cases, default):
+        subject = ''.join(self.to_code(ast.Name(id=name, ctx=ast.Load())))
+        if default:
+            cases = cases + [(None, default)]
+        with self.writer.indent(self.switch_format.format(subject)):
+            for (values, body) in cases:
+                if values is None:
+                    labels = ['default:']
+                elif self.case_values_delim:
+                    labels = [self.case_format.format(
+                        self.case_values_delim.join(str(value) for value in values)
+                    )]
+                else:
+                    labels = [self.case_format.format(value) for value in values]
+                for label in labels:
+                    self.writer.writeln(label)
+                self.writer.inc_indent()
+                branch = ThenStmt()
+                branch.body = body
+                self._write_stmt_body(branch)
+                if self.case_break:
+                    self.writer.writeln(self.case_break)
+                self.writer.dec_indent()
 
     def generate(self):
         raise NotImplementedError("Implement me!")
@@ -131,6 +253,10 @@ class JavaLikeGenerator(BaseGenerator):
                 self._write_stmt_body(part)
 
     def _write_if(self, stmt):
+        chain = self._switch_chain(stmt)
+        if chain is not None:
+            self._write_switch(*chain)
+            return
         converted = self._convert_if(stmt.condition)
         with self.writer.indent('if ({})'.format(converted)):
             self._write_stmt_body(stmt)
@@ -22,12 +22,19 @@ class GoLangGenerator(JavaLikeGenerator):
     bd_class_constructor = 'NewFromInt'
     list_const_parens = ('{', '}')
     stmt_separator = ''
+    switch_format = 'switch {}'
+    case_values_delim = ', '
+    case_break = None
     allow_constants = False
     instance_var = 't'
 
-    def __init__(self, parser, outfile, class_name=None, indent=None, package_name='default'):
+    def __init__(self, parser, outfile, class_name=None, indent=None, package_name='default',
+                 memoize=None):
         super(GoLangGenerator, self).__init__(parser, outfile, class_name, indent)
+        if memoize is not None and memoize < 1:
+            raise ValueError("Invalid memoization size: {}".format(memoize))
         self.package_name = package_name
+        self.memoize = memoize
         self.type_map = {}   # Keep a list of known variable types
 
     def _write_preamble(self):        
@@ -42,6 +49,9 @@ class GoLangGenerator(JavaLikeGenerator):
         self._write_comment("This file is automatically generated by LstGen2, do not edit!", False)
         wr.writeln('package {}'.format(self.package_name or 'tax'))        
         wr.nl()
+        if self.memoize:
+            wr.writeln('import "container/list"')
+            wr.writeln('import "sync"')
         self._write_preamble()
         wr.nl()
 
@@ -107,7 +117,7 @@ class GoLangGenerator(JavaLikeGenerator):
                     ]:
 
                     for var in variables:
-                        if var.default is None:
+                        if var.default is None or not self._needs_default(var):
                             continue
 
                         if var.comment is not None:
@@ -148,7 +158,11 @@ class GoLangGenerator(JavaLikeGenerator):
                     name=var.name
                 ))
 
-        self._write_method(self.parser.main_method)
+        if self.memoize:
+            self._write_memo_main()
+            self._write_method(self.parser.main_method, 'mainUncached')
+        else:
+            self._write_method(self.parser.main_method)
         for method in self.parser.methods:
             self._write_method(method)
         wr.nl()
@@ -166,6 +180,14 @@ class GoLangGenerator(JavaLikeGenerator):
         res = super(GoLangGenerator, self)._conv_list(node)
         return ['[]' + self.bd_class] + res
 
+    def _conv_decimal_comp(self, node):
+        """ BigDecimal wraps a float64, compare the floats directly """
+        return (
+            self.to_code(node.left) + ['.Float64()'] +
+            self.to_code(node.ops[0]) +
+            self.to_code(node.comparators[0]) + ['.Float64()']
+        )
+
     def _conv_attribute(self, node):
         clsmethod = False
         if node.attr == 'valueOf':
@@ -207,38 +229,15 @@ class GoLangGenerator(JavaLikeGenerator):
         )
 
     def _get_decimal_constructor_from_node(self, node):
-        try:
-            int(str(node.n))
+        # go's decimal constructors are typed, the type of the argument is inferred
+        # from the declarations of the PAP
+        rtype = self.types.type_of(node)
+        if rtype == 'int':
             return 'NewFromInt'
-        except ValueError:
+        elif rtype == 'double':
             return 'NewFromFloat'
-        except AttributeError: # If node.nodes[0] is not a value, but e.g. a name or a call
-            # Unfortunately it's not possible to support all cases due to the strict
-            # typing of Go. However, we are "lucky":
-            if node.__class__.__name__ == 'Name':
-                # For now, all variable assignments that create new values happen to be integers.
-                rtype = self.type_map.get(node.id)
-                if rtype == 'int64':
-                    return 'NewFromInt'
-                elif rtype == 'float64':
-                    return 'NewFromFloat'
-                raise NotImplementedError(node.id+' has unsupported type '+repr(rtype))
-            elif node.__class__.__name__ == 'Call':
-                # The node is a function call. Luckily so far, all calls return integers...
-                # luckily, the only function calls in assignments are calls to Decimal methods,
-                # which we can ensure to return int64
-                return 'NewFromInt'
-            elif node.__class__.__name__ == 'Constant':
-                try:
-                    int(str(node.value))
-                    return 'NewFromInt'
-                except ValueError:
-                    return 'NewFromFloat'
-            elif node.__class__.__name__ == 'BinOp':
-                # For math operations, the type depends on the operators.
-                return self._get_decimal_constructor_from_node(node.left)
-        raise NotImplementedError("unsupported node type {}".format(
-            node.__class__.__name__
+        raise NotImplementedError("{} has unsupported type {!r}".format(
+            ast.dump(node), rtype
         ))
 
     def _conv_call(self, node):
@@ -274,14 +273,86 @@ class GoLangGenerator(JavaLikeGenerator):
             [self.callable_exec_parens[1]]
         )
 
-    def _write_method(self, method):
+    def _write_memo_main(self):
+        """ Write a MAIN() copying the outputs of an earlier calculation
+            with the same inputs from an LRU shared by all instances
+        """
+        wr = self.writer
+        names = dict(
+            cls=self.class_name,
+            instance=self.instance_var,
+            key='memoKey' + self.class_name,
+            entry='memoEntry' + self.class_name,
+            memo='memo' + self.class_name,
+            size='MemoSize' + self.class_name,
+        )
+        wr.nl()
+        with wr.indent('type {key} struct'.format(**names)):
+            for var in self.parser.input_vars:
+                wr.writeln('{} {}'.format(var.name, self._convert_vartype(var.type)))
+        wr.nl()
+        with wr.indent('type {entry} struct'.format(**names)):
+            wr.writeln('key {key}'.format(**names))
+            for var in self.parser.output_vars:
+                wr.writeln('{} {}'.format(var.name, self._convert_vartype(var.type)))
+        wr.nl()
+        self._write_comment('Maximum number of results kept by {cls}.MAIN()'.format(**names))
+        wr.writeln('const {size} = {memoize}'.format(memoize=self.memoize, **names))
+        wr.nl()
+        wr.writeln('var {memo} = struct {{'.format(**names))
+        wr.inc_indent()
+        wr.writeln('sync.Mutex')
+        wr.writeln('entries map[{key}]*list.Element'.format(**names))
+        wr.writeln('order *list.List')
+        wr.writeln('hits, misses int64')
+        wr.dec_indent()
+        wr.writeln('}}{{entries: map[{key}]*list.Element{{}}, order: list.New()}}'.format(**names))
+        wr.nl()
+        self._write_comment('Numbers of results of {cls}.MAIN() found in and added to the memo'.format(
+            **names
+        ))
+        with wr.indent('func MemoStats{cls}() (hits int64, misses int64)'.format(**names)):
+            wr.writeln('{memo}.Lock()'.format(**names))
+            wr.writeln('defer {memo}.Unlock()'.format(**names))
+            wr.writeln('return {memo}.hits, {memo}.misses'.format(**names))
+        wr.nl()
+        with wr.indent('func ({instance} *{cls}) MAIN()'.format(**names)):
+            wr.writeln('key := {key}{{{values}}}'.format(values=', '.join(
+                '{}.{}'.format(self.instance_var, var.name) for var in self.parser.input_vars
+            ), **names))
+            wr.writeln('{memo}.Lock()'.format(**names))
+            with wr.indent('if elem, ok := {memo}.entries[key]; ok'.format(**names)):
+                wr.writeln('{memo}.order.MoveToFront(elem)'.format(**names))
+                wr.writeln('{memo}.hits++'.format(**names))
+                wr.writeln('entry := elem.Value.(*{entry})'.format(**names))
+                wr.writeln('{memo}.Unlock()'.format(**names))
+                for var in self.parser.output_vars:
+                    wr.writeln('{}.{name} = entry.{name}'.format(self.instance_var, name=var.name))
+                wr.writeln('return')
+            wr.writeln('{memo}.misses++'.format(**names))
+            wr.writeln('{memo}.Unlock()'.format(**names))
+            wr.writeln('{instance}.mainUncached()'.format(**names))
+            wr.writeln('{memo}.Lock()'.format(**names))
+            wr.writeln('defer {memo}.Unlock()'.format(**names))
+            with wr.indent('if _, ok := {memo}.entries[key]; !ok'.format(**names)):
+                wr.writeln('{memo}.entries[key] = {memo}.order.PushFront(&{entry}{{key, {values}}})'.format(
+                    values=', '.join(
+                        '{}.{}'.format(self.instance_var, var.name) for var in self.parser.output_vars
+                    ), **names
+                ))
+                with wr.indent('if {memo}.order.Len() > {size}'.format(**names)):
+                    wr.writeln('oldest := {memo}.order.Back()'.format(**names))
+                    wr.writeln('{memo}.order.Remove(oldest)'.format(**names))
+                    wr.writeln('delete({memo}.entries, oldest.Value.(*{entry}).key)'.format(**names))
+
+    def _write_method(self, method, name=None):
         self.writer.nl()
         if method.comment:
             self._write_comment(method.comment, False)
         signature = 'func ({instance} *{cls}) {name}()'.format(
             instance=self.instance_var,
             cls=self.class_name,
-            name=method.name
+            name=name or method.name
         )
         # actual method body
         with self.writer.indent(signature):
@@ -8,9 +8,13 @@ from .base import JavaLikeGenerator
 class JavaGenerator(JavaLikeGenerator):
     """ Java Generator """
 
-    def __init__(self, parser, outfile, class_name=None, indent=None, package_name='default'):
+    def __init__(self, parser, outfile, class_name=None, indent=None, package_name='default',
+                 memoize=None):
         super(JavaGenerator, self).__init__(parser, outfile, class_name, indent)
+        if memoize is not None and memoize < 1:
+            raise ValueError("Invalid memoization size: {}".format(memoize))
         self.package_name = package_name
+        self.memoize = memoize
 
     def generate(self):
         wr = self.writer
@@ -18,6 +22,9 @@ class JavaGenerator(JavaLikeGenerator):
             wr.writeln('package {};'.format(self.package_name))
             wr.nl()
         wr.writeln('import java.math.BigDecimal;')
+        if self.memoize:
+            for name in ('Arrays', 'LinkedHashMap', 'List', 'Map'):
+                wr.writeln('import java.util.{};'.format(name))
         wr.nl()
         with self.writer.indent('public class {}'.format(self.class_name)):
             wr.writeln("/* Constants */")
@@ -50,7 +57,10 @@ class JavaGenerator(JavaLikeGenerator):
                     if var.comment is not None:
                         wr.nl()
                         self._write_comment(var.comment, False)
-                    wr.writeln('protected {var.type} {var.name} = {var.default};'.format(var=var))
+                    if self._needs_default(var):
+                        wr.writeln('protected {var.type} {var.name} = {var.default};'.format(var=var))
+                    else:
+                        wr.writeln('protected {var.type} {var.name};'.format(var=var))
             # create setters for input vars
             for var in self.parser.input_vars:
                 wr.nl()
@@ -70,18 +80,77 @@ class JavaGenerator(JavaLikeGenerator):
                 )
                 with wr.indent(signature):
                     wr.writeln('return this.{};'.format(var.name))
-            self._write_method(self.parser.main_method, 'public')
+            if self.memoize:
+                self._write_memo_main()
+                self._write_method(self.parser.main_method, name='mainUncached')
+            else:
+                self._write_method(self.parser.main_method, 'public')
             for method in self.parser.methods:
                 self._write_method(method)
         wr.nl()
 
-    def _write_method(self, method, visibility='protected'):
+    def _memo_key(self, var):
+        """ Canonical value of an input for the memo key, BigDecimal
+            values differing in their scale only are equal
+        """
+        if var.type == 'BigDecimal':
+            return '{0} == null ? null : {0}.stripTrailingZeros()'.format(var.name)
+        return var.name
+
+    def _write_memo_main(self):
+        """ Write a MAIN() copying the outputs of an earlier calculation
+            with the same inputs from an LRU shared by all instances
+        """
+        wr = self.writer
+        cls = self.class_name
+        wr.nl()
+        wr.writeln('/* Memoization of MAIN() */')
+        wr.writeln('public final static int MEMO_SIZE = {};'.format(self.memoize))
+        wr.writeln('private final static Map<List<Object>, Object[]> MEMO =')
+        wr.writeln('        new LinkedHashMap<List<Object>, Object[]>(16, 0.75f, true) {')
+        wr.inc_indent()
+        with wr.indent('protected boolean removeEldestEntry(Map.Entry<List<Object>, Object[]> eldest)'):
+            wr.writeln('return size() > MEMO_SIZE;')
+        wr.dec_indent()
+        wr.writeln('};')
+        wr.writeln('private static long memoHits = 0;')
+        wr.writeln('private static long memoMisses = 0;')
+        for name in ('Hits', 'Misses'):
+            wr.nl()
+            with wr.indent('public static synchronized long getMemo{}()'.format(name)):
+                wr.writeln('return memo{};'.format(name))
+        wr.nl()
+        with wr.indent('public void MAIN()'):
+            wr.writeln('List<Object> key = Arrays.<Object>asList(')
+            wr.inc_indent(2)
+            wr.writeln('{});'.format(', '.join(self._memo_key(var) for var in self.parser.input_vars)))
+            wr.dec_indent(2)
+            wr.writeln('Object[] outputs;')
+            with wr.indent('synchronized ({}.class)'.format(cls)):
+                wr.writeln('outputs = MEMO.get(key);')
+                with wr.indent('if (outputs != null)'):
+                    wr.writeln('memoHits++;')
+            with wr.indent('if (outputs != null)'):
+                for (idx, var) in enumerate(self.parser.output_vars):
+                    wr.writeln('this.{name} = ({type}) outputs[{idx}];'.format(
+                        name=var.name, type=var.type, idx=idx
+                    ))
+                wr.writeln('return;')
+            wr.writeln('mainUncached();')
+            wr.writeln('outputs = new Object[] {{{}}};'.format(
+                ', '.join(var.name for var in self.parser.output_vars)
+            ))
+            with wr.indent('synchronized ({}.class)'.format(cls)):
+                wr.writeln('memoMisses++;')
+                wr.writeln('MEMO.put(key, outputs);')
+
+    def _write_method(self, method, visibility='protected', name=None):
         self.writer.nl()
         if method.comment:
             self._write_comment(method.comment, False)
         signature = '{visibility} void {name}()'.format(
             visibility=visibility,
-            name=method.name
+            name=name or method.name
         )
         # actual method body
         with self.writer.indent(signature):
@@ -11,6 +11,12 @@ from .base import JavaLikeGenerator
 class JavascriptGenerator(JavaLikeGenerator):
     """ Javascript Generator """
 
+    int_div_format = 'Math.trunc({} / {})'
+    """ Javascript only has floating point numbers """
+
+    switch_format = 'switch (Number({}))'
+    """ switch compares with ===, Number() keeps the semantics of == for strings """
+
     bd_attr_aliases = {
         'ZERO': 'ZERO()',
         'ONE': 'ONE()',
@@ -38,7 +44,7 @@ class JavascriptGenerator(JavaLikeGenerator):
                         wr.nl()
                         self._write_comment(var.comment, False)
                     default = 'null'
-                    if var.default:
+                    if var.default and self._needs_default(var):
                         val = remove_size_literal(var.default)
                         default = self.convert_to_js(val)
                     wr.writeln('this.{name} = {default};'.format(
@@ -39,6 +39,11 @@ class PhpGenerator(BaseGenerator):
         in case of PHP it's array()
     """
 
+    int_div_format = 'intdiv({}, {})'
+    """ PHP's "/" returns a float unless the division is exact, intdiv()
+        truncates exactly
+    """
+
     allow_constants = False
     """ Disallow class constants, since we cannot have instances
         of BigDecimal as constant values
@@ -127,6 +132,8 @@ class PhpGenerator(BaseGenerator):
                 ]:
                 self.writer.writeln('// ' + comment)
                 for var in variables:
+                    if not self._needs_default(var):
+                        continue
                     default = var.default
                     if not default:
                         if var.type == 'BigDecimal':
@@ -189,6 +196,10 @@ class PhpGenerator(BaseGenerator):
                 self._write_stmt_body(part)
 
     def _write_if(self, stmt):
+        chain = self._switch_chain(stmt)
+        if chain is not None:
+            self._write_switch(*chain)
+            return
         converted = self._convert_if(stmt.condition)
         with self.writer.indent('if ({})'.format(converted)):
             self._write_stmt_body(stmt)
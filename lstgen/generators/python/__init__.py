@@ -4,6 +4,7 @@ Python writer
 """
 import ast
 import inspect
+from contextlib import contextmanager
 
 from ... import (
     prepare_expr,
@@ -20,7 +21,19 @@ from ... import (
     ExecuteStmt,
 )
 
-from . import bd
+from ...runtime import bd
+from ...runtime import fixed as fixed_runtime
+from .fixed import FixedPointConverter
+from .lowering import DecimalLowering
+from ...analysis import MethodEffects
+from ...passes.profile import number_branches
+
+
+def _branch(body):
+    """ A THEN branch holding a list of statements """
+    branch = ThenStmt()
+    branch.body = body
+    return branch
 
 
 class PythonGenerator(BaseGenerator):
@@ -36,7 +49,40 @@ class PythonGenerator(BaseGenerator):
     bd_class_constructor = 'BigDecimal'
     """ Override BigDecimal class constructor """
 
-    def __init__(self, parser, outfile, class_name=None, indent=None):
+    int_div_format = 'idiv({}, {})'
+    """ Exact integer division truncating like java's, see lstgen.runtime.bd.idiv """
+
+    runtimes = ('inline', 'import')
+    """ Supported ways of providing the BigDecimal runtime: "inline" copies
+        the runtime source into the generated module, "import" imports it
+        from lstgen.runtime
+    """
+
+    profile_runtime = (
+        '_PROFILE = {}\n'
+        '""" Branch counts [true, false] by branch id, see lstgen.passes.profile """\n'
+        '\n'
+        '\n'
+        'def _branch(key, value):\n'
+        '    counts = _PROFILE.setdefault(key, [0, 0])\n'
+        '    counts[0 if value else 1] += 1\n'
+        '    return value\n'
+    )
+    """ Counting of branches for profile=True """
+
+    numeric_modes = ('decimal', 'fixed')
+    """ Supported number representations: "decimal" uses BigDecimal (a
+        decimal.Decimal subclass), "fixed" uses plain integers scaled
+        to a fixed number of decimal places per variable
+    """
+
+    modes = ('class', 'function')
+    """ Generated code layout: "class" generates a calculator class,
+        "function" a stateless compute() function using local variables
+    """
+
+    def __init__(self, parser, outfile, class_name=None, indent=None, runtime='inline',
+                 numeric='decimal', mode='class', profile=False, memoize=None):
         super(PythonGenerator, self).__init__(
             parser,
             outfile,
@@ -44,23 +90,72 @@ class PythonGenerator(BaseGenerator):
             indent,
             block_chars=(':', None)
         )
+        if runtime not in self.runtimes:
+            raise ValueError("Invalid runtime: {}".format(runtime))
+        if numeric not in self.numeric_modes:
+            raise ValueError("Invalid numeric mode: {}".format(numeric))
+        if mode not in self.modes:
+            raise ValueError("Invalid mode: {}".format(mode))
+        if memoize is not None and memoize < 1:
+            raise ValueError("Invalid memoization size: {}".format(memoize))
+        self.runtime = runtime
+        self.numeric = numeric
+        self.mode = mode
+        self.profile = profile
+        self.memoize = memoize
+        self._switches = []
+        """ Switch dispatches whose case functions are not written yet """
+        self._switch_count = 0
+        if profile:
+            number_branches(parser)
+        if mode == 'function':
+            # variables are locals and constants module globals
+            self.instance_var = None
+            self.allow_constants = False
+        self.fixed = None
+        self.lowering = None
+        if numeric == 'decimal':
+            self.lowering = DecimalLowering(self)
+        if numeric == 'fixed':
+            self.fixed = FixedPointConverter(
+                self.parser,
+                self.class_name if mode == 'class' else None,
+                instance_var=self.instance_var
+            )
 
     def _write_preamble(self):
         self.writer.writeln("# coding: utf-8")
         self.writer.nl()
-        self.writer.writeln(inspect.getsource(bd))
+        if self.fixed:
+            if self.runtime == 'import':
+                self.writer.writeln(
+                    'from lstgen.runtime.fixed import div_down, div_up, compare, to_fixed, from_fixed'
+                )
+            else:
+                self.writer.writeln(inspect.getsource(fixed_runtime))
+        elif self.runtime == 'import':
+            self.writer.writeln('from lstgen.runtime import BigDecimal, idiv')
+        else:
+            self.writer.writeln(inspect.getsource(bd))
+        if self.lowering:
+            for (name, code) in self.lowering.hoisted():
+                self.writer.writeln('{} = {}'.format(name, code))
+        if self.profile:
+            self.writer.nl()
+            self.writer.writeln(self.profile_runtime)
+        if self.memoize:
+            self.writer.writeln('from collections import OrderedDict')
         self.writer.nl()
 
     def generate(self):
+        if self.mode == 'function':
+            self._generate_function()
+            return
         self._write_preamble()
         with self.writer.indent('class {}'.format(self.class_name)):
             for const in self.parser.constants:
-                value = const.value
-                if const.type.endswith('[]'):
-                    value = '[{}]'.format(value[1:-1])
-                converted = self.convert_to_python(value)
                 self.writer.writeln('{const.name} = {converted}'.format(
-                    const=const, converted=converted
+                    const=const, converted=self._convert_const(const)
                 ))
                 if const.comment is not None:
                     self._write_comment(const.comment, False)
@@ -70,49 +165,190 @@ class PythonGenerator(BaseGenerator):
             for var in self.parser.input_vars:
                 self.writer.nl()
                 with self.writer.indent('def set{}(self, value)'.format(var.name.capitalize())):
-                    if var.type == 'BigDecimal':
-                        self.writer.writeln('self.{} = BigDecimal(value)'.format(var.name))
-                    else:
-                        self.writer.writeln('self.{} = value'.format(var.name))
+                    self.writer.writeln('self.{} = {}'.format(var.name, self._convert_input(var, 'value')))
 
             # create getters for output vars
             for var in self.parser.output_vars:
                 self.writer.nl()
                 with self.writer.indent('def get{}(self)'.format(var.name.capitalize())):
-                    self.writer.writeln('return self.{}'.format(var.name))
-            self._write_method(self.parser.main_method)
+                    self.writer.writeln('return {}'.format(
+                        self._output_value(var, 'self.{}'.format(var.name))
+                    ))
+            if self.memoize:
+                self._write_memo_main()
+                self._write_method(self.parser.main_method, '_main_uncached')
+            else:
+                self._write_method(self.parser.main_method)
             for method in self.parser.methods:
                 self._write_method(method)
+            self._write_switch_tables()
+            self.writer.nl()
+            with self._bracketed('_SETTERS = {', '}'):
+                for var in self.parser.input_vars:
+                    self.writer.writeln('"{}": set{},'.format(var.name, var.name.capitalize()))
+            self.writer.writeln('""" Input setters by variable name """')
+
+    def _convert_const(self, const):
+        """ Code for the value of a constant """
+        if self.fixed:
+            return self.fixed.constant(const)
+        value = const.value
+        if const.type.endswith('[]'):
+            value = '[{}]'.format(value[1:-1])
+        return self.convert_to_python(value)
+
+    def _default_value(self, var):
+        """ Code for the default value of a variable """
+        if self.fixed:
+            return self.fixed.default(var)
+        return self.convert_to_python(var.default)
+
+    def _output_value(self, var, value):
+        """ Code converting the value of an output var for the caller """
+        if self.fixed and var.type in ('BigDecimal', 'double'):
+            return 'from_fixed({}, {})'.format(value, self.fixed.scale_of(var.name))
+        if self.lowering and var.type == 'BigDecimal':
+            # lowered operators return plain Decimals
+            return 'BigDecimal({})'.format(value)
+        return value
+
+    def _convert_input(self, var, value):
+        """ Code converting a value passed in by the caller for an input var """
+        if self.fixed and var.type in ('BigDecimal', 'double'):
+            return 'to_fixed({}, {})'.format(value, self.fixed.scale_of(var.name))
+        if var.type == 'BigDecimal':
+            return 'BigDecimal({})'.format(value)
+        return value
+
+    def _all_vars(self):
+        return [
+            (self.parser.input_vars, 'input variables'),
+            (self.parser.output_vars, 'output variables'),
+            (self.parser.internal_vars, 'internal variables'),
+        ]
+
+    def _initialized_vars(self):
+        """ Like _all_vars() without the variables that need no default """
+        return [
+            ([var for var in variables if self._needs_default(var)], comment)
+            for (variables, comment) in self._all_vars()
+        ]
 
     def _write_constructor(self):
         self.writer.nl()
-        with self.writer.indent('def __init__(self, **kwargs)'):
-            # initialize variables with default values
-            for (variables, comment, is_input) in [
-                    (self.parser.input_vars, 'input variables', True),
-                    (self.parser.output_vars, 'output variables', False),
-                    (self.parser.internal_vars, 'internal variables', False),
-                ]:
+        with self._bracketed('__slots__ = (', ')'):
+            for (variables, comment) in self._all_vars():
+                self.writer.writeln('# ' + comment)
+                for var in variables:
+                    self.writer.writeln('"{}",'.format(var.name))
+        self.writer.nl()
+        # default values are created once and shared by all instances
+        with self._bracketed('_DEFAULTS = (', ')'):
+            for (variables, comment) in self._initialized_vars():
                 self.writer.writeln('# ' + comment)
                 for var in variables:
                     if var.comment is not None:
-                        self.writer.nl()
                         self._write_comment(var.comment, True)
-                    self.writer.writeln('self.{name} = {value}'.format(
-                        name=var.name,
-                        value=self.convert_to_python(var.default)
-                    ))
-                    if is_input:
-                        with self.writer.indent('if "{}" in kwargs'.format(var.name)):
-                            self.writer.writeln('self.set{cap}(kwargs["{name}"])'.format(
-                                cap=var.name.capitalize(),
-                                name=var.name
-                            ))
-                self.writer.nl()
+                    self.writer.writeln('{},  # {}'.format(self._default_value(var), var.name))
+        self.writer.nl()
+        self.writer.writeln('INPUTS = ({})'.format(
+            ''.join('"{}", '.format(var.name) for var in self.parser.input_vars).rstrip()
+        ))
+        self.writer.writeln('""" Names of the input variables in the order expected by from_row() """')
+        self.writer.nl()
+        with self.writer.indent('def __init__(self, **kwargs)'):
+            self.writer.writeln('self.reset(**kwargs)')
+        self.writer.nl()
+        with self.writer.indent('def reset(self, **kwargs)'):
+            self.writer.writeln('""" Restore the default values and set the given inputs """')
+            self._write_restore_defaults()
+            with self.writer.indent('for (name, value) in kwargs.items()'):
+                self.writer.writeln('setter = self._SETTERS.get(name)')
+                with self.writer.indent('if setter is not None'):
+                    self.writer.writeln('setter(self, value)')
+        self.writer.nl()
+        with self.writer.indent('def reset_row(self, row)'):
+            self.writer.writeln('""" Restore the default values and set all inputs from a tuple ordered like INPUTS """')
+            self._write_restore_defaults()
+            if self.parser.input_vars:
+                self.writer.writeln('({}) = row'.format(
+                    ''.join('{}, '.format(var.name) for var in self.parser.input_vars).rstrip()
+                ))
+            for var in self.parser.input_vars:
+                self.writer.writeln('self.{} = {}'.format(var.name, self._convert_input(var, var.name)))
+        self.writer.nl()
+        self.writer.writeln('@classmethod')
+        with self.writer.indent('def from_row(cls, row)'):
+            self.writer.writeln('""" Create an instance from a tuple of inputs ordered like INPUTS """')
+            self.writer.writeln('calc = cls.__new__(cls)')
+            self.writer.writeln('calc.reset_row(row)')
+            self.writer.writeln('return calc')
 
-    def _write_method(self, method):
+    @contextmanager
+    def _bracketed(self, opening, closing):
+        """ Indent the lines of a multi-line literal """
+        self.writer.writeln(opening)
+        self.writer.inc_indent()
+        yield
+        self.writer.dec_indent()
+        self.writer.writeln(closing)
+
+    def _write_restore_defaults(self):
+        with self._bracketed('(', ') = self._DEFAULTS'):
+            for (variables, comment) in self._initialized_vars():
+                for var in variables:
+                    self.writer.writeln('self.{},'.format(var.name))
+
+    def _write_memo_attributes(self):
+        self.writer.writeln('_MEMO = OrderedDict()')
+        self.writer.writeln('""" Outputs of the last MEMO_SIZE calculations by input values """')
+        self.writer.writeln('MEMO_SIZE = {}'.format(self.memoize))
+        self.writer.writeln('MEMO_STATS = {"hits": 0, "misses": 0}')
+        self.writer.writeln('""" Number of calculations found in and missing from _MEMO """')
+
+    def _write_memo_lookup(self, prefix, key, calculate, restore):
+        """ Write the LRU lookup of the outputs of a calculation, the
+            callbacks write the code run on a miss and on a hit
+        """
+        self.writer.writeln('key = {}'.format(key))
+        self.writer.writeln('outputs = {}_MEMO.pop(key, None)'.format(prefix))
+        with self.writer.indent('if outputs is None'):
+            self.writer.writeln('{}MEMO_STATS["misses"] += 1'.format(prefix))
+            calculate()
+            with self.writer.indent('if len({0}_MEMO) >= {0}MEMO_SIZE'.format(prefix)):
+                self.writer.writeln('{}_MEMO.popitem(last=False)'.format(prefix))
+        with self.writer.indent('else'):
+            self.writer.writeln('{}MEMO_STATS["hits"] += 1'.format(prefix))
+            restore()
+        # the most recently used entry is the last one
+        self.writer.writeln('{}_MEMO[key] = outputs'.format(prefix))
+
+    def _write_memo_main(self):
+        """ Write a MAIN returning the outputs of an earlier calculation
+            with the same inputs, the PAP's MAIN becomes _main_uncached
+        """
+        self.writer.nl()
+        self._write_memo_attributes()
+        self.writer.nl()
+        outputs = self._tuple(['self.{}'.format(var.name) for var in self.parser.output_vars])
+
+        def calculate():
+            self.writer.writeln('self._main_uncached()')
+            self.writer.writeln('outputs = {}'.format(outputs))
+
+        def restore():
+            self.writer.writeln('{} = outputs'.format(outputs))
+        with self.writer.indent('def MAIN(self)'):
+            self._write_memo_lookup(
+                '{}.'.format(self.class_name),
+                self._tuple(['self.{}'.format(var.name) for var in self.parser.input_vars]),
+                calculate,
+                restore
+            )
+
+    def _write_method(self, method, name=None):
         self.writer.nl()
-        with self.writer.indent('def {}(self)'.format(method.name)):
+        with self.writer.indent('def {}(self)'.format(name or method.name)):
             if method.comment:
                 self._write_comment(method.comment, False)
             self._write_stmt_body(method)
@@ -130,9 +366,12 @@ class PythonGenerator(BaseGenerator):
     def _write_stmt_body(self, stmt):
         for part in stmt.body:
             if isinstance(part, EvalStmt):
-                self.writer.writeln(self._convert_exec(part.expr))
+                if self.fixed:
+                    self.writer.writeln(self.fixed.assignment(part))
+                else:
+                    self.writer.writeln(self._convert_exec(part.expr))
             elif isinstance(part, ExecuteStmt):
-                self.writer.writeln('self.{}()'.format(part.method_name))
+                self._write_execute(part)
             elif isinstance(part, IfStmt):
                 self._write_if(part)
             elif isinstance(part, ElseStmt):
@@ -144,11 +383,147 @@ class PythonGenerator(BaseGenerator):
                 else:
                     self.writer.writeln('pass')
 
+    def _write_execute(self, stmt):
+        if self.mode == 'class':
+            self.writer.writeln('self.{}()'.format(stmt.method_name))
+            return
+        if stmt.method_name in self._inlined:
+            method = self.effects.methods[stmt.method_name]
+            self.writer.writeln('# {}'.format(stmt.method_name))
+            self._write_stmt_body(method)
+            return
+        (params, results) = self._helper_signature(stmt.method_name)
+        call = '_{}({})'.format(stmt.method_name, ', '.join(params))
+        if results:
+            call = '{} = {}'.format(self._tuple(results), call)
+        self.writer.writeln(call)
+
+    def _condition(self, stmt):
+        if self.profile:
+            return self._profiled_condition(stmt)
+        if self.fixed:
+            return self.fixed.condition(stmt)
+        return self._convert_if(stmt.condition)
+
+    def _condition_operands(self, stmt):
+        """ (operator, operand codes) of a top-level && or || condition """
+        if self.fixed:
+            return self.fixed.condition_operands(stmt)
+        node = parse_condition_stmt(remove_size_literal(stmt.condition))
+        if not isinstance(node, ast.BoolOp):
+            return None
+        oper = self.bool_and if isinstance(node.op, ast.And) else self.bool_or
+        return (' {} '.format(oper), [''.join(self.to_code(value)) for value in node.values])
+
+    def _profiled_condition(self, stmt):
+        """ Condition counting its results and the ones of its operands """
+        operands = self._condition_operands(stmt)
+        if operands is None:
+            code = self.fixed.condition(stmt) if self.fixed else self._convert_if(stmt.condition)
+        else:
+            code = operands[0].join(
+                "_branch('{}.{}', {})".format(stmt.branch_id, idx, value)
+                for (idx, value) in enumerate(operands[1])
+            )
+        return "_branch('{}', {})".format(stmt.branch_id, code)
+
     def _write_if(self, stmt):
-        converted = self._convert_if(stmt.condition)
-        with self.writer.indent('if {}'.format(converted)):
+        chain = self._switch_chain(stmt)
+        if chain is not None and self.profile:
+            # the profile counts the results of every condition
+            self._write_elif_chain(stmt)
+            return
+        if chain is not None:
+            self._write_dispatch(*chain)
+            return
+        with self.writer.indent('if {}'.format(self._condition(stmt))):
             self._write_stmt_body(stmt)
 
+    def _write_dispatch(self, name, cases, default):
+        """ Write a switch as a lookup of the case function by value in a
+            dict, python lacks a switch statement (and match compares
+            the cases one by one)
+        """
+        self._switch_count += 1
+        number = self._switch_count
+        subject = ''.join(self.to_code(ast.Name(id=name, ctx=ast.Load())))
+        signature = None
+        if self.mode == 'class':
+            self.writer.writeln('_case = self._SWITCH{}.get({})'.format(number, subject))
+            call = '_case(self)'
+        else:
+            (reads, writes) = (set(), set())
+            for (_, body) in cases:
+                (body_reads, body_writes) = self.effects.body_effects(_branch(body))
+                reads |= body_reads
+                writes |= body_writes
+            params = [var for var in self._var_names if var in reads or var in writes]
+            results = [var for var in self._var_names if var in writes]
+            signature = (params, results)
+            self.writer.writeln('_case = _SWITCH{}.get({})'.format(number, subject))
+            call = '_case({})'.format(', '.join(params))
+            if results:
+                call = '{} = {}'.format(self._tuple(results), call)
+        self._switches.append((number, cases, signature))
+        with self.writer.indent('if _case is not None'):
+            self.writer.writeln(call)
+        if default:
+            with self.writer.indent('else'):
+                self._write_stmt_body(_branch(default))
+
+    def _write_switch_tables(self):
+        """ Write the case functions of the dispatches written so far
+            and their tables
+        """
+        tables = []
+        while self._switches:
+            (number, cases, signature) = self._switches.pop(0)
+            for (idx, (_, body)) in enumerate(cases):
+                name = '_switch{}_{}'.format(number, idx + 1)
+                if signature is None:
+                    self.writer.nl()
+                    with self.writer.indent('def {}(self)'.format(name)):
+                        self._write_stmt_body(_branch(body))
+                        if not body:
+                            self.writer.writeln('pass')
+                    continue
+                (params, results) = signature
+                self.writer.nl(2)
+                with self.writer.indent('def {}({})'.format(name, ', '.join(params))):
+                    self._write_stmt_body(_branch(body))
+                    if results:
+                        self.writer.writeln('return {}'.format(self._tuple(results)))
+                    elif not body:
+                        self.writer.writeln('pass')
+            tables.append((number, cases))
+        for (number, cases) in tables:
+            self.writer.nl(1 if self.mode == 'class' else 2)
+            self.writer.writeln('_SWITCH{} = {{{}}}'.format(number, ', '.join(
+                '{}: _switch{}_{}'.format(value, number, idx + 1)
+                for (idx, (values, _)) in enumerate(cases) for value in values
+            )))
+            self.writer.writeln('""" Case functions by value """')
+
+    def _write_elif_chain(self, stmt):
+        """ Write a chain of IF statements in ELSE branches as if/elif/else """
+        keyword = 'if'
+        while True:
+            then = [part for part in stmt.body if isinstance(part, ThenStmt) and part.body]
+            with self.writer.indent('{} {}'.format(keyword, self._condition(stmt))):
+                if then:
+                    self._write_stmt_body(then[0])
+                else:
+                    self.writer.writeln('pass')
+            following = self._else_if(stmt)
+            if following is None:
+                break
+            stmt = following
+            keyword = 'elif'
+        for part in stmt.body:
+            if isinstance(part, ElseStmt) and part.body:
+                with self.writer.indent('else'):
+                    self._write_stmt_body(part)
+
     def _write_else(self, stmt):
         if not stmt.body:
             # avoid empty else stmts
@@ -158,10 +533,134 @@ class PythonGenerator(BaseGenerator):
         self.writer.inc_indent()
         self._write_stmt_body(stmt)
 
+    def _helper_signature(self, method_name):
+        """ Parameters and results of the function generated for a method """
+        reads = self.effects.reads[method_name]
+        writes = self.effects.writes[method_name]
+        params = [name for name in self._var_names if name in reads or name in writes]
+        results = [name for name in self._var_names if name in writes]
+        return (params, results)
+
+    def _generate_function(self):
+        self.effects = MethodEffects(self.parser)
+        self._var_names = [
+            var.name for (variables, _) in self._all_vars() for var in variables
+        ]
+        # methods executed from a single place are inlined, the others
+        # become helper functions receiving and returning their state
+        self._inlined = set(
+            name for (name, count) in self.effects.call_sites().items()
+            if count == 1 and not self.effects.is_recursive(name)
+        )
+        result_class = '{}Result'.format(self.class_name)
+        self._write_preamble()
+        self.writer.writeln('from collections import namedtuple')
+        self.writer.nl()
+        for const in self.parser.constants:
+            self.writer.writeln('{const.name} = {converted}'.format(
+                const=const, converted=self._convert_const(const)
+            ))
+            if const.comment is not None:
+                self._write_comment(const.comment, False)
+                self.writer.nl()
+        self.writer.nl()
+        self.writer.writeln('{} = namedtuple("{}", ({}))'.format(
+            result_class,
+            result_class,
+            ''.join('"{}", '.format(var.name) for var in self.parser.output_vars)
+        ))
+        self.writer.nl()
+        with self._bracketed('_DEFAULTS = (', ')'):
+            for (variables, comment) in self._all_vars()[1:]:
+                self.writer.writeln('# ' + comment)
+                for var in variables:
+                    if var.comment is not None:
+                        self._write_comment(var.comment, True)
+                    self.writer.writeln('{},  # {}'.format(self._default_value(var), var.name))
+        self.writer.writeln('""" Default values of output and internal variables """')
+        for method in self.parser.methods:
+            if method.name not in self._inlined:
+                self._write_helper(method)
+        self.writer.nl(2)
+        with self._bracketed('def {}('.format('_compute' if self.memoize else 'compute'), '):'):
+            for var in self.parser.input_vars:
+                self.writer.writeln('{}=None,'.format(var.name))
+        self.writer.inc_indent()
+        self.writer.writeln('"""')
+        self.writer.writeln('Calculate {} and return a {}'.format(
+            self.parser.internal_name or self.class_name, result_class
+        ))
+        self.writer.writeln('"""')
+        for var in self.parser.input_vars:
+            self.writer.writeln('{name} = {default} if {name} is None else {value}'.format(
+                name=var.name,
+                default=self._default_value(var),
+                value=self._convert_input(var, var.name)
+            ))
+        with self._bracketed('(', ') = _DEFAULTS'):
+            for (variables, comment) in self._all_vars()[1:]:
+                for var in variables:
+                    self.writer.writeln('{},'.format(var.name))
+        if self.parser.main_method.comment:
+            self._write_comment(self.parser.main_method.comment, True)
+        self._write_stmt_body(self.parser.main_method)
+        outputs = [self._output_value(var, var.name) for var in self.parser.output_vars]
+        self.writer.writeln('return {}({})'.format(result_class, ', '.join(outputs)))
+        self.writer.dec_indent()
+        if self.memoize:
+            self._write_memo_compute(result_class)
+        self._write_switch_tables()
+
+    def _write_memo_compute(self, result_class):
+        """ Write a compute() returning the result of an earlier
+            calculation with the same inputs
+        """
+        names = [var.name for var in self.parser.input_vars]
+        self.writer.nl(2)
+        self._write_memo_attributes()
+        self.writer.nl(2)
+        with self._bracketed('def compute(', '):'):
+            for name in names:
+                self.writer.writeln('{}=None,'.format(name))
+        self.writer.inc_indent()
+        self.writer.writeln('"""')
+        self.writer.writeln('Calculate {} and return a {}, the results of the'.format(
+            self.parser.internal_name or self.class_name, result_class
+        ))
+        self.writer.writeln('last MEMO_SIZE distinct inputs are kept')
+        self.writer.writeln('"""')
+        self._write_memo_lookup(
+            '',
+            self._tuple(names),
+            lambda: self.writer.writeln('outputs = _compute({})'.format(', '.join(names))),
+            lambda: None
+        )
+        self.writer.writeln('return outputs')
+        self.writer.dec_indent()
+
+    @staticmethod
+    def _tuple(items):
+        """ Code for a tuple of names """
+        if len(items) == 1:
+            return '({},)'.format(items[0])
+        return '({})'.format(', '.join(items))
+
+    def _write_helper(self, method):
+        (params, results) = self._helper_signature(method.name)
+        self.writer.nl(2)
+        with self.writer.indent('def _{}({})'.format(method.name, ', '.join(params))):
+            if method.comment:
+                self._write_comment(method.comment, False)
+            self._write_stmt_body(method)
+            if results:
+                self.writer.writeln('return {}'.format(self._tuple(results)))
+            elif not method.body:
+                self.writer.writeln('pass')
+
     def _convert_exec(self, expr):
         expr = remove_size_literal(expr)
         (var, parsed_stmt) = parse_eval_stmt(expr)
-        ret = ['self.', var, ' = ']
+        ret = [self.inst_prefix, var, ' = ']
         ret += self.to_code(parsed_stmt)
         return ''.join(ret)
 
@@ -170,6 +669,19 @@ class PythonGenerator(BaseGenerator):
         compare_stmt = parse_condition_stmt(expr)
         return ''.join(self.to_code(compare_stmt))
 
+    def _conv_decimal_comp(self, node):
+        """ decimal.Decimal supports the comparison operators """
+        if self.lowering:
+            return self.lowering.convert_compare(node)
+        return self._conv_comp(node)
+
+    def _conv_call(self, node):
+        if self.lowering:
+            lowered = self.lowering.convert_call(node)
+            if lowered is not None:
+                return lowered
+        return super(PythonGenerator, self)._conv_call(node)
+
     def convert_to_python(self, value):
         """ Convert a java-like expression to valid python code """
         value = remove_size_literal(value)
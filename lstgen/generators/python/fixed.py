@@ -0,0 +1,674 @@
+# coding: utf-8
+"""
+Fixed point lowering for the python generator.
+
+Every BigDecimal (and double) value is represented by a plain python
+integer scaled by ``10 ** scale``. The scale of every expression is
+known at generation time, so the generated code never tracks scales at
+runtime and all rounding is done with exact integer division.
+
+A variable does not need a single scale for the whole calculation:
+assignments are grouped by the reads they reach (reaching definitions
+across EXECUTE'd methods), and every group stores its values with the
+largest scale assigned within the group. This keeps idioms like
+``RW = RW.multiply(Y)`` representable.
+"""
+import ast
+import decimal
+from collections import namedtuple
+from fractions import Fraction
+
+from ... import (
+    prepare_expr,
+    parse_eval_stmt,
+    parse_condition_stmt,
+    remove_size_literal
+)
+from ... import (
+    EvalStmt,
+    IfStmt,
+    ThenStmt,
+    ElseStmt,
+    ExecuteStmt,
+)
+
+FixedExpr = namedtuple('FixedExpr', ('code', 'kind', 'scale'))
+""" Converted expression: python code, kind ("int", "decimal", "array"
+    or "bool") and the scale of the integer(s) the code evaluates to.
+"""
+
+MAX_SCALE = 100
+""" Give up if a value needs more decimal places than this """
+
+DECIMAL_TYPES = ('BigDecimal', 'double')
+
+BD_CONSTANTS = {
+    'ZERO': 0,
+    'ONE': 1,
+    'TEN': 10,
+}
+
+CMP_OPS = {
+    ast.Lt: '<',
+    ast.LtE: '<=',
+    ast.Gt: '>',
+    ast.GtE: '>=',
+    ast.Eq: '==',
+    ast.NotEq: '!=',
+}
+
+ARITH_OPS = {
+    ast.Add: '+',
+    ast.Sub: '-',
+}
+
+
+def decimal_scale(value):
+    """ Number of decimal places of a Decimal """
+    return max(0, -value.as_tuple().exponent)
+
+def scaled_int(value, scale):
+    """ Exactly convert a Decimal to an integer scaled by 10**scale """
+    (sign, digits, exponent) = value.as_tuple()
+    num = int(''.join(str(digit) for digit in digits))
+    shift = exponent + scale
+    if shift < 0:
+        raise ValueError("{} has more than {} decimal places".format(value, scale))
+    num *= 10 ** shift
+    return -num if sign else num
+
+
+def exact_quotient(num, den):
+    """ num / den like java's BigDecimal.divide(BigDecimal), None if the
+        quotient has no finite decimal representation
+    """
+    quotient = Fraction(num) / Fraction(den)
+    (rest, twos, fives) = (quotient.denominator, 0, 0)
+    while rest % 2 == 0:
+        rest //= 2
+        twos += 1
+    while rest % 5 == 0:
+        rest //= 5
+        fives += 1
+    if rest != 1:
+        return None
+    places = max(twos, fives)
+    value = quotient.numerator * (10 ** places // quotient.denominator)
+    return decimal.Decimal(value).scaleb(-places)
+
+
+class FixedPointConverter(object):
+    """ Converts PAP expressions to python integer arithmetic """
+
+    def __init__(self, parser, class_name, instance_var='self', input_scale=3):
+        self.parser = parser
+        self.class_name = class_name
+        self.instance_var = instance_var
+        self.input_scale = input_scale
+        self.var_types = {}
+        for var in parser.input_vars + parser.output_vars + parser.internal_vars:
+            self.var_types[var.name] = var.type
+        self.const_values = {}
+        self.const_scales = {}
+        for const in parser.constants:
+            value = self._const_value(const)
+            self.const_values[const.name] = value
+            if isinstance(value, list):
+                self.const_scales[const.name] = max(decimal_scale(val) for val in value)
+            else:
+                self.const_scales[const.name] = decimal_scale(value)
+        self._methods = dict((method.name, method) for method in parser.methods)
+        self._parsed = {}
+        self._reads = {}
+        self._exit_defs = {}
+        self._parents = {}
+        self._def_scales = {}
+        self._group_scales = {}
+        self._analyze()
+
+    @staticmethod
+    def _parse(value):
+        tree = ast.parse(prepare_expr(remove_size_literal(value)))
+        return tree.body[0].value
+
+    def _const_value(self, const):
+        value = const.value
+        if const.type.endswith('[]'):
+            node = self._parse('[{}]'.format(value[1:-1]))
+            values = [self.literal_value(elt) for elt in node.elts]
+            if None in values:
+                raise NotImplementedError(
+                    "Unsupported array constant {}".format(const.name))
+            return values
+        ret = self.literal_value(self._parse(value))
+        if ret is None:
+            raise NotImplementedError("Unsupported constant {}".format(const.name))
+        return ret
+
+    def literal_value(self, node):
+        """ Return the Decimal value of a constant expression or None """
+        if isinstance(node, ast.Num) and not isinstance(node.n, bool):
+            if isinstance(node.n, float):
+                return decimal.Decimal(repr(node.n))
+            return decimal.Decimal(node.n)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            value = self.literal_value(node.operand)
+            return -value if value is not None else None
+        if isinstance(node, ast.Attribute) and node.attr in BD_CONSTANTS:
+            return decimal.Decimal(BD_CONSTANTS[node.attr])
+        if isinstance(node, ast.Name) and isinstance(self.const_values.get(node.id), decimal.Decimal):
+            return self.const_values[node.id]
+        if isinstance(node, ast.Call) and len(node.args) == 1:
+            arg = node.args[0]
+            if isinstance(node.func, ast.Attribute) and node.func.attr == 'valueOf':
+                return self.literal_value(arg)
+            if isinstance(node.func, ast.Attribute) and node.func.attr == 'divide':
+                # constant quotients are folded with java's semantics
+                num = self.literal_value(node.func.value)
+                den = self.literal_value(arg)
+                if num is None or not den:
+                    return None
+                return exact_quotient(num, den)
+            if isinstance(node.func, ast.Name) and node.func.id == 'BigDecimalConstructor':
+                if isinstance(arg, ast.Num) and isinstance(arg.n, float):
+                    # new BigDecimal(double) is the exact binary fraction
+                    return decimal.Decimal(arg.n)
+                if isinstance(arg, ast.Str):
+                    return decimal.Decimal(arg.s)
+                return self.literal_value(arg)
+        return None
+
+    def _is_decimal_var(self, name):
+        return self.var_types.get(name) in DECIMAL_TYPES
+
+    def _parsed_stmt(self, stmt):
+        """ Parsed (target, node) of an EvalStmt or (None, node) of an IfStmt """
+        key = id(stmt)
+        if key not in self._parsed:
+            if isinstance(stmt, EvalStmt):
+                self._parsed[key] = parse_eval_stmt(remove_size_literal(stmt.expr))
+            else:
+                self._parsed[key] = (None, parse_condition_stmt(remove_size_literal(stmt.condition)))
+        return self._parsed[key]
+
+    def _decimal_reads(self, node):
+        return set(
+            sub.id for sub in ast.walk(node)
+            if isinstance(sub, ast.Name) and self._is_decimal_var(sub.id)
+        )
+
+    def _record_reads(self, stmt, node, state):
+        for name in self._decimal_reads(node):
+            self._reads.setdefault((id(stmt), name), set()).update(state[name])
+
+    def _walk(self, stmt, state):
+        """ Reaching definitions: state maps each decimal variable to
+            the set of definitions (EvalStmts or initial values) that
+            may have produced its current value
+        """
+        for part in stmt.body:
+            if isinstance(part, EvalStmt):
+                (target, node) = self._parsed_stmt(part)
+                self._record_reads(part, node, state)
+                if self._is_decimal_var(target):
+                    state[target] = frozenset([part])
+            elif isinstance(part, IfStmt):
+                self._record_reads(part, self._parsed_stmt(part)[1], state)
+                branches = [sub for sub in part.body if isinstance(sub, (ThenStmt, ElseStmt))]
+                states = [self._walk(branch, dict(state)) for branch in branches]
+                if not any(isinstance(branch, ElseStmt) for branch in branches):
+                    states.append(state)
+                state = dict(
+                    (name, frozenset().union(*[sub[name] for sub in states]))
+                    for name in state
+                )
+            elif isinstance(part, ExecuteStmt):
+                state = self._walk(self._methods[part.method_name], state)
+            elif isinstance(part, (ThenStmt, ElseStmt)):
+                state = self._walk(part, state)
+        return state
+
+    def _find(self, defn):
+        parent = self._parents.setdefault(defn, defn)
+        if parent is defn:
+            return defn
+        root = self._parents[defn] = self._find(parent)
+        return root
+
+    def _union(self, defs):
+        defs = list(defs)
+        root = self._find(defs[0])
+        for defn in defs[1:]:
+            other = self._find(defn)
+            if other is not root:
+                self._parents[other] = root
+
+    def _init_def(self, name):
+        return ('init', name)
+
+    def _analyze(self):
+        names = [name for name in self.var_types if self._is_decimal_var(name)]
+        initial = dict((name, frozenset([self._init_def(name)])) for name in names)
+        # an instance may be reused, so values left by a previous
+        # calculation reach the start of the next one as well
+        entry = initial
+        while True:
+            exit_state = self._walk(self.parser.main_method, dict(entry))
+            next_entry = dict((name, initial[name] | exit_state[name]) for name in names)
+            if next_entry == entry:
+                break
+            entry = next_entry
+        self._exit_defs = entry
+
+        for defs in self._reads.values():
+            self._union(defs)
+        for var in self.parser.output_vars:
+            if self._is_decimal_var(var.name):
+                # getters read whatever reaches the end of a calculation
+                self._union(entry[var.name])
+
+        for var in self.parser.input_vars + self.parser.output_vars + self.parser.internal_vars:
+            if not self._is_decimal_var(var.name):
+                continue
+            scale = 0
+            default = self.literal_value(self._parse(var.default))
+            if default is not None:
+                scale = decimal_scale(default)
+            if var in self.parser.input_vars:
+                scale = max(scale, self.input_scale)
+            self._set_def_scale(self._init_def(var.name), scale)
+
+        defs = []
+        for method in [self.parser.main_method] + self.parser.methods:
+            defs += self._eval_stmts(method)
+        changed = True
+        while changed:
+            changed = False
+            for stmt in defs:
+                (target, node) = self._parsed_stmt(stmt)
+                if not self._is_decimal_var(target):
+                    continue
+                scale = self.expr(node, self._read_scales(stmt, node)).scale
+                if self._set_def_scale(stmt, scale):
+                    changed = True
+
+    def _eval_stmts(self, stmt):
+        ret = []
+        for part in stmt.body:
+            if isinstance(part, EvalStmt):
+                ret.append(part)
+            elif isinstance(part, (IfStmt, ThenStmt, ElseStmt)):
+                ret += self._eval_stmts(part)
+        return ret
+
+    def _set_def_scale(self, defn, scale):
+        if scale > MAX_SCALE:
+            raise NotImplementedError("Values need more than {} decimal places".format(MAX_SCALE))
+        if scale <= self._def_scales.get(defn, -1):
+            return False
+        self._def_scales[defn] = scale
+        root = self._find(defn)
+        if scale > self._group_scales.get(root, -1):
+            self._group_scales[root] = scale
+        return True
+
+    def _group_scale(self, defn):
+        return self._group_scales.get(self._find(defn), 0)
+
+    def _read_scales(self, stmt, node):
+        """ Scales of all decimal variables read by a statement """
+        scales = {}
+        for name in self._decimal_reads(node):
+            defs = self._reads.get((id(stmt), name))
+            # statements unreachable from MAIN read the initial value
+            defn = next(iter(defs)) if defs else self._init_def(name)
+            scales[name] = self._group_scale(defn)
+        return scales
+
+    def scale_of(self, name):
+        """ Scale of a variable's initial value (as set by setters and
+            constructors) or of an output after a calculation
+        """
+        return self._group_scale(self._init_def(name))
+
+    def _var_code(self, name):
+        if name in self.const_values:
+            if not self.class_name:
+                return name
+            return '{}.{}'.format(self.class_name, name)
+        if self.instance_var:
+            return '{}.{}'.format(self.instance_var, name)
+        return name
+
+    bool_and = ' and '
+    """ Boolean AND operator """
+
+    bool_or = ' or '
+    """ Boolean OR operator """
+
+    @staticmethod
+    def _mul(left, right):
+        """ Code for the product of two integer expressions """
+        return '({} * {})'.format(left, right)
+
+    @staticmethod
+    def _subscript(array, index):
+        """ Code for an element of an array constant """
+        return '{}[{}]'.format(array, index)
+
+    @staticmethod
+    def _compare(left, oper, right):
+        """ Code for a comparison of two integer expressions """
+        return '{} {} {}'.format(left, oper, right)
+
+    @staticmethod
+    def _array(values):
+        """ Code for an array of integers calculated at generation time """
+        return '({},)'.format(', '.join(str(value) for value in values))
+
+    def rescale(self, fexpr, scale):
+        """ Scale up an expression to the given scale """
+        if fexpr.kind == 'int':
+            fexpr = FixedExpr(fexpr.code, 'decimal', 0)
+        if fexpr.scale > scale:
+            raise ValueError("Cannot reduce scale of {} implicitly".format(fexpr.code))
+        if fexpr.scale == scale:
+            return fexpr
+        factor = 10 ** (scale - fexpr.scale)
+        if fexpr.code.lstrip('-').isdigit():
+            return FixedExpr(str(int(fexpr.code) * factor), 'decimal', scale)
+        return FixedExpr(
+            self._mul(fexpr.code, factor),
+            'decimal',
+            scale
+        )
+
+    def _align(self, left, right):
+        scale = max(left.scale, right.scale)
+        return (self.rescale(left, scale), self.rescale(right, scale))
+
+    def _round(self, num, den, rounding):
+        helper = {
+            'ROUND_DOWN': 'div_down',
+            'ROUND_UP': 'div_up',
+        }.get(rounding)
+        if helper is None:
+            raise NotImplementedError("Unsupported rounding mode {}".format(rounding))
+        return '{}({}, {})'.format(helper, num, den)
+
+    @staticmethod
+    def _rounding(node):
+        if isinstance(node, ast.Attribute):
+            return node.attr
+        raise NotImplementedError("Unsupported rounding argument {}".format(ast.dump(node)))
+
+    @staticmethod
+    def _int_arg(node):
+        if isinstance(node, ast.Num) and isinstance(node.n, int):
+            return node.n
+        raise NotImplementedError("Scale must be an integer literal")
+
+    def _divide(self, left, right, scale, rounding):
+        """ left / right rounded to scale decimal places """
+        shift = right.scale + scale - left.scale
+        if shift >= 0:
+            num = self.rescale(left, left.scale + shift).code
+            den = right.code
+        else:
+            num = left.code
+            den = self.rescale(right, right.scale - shift).code
+        return FixedExpr(self._round(num, den, rounding), 'decimal', scale)
+
+    def _set_scale(self, value, scale, rounding):
+        if scale >= value.scale:
+            return self.rescale(value, scale)
+        code = self._round(value.code, 10 ** (value.scale - scale), rounding)
+        return FixedExpr(code, 'decimal', scale)
+
+    def _exact_divide(self, left, divisor):
+        """ Exact division by a constant whose reciprocal is a finite decimal """
+        if not divisor:
+            raise ZeroDivisionError("Division by constant zero")
+        (sign, digits, exponent) = divisor.normalize().as_tuple()
+        num = int(''.join(str(digit) for digit in digits))
+        twos = fives = 0
+        while num % 2 == 0:
+            num //= 2
+            twos += 1
+        while num % 5 == 0:
+            num //= 5
+            fives += 1
+        if num != 1:
+            raise NotImplementedError(
+                "Division by {} has no finite decimal representation".format(divisor))
+        # 1 / (2**twos * 5**fives) == factor / 10**shift
+        shift = max(twos, fives)
+        factor = 2 ** (shift - twos) * 5 ** (shift - fives)
+        scale = left.scale + shift + exponent
+        if scale < 0:
+            factor *= 10 ** -scale
+            scale = 0
+        code = left.code
+        if factor != 1:
+            code = self._mul(code, factor)
+        if sign:
+            code = '(-{})'.format(code)
+        return FixedExpr(code, 'decimal', scale)
+
+    def _array_quotient(self, node, divisor, scales):
+        """ Fold the division of an element of an array constant by a
+            constant into an array of the quotients, None if the node
+            is no such element or a quotient has no finite decimal
+            representation
+        """
+        if not isinstance(node, ast.Subscript) or not isinstance(node.value, ast.Name):
+            return None
+        values = self.const_values.get(node.value.id)
+        if not isinstance(values, list):
+            return None
+        quotients = [exact_quotient(value, divisor) for value in values]
+        if None in quotients:
+            return None
+        scale = max(decimal_scale(value) for value in quotients)
+        array = self._array([scaled_int(value, scale) for value in quotients])
+        index = self.expr(self._index(node), scales)
+        return FixedExpr(self._subscript(array, index.code), 'decimal', scale)
+
+    @staticmethod
+    def _index(node):
+        try:
+            return node.slice.value
+        except AttributeError:
+            # python3.9 deprecated the ast.Index class for slices
+            return node.slice
+
+    def _conv_call(self, node, scales):
+        func = node.func
+        if isinstance(func, ast.Name) and func.id == 'BigDecimalConstructor' or (
+                isinstance(func, ast.Attribute) and func.attr == 'valueOf'):
+            value = self.literal_value(node)
+            if value is not None:
+                scale = decimal_scale(value)
+                return FixedExpr(str(scaled_int(value, scale)), 'decimal', scale)
+            arg = self.expr(node.args[0], scales)
+            return FixedExpr(arg.code, 'decimal', arg.scale)
+
+        if not isinstance(func, ast.Attribute):
+            raise NotImplementedError("Unsupported call {}".format(ast.dump(node)))
+        method = func.attr
+        args = node.args
+        if method == 'divide' and len(args) == 1:
+            divisor = self.literal_value(args[0])
+            if divisor is None:
+                raise NotImplementedError(
+                    "divide() without scale needs a constant divisor, use divide(x, scale, rounding)")
+            if not divisor:
+                raise ZeroDivisionError("Division by constant zero")
+            quotient = self.literal_value(node)
+            if quotient is not None:
+                scale = decimal_scale(quotient)
+                return FixedExpr(str(scaled_int(quotient, scale)), 'decimal', scale)
+            # e.g. TAB2[J].divide(ZAHL12), exact for every element in java
+            folded = self._array_quotient(func.value, divisor, scales)
+            if folded is not None:
+                return folded
+            return self._exact_divide(self.expr(func.value, scales), divisor)
+        if method == 'setScale' and isinstance(func.value, ast.Call) and \
+                isinstance(func.value.func, ast.Attribute) and \
+                func.value.func.attr == 'divide' and len(func.value.args) == 1 and \
+                self.literal_value(func.value.args[0]) is None:
+            # x.divide(y).setScale(n, r) with a variable divisor: round the exact quotient
+            inner = func.value
+            return self._divide(
+                self.expr(inner.func.value, scales),
+                self.expr(inner.args[0], scales),
+                self._int_arg(args[0]),
+                self._rounding(args[1])
+            )
+
+        value = self.expr(func.value, scales)
+        if method in ('add', 'subtract'):
+            (left, right) = self._align(value, self.expr(args[0], scales))
+            oper = '+' if method == 'add' else '-'
+            return FixedExpr('({} {} {})'.format(left.code, oper, right.code), 'decimal', left.scale)
+        if method == 'multiply':
+            other = self.expr(args[0], scales)
+            return FixedExpr(
+                self._mul(value.code, other.code),
+                'decimal',
+                value.scale + other.scale
+            )
+        if method == 'divide':
+            return self._divide(
+                value,
+                self.expr(args[0], scales),
+                self._int_arg(args[1]),
+                self._rounding(args[2])
+            )
+        if method == 'setScale':
+            return self._set_scale(value, self._int_arg(args[0]), self._rounding(args[1]))
+        if method == 'compareTo':
+            (left, right) = self._align(value, self.expr(args[0], scales))
+            return FixedExpr('compare({}, {})'.format(left.code, right.code), 'int', 0)
+        if method in ('longValue', 'intValue'):
+            if value.scale == 0:
+                return FixedExpr(value.code, 'int', 0)
+            return FixedExpr(self._round(value.code, 10 ** value.scale, 'ROUND_DOWN'), 'int', 0)
+        raise NotImplementedError("Unsupported BigDecimal method {}".format(method))
+
+    def expr(self, node, scales):
+        """ Convert an AST node to a FixedExpr, scales maps the decimal
+            variables read by the node to their current scale
+        """
+        if isinstance(node, ast.Name):
+            if node.id in self.const_values:
+                value = self.const_values[node.id]
+                if isinstance(value, list):
+                    return FixedExpr(self._var_code(node.id), 'array', self.const_scales[node.id])
+                scale = decimal_scale(value)
+                return FixedExpr(str(scaled_int(value, scale)), 'decimal', scale)
+            vartype = self.var_types.get(node.id)
+            if vartype in DECIMAL_TYPES:
+                return FixedExpr(self._var_code(node.id), 'decimal', scales[node.id])
+            if vartype == 'int':
+                return FixedExpr(self._var_code(node.id), 'int', 0)
+            raise NotImplementedError("Unsupported variable {} ({})".format(node.id, vartype))
+
+        if isinstance(node, ast.Num):
+            if isinstance(node.n, float):
+                value = decimal.Decimal(repr(node.n))
+                scale = decimal_scale(value)
+                return FixedExpr(str(scaled_int(value, scale)), 'decimal', scale)
+            return FixedExpr(str(node.n), 'int', 0)
+
+        if isinstance(node, ast.Attribute) and node.attr in BD_CONSTANTS:
+            return FixedExpr(str(BD_CONSTANTS[node.attr]), 'decimal', 0)
+
+        if isinstance(node, ast.Call):
+            return self._conv_call(node, scales)
+
+        if isinstance(node, ast.Subscript):
+            array = self.expr(node.value, scales)
+            if array.kind != 'array':
+                raise NotImplementedError("Subscript of non-array {}".format(array.code))
+            idx = self.expr(self._index(node), scales)
+            return FixedExpr(self._subscript(array.code, idx.code), 'decimal', array.scale)
+
+        if isinstance(node, ast.UnaryOp):
+            operand = self.expr(node.operand, scales)
+            if isinstance(node.op, ast.USub):
+                return FixedExpr('(-{})'.format(operand.code), operand.kind, operand.scale)
+            return operand
+
+        if isinstance(node, ast.BinOp):
+            left = self.expr(node.left, scales)
+            right = self.expr(node.right, scales)
+            if left.kind != 'int' or right.kind != 'int':
+                raise NotImplementedError("Arithmetic operators are only supported for integers")
+            if isinstance(node.op, ast.Div):
+                # java's integer division truncates
+                return FixedExpr(self._round(left.code, right.code, 'ROUND_DOWN'), 'int', 0)
+            if isinstance(node.op, ast.Mult):
+                return FixedExpr(self._mul(left.code, right.code), 'int', 0)
+            oper = ARITH_OPS.get(type(node.op))
+            if oper is None:
+                raise NotImplementedError("Unsupported operator {}".format(ast.dump(node.op)))
+            return FixedExpr('({} {} {})'.format(left.code, oper, right.code), 'int', 0)
+
+        if isinstance(node, ast.Compare):
+            left = self.expr(node.left, scales)
+            right = self.expr(node.comparators[0], scales)
+            if left.kind != 'int' or right.kind != 'int':
+                (left, right) = self._align(left, right)
+            oper = CMP_OPS[type(node.ops[0])]
+            return FixedExpr(self._compare(left.code, oper, right.code), 'bool', 0)
+
+        if isinstance(node, ast.BoolOp):
+            oper = self.bool_and if isinstance(node.op, ast.And) else self.bool_or
+            values = [self.expr(value, scales).code for value in node.values]
+            return FixedExpr('({})'.format(oper.join(values)), 'bool', 0)
+
+        raise NotImplementedError(u'Unsupported AST element: {}'.format(ast.dump(node)))
+
+    def assigned_value(self, stmt):
+        """ Return the target code and value code of an EvalStmt """
+        (target, node) = self._parsed_stmt(stmt)
+        value = self.expr(node, self._read_scales(stmt, node))
+        if self._is_decimal_var(target):
+            value = self.rescale(value, self._group_scale(stmt))
+        return (self._var_code(target), value.code)
+
+    def assignment(self, stmt):
+        """ Convert an EvalStmt to a python assignment """
+        return '{} = {}'.format(*self.assigned_value(stmt))
+
+    def condition(self, stmt):
+        """ Convert the condition of an IfStmt to a python expression """
+        node = self._parsed_stmt(stmt)[1]
+        return self.expr(node, self._read_scales(stmt, node)).code
+
+    def condition_operands(self, stmt):
+        """ Return (operator, operand codes) of a top-level && or ||
+            condition of an IfStmt, None for other conditions
+        """
+        node = self._parsed_stmt(stmt)[1]
+        if not isinstance(node, ast.BoolOp):
+            return None
+        scales = self._read_scales(stmt, node)
+        oper = self.bool_and if isinstance(node.op, ast.And) else self.bool_or
+        return (oper, [self.expr(value, scales).code for value in node.values])
+
+    def default(self, var):
+        """ Python code for the default value of a variable """
+        value = self.expr(self._parse(var.default), {})
+        if self._is_decimal_var(var.name):
+            value = self.rescale(value, self.scale_of(var.name))
+        return value.code
+
+    def constant(self, const):
+        """ Python code for a constant (a scaled integer or a list of them) """
+        value = self.const_values[const.name]
+        scale = self.const_scales[const.name]
+        if isinstance(value, list):
+            return '[{}]'.format(', '.join(str(scaled_int(val, scale)) for val in value))
+        return str(scaled_int(value, scale))
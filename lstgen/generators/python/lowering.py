@@ -0,0 +1,182 @@
+# coding: utf-8
+"""
+Lowering of java BigDecimal idioms to native python Decimal operators.
+
+``a.add(b)`` is a python level method call that wraps the result in a
+new BigDecimal, while ``a + b`` is handled by the C implementation of
+the decimal module. As every BigDecimal method used by a PAP has a
+decimal.Decimal operator or method with the same semantics, calls on
+values that are known to be decimals are replaced by these. Literal
+arguments of ``BigDecimal.valueOf`` and scales of ``setScale`` and
+``divide`` are hoisted into module level constants.
+"""
+import ast
+
+from ... import (
+    remove_size_literal,
+    parse_eval_stmt,
+    parse_condition_stmt,
+    EvalStmt,
+    IfStmt,
+    ThenStmt,
+    ElseStmt,
+)
+
+OPERATORS = {
+    'add': '+',
+    'subtract': '-',
+    'multiply': '*',
+}
+
+
+class DecimalLowering(object):
+    """ Converts BigDecimal method calls to Decimal operators for a generator """
+
+    def __init__(self, generator):
+        self.generator = generator
+        self.types = generator.types
+        parser = generator.parser
+        self.values = {}
+        self.scales = {}
+        for method in [parser.main_method] + parser.methods:
+            self._collect(method)
+
+    def _collect(self, stmt):
+        for part in stmt.body:
+            if isinstance(part, EvalStmt):
+                node = parse_eval_stmt(remove_size_literal(part.expr))[1]
+            elif isinstance(part, IfStmt):
+                node = parse_condition_stmt(remove_size_literal(part.condition))
+            else:
+                continue
+            for sub in ast.walk(node):
+                if not isinstance(sub, ast.Call):
+                    continue
+                literal = self._literal(sub)
+                if literal is not None and literal not in self.values:
+                    self.values[literal] = '_BD{}'.format(len(self.values) + 1)
+                scale = self._scale_arg(sub)
+                if scale is not None:
+                    self.scales[scale] = '_SCALE{}'.format(scale)
+            if isinstance(part, IfStmt):
+                for branch in part.body:
+                    if isinstance(branch, (ThenStmt, ElseStmt)):
+                        self._collect(branch)
+
+    @staticmethod
+    def _literal(node):
+        """ Return the python code creating the value of a literal
+            BigDecimal.valueOf() call or None
+        """
+        func = node.func
+        if not (isinstance(func, ast.Attribute) and func.attr == 'valueOf' and
+                isinstance(func.value, ast.Name) and func.value.id == 'BigDecimal'):
+            return None
+        if len(node.args) != 1 or not isinstance(node.args[0], ast.Num):
+            return None
+        value = node.args[0].n
+        if isinstance(value, float):
+            # same as BigDecimal.valueOf(double)
+            return "BigDecimal('{!r}')".format(value)
+        return 'BigDecimal({})'.format(value)
+
+    @staticmethod
+    def _scale_arg(node):
+        func = node.func
+        if not isinstance(func, ast.Attribute):
+            return None
+        if func.attr == 'setScale' and len(node.args) == 2:
+            scale = node.args[0]
+        elif func.attr == 'divide' and len(node.args) == 3:
+            scale = node.args[1]
+        else:
+            return None
+        if isinstance(scale, ast.Num) and isinstance(scale.n, int):
+            return scale.n
+        return None
+
+    def hoisted(self):
+        """ Return (name, code) tuples of module level constants """
+        ret = [(name, code) for (code, name) in self.values.items()]
+        for (scale, name) in sorted(self.scales.items()):
+            ret.append((name, "BigDecimal('1E{}')".format(-scale)))
+        return ret
+
+    def is_decimal(self, node):
+        """ True if a node evaluates to a (Big)Decimal """
+        return self.types.type_of(node) == 'BigDecimal'
+
+    def is_int(self, node):
+        """ True if a node evaluates to an integer """
+        return self.types.is_integral(node)
+
+    def _code(self, node):
+        return ''.join(self.generator.to_code(node))
+
+    def _operand(self, node):
+        """ Code of an operand of a Decimal operator, integers wrapped by
+            BigDecimal.valueOf() are used as they are since Decimal
+            arithmetic with ints is exact
+        """
+        if isinstance(node, ast.Call) and len(node.args) == 1 and \
+                self._literal(node) is None and self.is_int(node.args[0]):
+            func = node.func
+            if isinstance(func, ast.Name) and func.id == 'BigDecimalConstructor' or \
+                    isinstance(func, ast.Attribute) and func.attr == 'valueOf':
+                return self._code(node.args[0])
+        return self._code(node)
+
+    def _quantize(self, value, scale, rounding):
+        if not isinstance(rounding, ast.Attribute) or scale not in self.scales:
+            return None
+        # the decimal module's rounding modes are plain strings
+        return "{}.quantize({}, '{}')".format(value, self.scales[scale], rounding.attr)
+
+    def convert_compare(self, node):
+        """ Return the code of a rewritten compareTo() comparison """
+        return [self._code(node.left)] + self.generator.to_code(node.ops[0]) + \
+            [self._operand(node.comparators[0])]
+
+    def convert_call(self, node):
+        """ Return the lowered code of a call as a list or None if
+            it has to be kept as it is
+        """
+        func = node.func
+        if not isinstance(func, ast.Attribute):
+            return None
+        method = func.attr
+        args = node.args
+        if method == 'valueOf':
+            literal = self._literal(node)
+            if literal in self.values:
+                return [self.values[literal]]
+            if len(args) == 1 and self.is_int(args[0]):
+                return ['BigDecimal({})'.format(self._code(args[0]))]
+            return None
+        if not self.is_decimal(func.value):
+            return None
+        value = self._code(func.value)
+        code = None
+        if method in OPERATORS and len(args) == 1:
+            code = '({} {} {})'.format(value, OPERATORS[method], self._operand(args[0]))
+        elif method == 'divide' and len(args) == 1:
+            code = '({} / {})'.format(value, self._operand(args[0]))
+        elif method == 'divide' and len(args) == 3:
+            code = self._quantize(
+                '({} / {})'.format(value, self._operand(args[0])),
+                self._scale_arg(node),
+                args[2]
+            )
+        elif method == 'setScale' and len(args) == 2:
+            code = self._quantize(value, self._scale_arg(node), args[1])
+        elif method == 'compareTo' and len(args) == 1:
+            other = self._operand(args[0])
+            code = '(({0} > {1}) - ({0} < {1}))'.format(value, other)
+        elif method in ('longValue', 'intValue') and not args:
+            code = 'int({})'.format(value)
+        if code is None:
+            # lowered operators return plain Decimals, which lack the java methods
+            code = 'BigDecimal({}).{}({})'.format(
+                value, method, ', '.join(self._code(arg) for arg in args)
+            )
+        return [code]
@@ -0,0 +1,248 @@
+# coding: utf-8
+"""
+NumPy writer: calculates whole columns of inputs at once
+"""
+import inspect
+
+from ..base import BaseGenerator
+from ... import (
+    EvalStmt,
+    IfStmt,
+    ThenStmt,
+    ElseStmt,
+    ExecuteStmt,
+)
+
+from ...runtime import vectorized
+from .fixed import FixedPointConverter, DECIMAL_TYPES
+
+INT64_MAX = 2 ** 63 - 1
+
+
+class VectorizedConverter(FixedPointConverter):
+    """ Converts PAP expressions to elementwise numpy operations on
+        scaled int64 columns
+    """
+
+    bool_and = ' & '
+    """ Boolean AND operator """
+
+    bool_or = ' | '
+    """ Boolean OR operator """
+
+    mask = 'm'
+    """ Name of the mask of the statement being converted """
+
+    def _mul(self, left, right):
+        return 'mul({}, {}, {})'.format(self.mask, left, right)
+
+    @staticmethod
+    def _subscript(array, index):
+        return 'take({}, {})'.format(array, index)
+
+    @staticmethod
+    def _compare(left, oper, right):
+        return '({} {} {})'.format(left, oper, right)
+
+    @staticmethod
+    def _array(values):
+        fits = all(abs(value) <= INT64_MAX for value in values)
+        return 'np.array([{}], dtype={})'.format(
+            ', '.join(str(value) for value in values), 'np.int64' if fits else 'object'
+        )
+
+
+class PythonNumpyGenerator(BaseGenerator):
+    """ Python generator for numpy columns
+
+        Every variable holds a column (an int64 array, scaled like in
+        PythonGenerator's fixed mode) instead of a single value.
+        Branches are evaluated for all rows and their assignments are
+        only applied to the rows selected by the condition.
+    """
+
+    runtimes = ('inline', 'import')
+    """ Supported ways of providing the runtime, see PythonGenerator.runtimes """
+
+    def __init__(self, parser, outfile, class_name=None, indent=None, runtime='inline'):
+        super(PythonNumpyGenerator, self).__init__(
+            parser,
+            outfile,
+            class_name,
+            indent,
+            block_chars=(':', None)
+        )
+        if runtime not in self.runtimes:
+            raise ValueError("Invalid runtime: {}".format(runtime))
+        self.runtime = runtime
+        self.fixed = VectorizedConverter(self.parser, self.class_name)
+        self._mask_count = 0
+
+    def _write_preamble(self):
+        self.writer.writeln("# coding: utf-8")
+        self.writer.nl()
+        self.writer.writeln('from collections import namedtuple')
+        self.writer.nl()
+        if self.runtime == 'import':
+            self.writer.writeln('import numpy as np')
+            self.writer.writeln('from lstgen.runtime.vectorized import (')
+            self.writer.writeln('    mul, div_down, div_up, compare, take, restrict, active, where,')
+            self.writer.writeln('    rows, column, to_fixed, to_int, from_fixed')
+            self.writer.writeln(')')
+        else:
+            self.writer.writeln(inspect.getsource(vectorized))
+        self.writer.nl()
+
+    def _output_scale(self, var):
+        if var.type in DECIMAL_TYPES:
+            return self.fixed.scale_of(var.name)
+        return 0
+
+    def generate(self):
+        self._write_preamble()
+        with self.writer.indent('class {}'.format(self.class_name)):
+            for const in self.parser.constants:
+                converted = self.fixed.constant(const)
+                if const.type.endswith('[]'):
+                    values = self.fixed.const_values[const.name]
+                    scale = self.fixed.const_scales[const.name]
+                    fits = all(abs(val.scaleb(scale)) <= INT64_MAX for val in values)
+                    converted = 'np.array({}, dtype={})'.format(
+                        converted, 'np.int64' if fits else 'object'
+                    )
+                self.writer.writeln('{const.name} = {converted}'.format(
+                    const=const, converted=converted
+                ))
+                if const.comment is not None:
+                    self._write_comment(const.comment, False)
+                    self.writer.nl()
+            self.writer.writeln('OUTPUT_SCALES = {{{}}}'.format(', '.join(
+                '"{}": {}'.format(var.name, self._output_scale(var))
+                for var in self.parser.output_vars
+            )))
+            self.writer.writeln('""" Decimal places of the output columns """')
+            self._write_constructor()
+            for var in self.parser.input_vars:
+                self.writer.nl()
+                with self.writer.indent('def set{}(self, value)'.format(var.name.capitalize())):
+                    if var.type in DECIMAL_TYPES:
+                        self.writer.writeln('self.{} = to_fixed(value, {})'.format(
+                            var.name, self.fixed.scale_of(var.name)
+                        ))
+                    else:
+                        self.writer.writeln('self.{} = to_int(value)'.format(var.name))
+            for var in self.parser.output_vars:
+                self.writer.nl()
+                with self.writer.indent('def get{}(self)'.format(var.name.capitalize())):
+                    self.writer.writeln('return column(self.{}, self.size)'.format(var.name))
+            self._write_method(self.parser.main_method)
+            for method in self.parser.methods:
+                self._write_method(method)
+        self._write_compute()
+
+    def _write_constructor(self):
+        self.writer.nl()
+        with self.writer.indent('def __init__(self, **columns)'):
+            self.writer.writeln('self.size = rows(columns.values())')
+            for (variables, comment, is_input) in [
+                    (self.parser.input_vars, 'input variables', True),
+                    (self.parser.output_vars, 'output variables', False),
+                    (self.parser.internal_vars, 'internal variables', False),
+                ]:
+                self.writer.writeln('# ' + comment)
+                for var in variables:
+                    if var.comment is not None:
+                        self.writer.nl()
+                        self._write_comment(var.comment, True)
+                    self.writer.writeln('self.{name} = {value}'.format(
+                        name=var.name,
+                        value=self.fixed.default(var)
+                    ))
+                    if is_input:
+                        with self.writer.indent('if "{}" in columns'.format(var.name)):
+                            self.writer.writeln('self.set{cap}(columns["{name}"])'.format(
+                                cap=var.name.capitalize(),
+                                name=var.name
+                            ))
+                self.writer.nl()
+
+    def _write_compute(self):
+        result_class = '{}Result'.format(self.class_name)
+        self.writer.nl()
+        self.writer.writeln('{} = namedtuple("{}", ({}))'.format(
+            result_class,
+            result_class,
+            ''.join('"{}", '.format(var.name) for var in self.parser.output_vars)
+        ))
+        self.writer.nl()
+        with self.writer.indent('def compute(**columns)'):
+            self.writer.writeln('"""')
+            self.writer.writeln('Calculate all rows of the given input columns at once.')
+            self.writer.writeln('Decimal outputs are int64 columns scaled by')
+            self.writer.writeln('10 ** {}.OUTPUT_SCALES[name], see from_fixed().'.format(
+                self.class_name
+            ))
+            self.writer.writeln('"""')
+            self.writer.writeln('calc = {}(**columns)'.format(self.class_name))
+            self.writer.writeln('calc.MAIN()')
+            self.writer.writeln('return {}({})'.format(result_class, ', '.join(
+                'calc.get{}()'.format(var.name.capitalize())
+                for var in self.parser.output_vars
+            )))
+
+    def _write_method(self, method):
+        self.writer.nl()
+        self._mask_count = 0
+        with self.writer.indent('def {}(self, m=None)'.format(method.name)):
+            if method.comment:
+                self._write_comment(method.comment, False)
+            if not method.body:
+                self.writer.writeln('pass')
+            self._write_stmt_body(method, 'm')
+
+    def _write_comment(self, comment, simple=True):
+        lines = comment.split("\n")
+        if not simple:
+            self.writer.writeln('"""')
+        prefix = '# ' if simple else ''
+        for line in lines:
+            self.writer.writeln(u'{}{}'.format(prefix, line.strip()))
+        if not simple:
+            self.writer.writeln('"""')
+
+    def _new_name(self, prefix):
+        self._mask_count += 1
+        return '{}{}'.format(prefix, self._mask_count)
+
+    def _write_stmt_body(self, stmt, mask):
+        for part in stmt.body:
+            self.fixed.mask = mask
+            if isinstance(part, EvalStmt):
+                (target, value) = self.fixed.assigned_value(part)
+                self.writer.writeln('{target} = where({mask}, {value}, {target})'.format(
+                    target=target, mask=mask, value=value
+                ))
+            elif isinstance(part, ExecuteStmt):
+                self.writer.writeln('self.{}({})'.format(part.method_name, mask))
+            elif isinstance(part, IfStmt):
+                self._write_if(part, mask)
+
+    def _write_if(self, stmt, mask):
+        cond = self._new_name('c')
+        self.fixed.mask = mask
+        self.writer.writeln('{} = np.asarray({}, dtype=bool)'.format(
+            cond, self.fixed.condition(stmt)
+        ))
+        for part in stmt.body:
+            if not part.body:
+                continue
+            branch_mask = self._new_name('m')
+            if isinstance(part, ThenStmt):
+                branch_cond = cond
+            elif isinstance(part, ElseStmt):
+                branch_cond = '~' + cond
+            else:
+                continue
+            self.writer.writeln('{} = restrict({}, {})'.format(branch_mask, mask, branch_cond))
+            with self.writer.indent('if active({})'.format(branch_mask)):
+                self._write_stmt_body(part, branch_mask)
@@ -0,0 +1,168 @@
+# coding: utf-8
+"""
+Generate, compile and load calculators in memory
+"""
+import os
+import sys
+import types
+import marshal
+import hashlib
+import tempfile
+import importlib.util
+from io import StringIO
+
+from lxml import etree
+
+from . import PapParser
+
+LOADER_LANGUAGES = ('python', 'python-numpy')
+""" Languages that can be loaded into the running interpreter """
+
+CACHE_DIR_ENV = 'LSTGEN_CACHE_DIR'
+""" Environment variable overriding the default cache directory """
+
+
+_SOURCE_HASH = None
+
+
+def source_hash():
+    """ Hash of the python sources of the lstgen package, the generated
+        code changes with them even if the version stays the same
+    """
+    global _SOURCE_HASH
+    if _SOURCE_HASH is None:
+        digest = hashlib.sha256()
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        for (dirpath, dirnames, filenames) in os.walk(package_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if not filename.endswith('.py'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                digest.update(os.path.relpath(path, package_dir).encode('utf-8') + b'\0')
+                with open(path, 'rb') as source_file:
+                    digest.update(source_file.read())
+        _SOURCE_HASH = digest.hexdigest()
+    return _SOURCE_HASH
+
+
+def default_cache_dir():
+    """ Cache directory, $LSTGEN_CACHE_DIR or ~/.cache/lstgen """
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'lstgen')
+
+
+def generate_code(xml_content, lang='python', class_name=None, optimize=0, specialize=None,
+                  outputs=None, profile_data=None, **options):
+    """ Generate code for a PAP XML document and return
+        a tuple (class name, code)
+    """
+    from .generators import GENERATORS
+    from .passes import optimize as optimize_parser
+    from .passes.specialize import specialize as specialize_parser
+    from .passes.slicing import slice_outputs
+    from .passes.profile import number_branches, apply_profile
+    if lang not in LOADER_LANGUAGES:
+        raise ValueError("Cannot load calculators for language {}".format(lang))
+    parser = PapParser(etree.fromstring(xml_content))
+    number_branches(parser)
+    if profile_data:
+        apply_profile(parser, profile_data)
+    if specialize:
+        specialize_parser(parser, specialize)
+    if outputs:
+        slice_outputs(parser, outputs)
+    optimize_parser(parser, optimize)
+    out = StringIO()
+    generator = GENERATORS[lang](parser, out, class_name=class_name, **options)
+    generator.generate()
+    return (generator.class_name, out.getvalue())
+
+
+def _cache_key(xml_hash, lang, class_name, options):
+    """ Hash of everything the compiled code object depends on """
+    digest = hashlib.sha256()
+    for part in [xml_hash, lang, class_name, source_hash(), importlib.util.MAGIC_NUMBER] + \
+            sorted('{}={}'.format(key, value) for (key, value) in options.items()):
+        if not isinstance(part, bytes):
+            part = str(part).encode('utf-8')
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _read_cache(path):
+    """ Return the cached (class name, code) tuple or None """
+    try:
+        with open(path, 'rb') as cache_file:
+            cached = marshal.load(cache_file)
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        # missing or unreadable (e.g. truncated) cache entry
+        return None
+    if not isinstance(cached, tuple) or len(cached) != 2:
+        return None
+    return cached
+
+
+def _write_cache(path, value):
+    directory = os.path.dirname(path)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        (fd, tmp_path) = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as cache_file:
+            marshal.dump(value, cache_file)
+        # atomic, concurrent workers never see partially written files
+        os.replace(tmp_path, path)
+    except (IOError, OSError):
+        # the cache is an optimization only
+        pass
+
+
+def load_calculator(source, lang='python', class_name=None, cache_dir=None, use_cache=True,
+                    **options):
+    """ Generate, compile and load a calculator without writing a module.
+
+        source is either a PAP version (see lstgen.pap.PAP_RESOURCES)
+        or the contents of a PAP XML file. The remaining options are
+        passed to the generator (e.g. numeric='fixed' or mode='function'),
+        optimize selects the optimization level (see lstgen.passes),
+        specialize a dict of fixed input values (see
+        lstgen.passes.specialize), outputs a list of the outputs
+        to calculate (see lstgen.passes.slicing) and profile_data the
+        branch counts of a profile (see lstgen.passes.profile).
+
+        Returns the generated class, or the compute function in function
+        mode. The compiled code is cached in cache_dir (see
+        default_cache_dir()), keyed by the hash of the PAP XML (see
+        PapParser.xml_hash), the options and a hash of the lstgen
+        sources (see source_hash()).
+    """
+    from . import pap
+    options.setdefault('runtime', 'import')
+    if isinstance(source, str) and source in pap.PAP_RESOURCES:
+        xml_content = pap.get_pap_xml(source)
+    else:
+        xml_content = source.encode('utf-8') if not isinstance(source, bytes) else source
+    xml_hash = PapParser(etree.fromstring(xml_content)).xml_hash
+    key = _cache_key(xml_hash, lang, class_name, options)
+    cache_path = os.path.join(cache_dir or default_cache_dir(), '{}.bin'.format(key))
+
+    cached = _read_cache(cache_path) if use_cache else None
+    if cached is None:
+        (class_name, source_code) = generate_code(xml_content, lang, class_name, **options)
+        code = compile(source_code, '<lstgen {}>'.format(class_name), 'exec')
+        if use_cache:
+            _write_cache(cache_path, (class_name, code))
+    else:
+        (class_name, code) = cached
+
+    module = types.ModuleType('lstgen_calculator_{}'.format(key[:16]))
+    # allows pickling instances and inspecting the classes
+    sys.modules[module.__name__] = module
+    exec(code, module.__dict__)
+    if options.get('mode') == 'function':
+        return module.compute
+    return getattr(module, class_name)
@@ -0,0 +1,28 @@
+# coding: utf-8
+"""
+Rewrite passes on the AST of parsed PAP expressions
+"""
+
+OPTIMIZE_LEVELS = (0, 1, 2, 3)
+""" Supported optimization levels:
+    0: no optimizations
+    1: constant folding and hoisting
+    2: level 1 and inlining of small or rarely executed methods
+    3: level 2 and common subexpression elimination
+"""
+
+
+def optimize(parser, level=1):
+    """ Run the optimization passes of a level on a parsed PAP in place """
+    if level not in OPTIMIZE_LEVELS:
+        raise ValueError("Invalid optimization level: {}".format(level))
+    if level >= 1:
+        from .fold import fold_constants
+        fold_constants(parser)
+    if level >= 2:
+        from .inline import inline_methods
+        inline_methods(parser)
+    if level >= 3:
+        from .cse import eliminate_subexpressions
+        eliminate_subexpressions(parser)
+    return parser
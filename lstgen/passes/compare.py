@@ -0,0 +1,98 @@
+# coding: utf-8
+"""
+Rewrite ``x.compareTo(y) == 1`` and friends into direct comparisons
+"""
+import ast
+import operator
+
+CMP_FUNCS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+SWAPPED = {
+    ast.Eq: ast.Eq,
+    ast.NotEq: ast.NotEq,
+    ast.Lt: ast.Gt,
+    ast.LtE: ast.GtE,
+    ast.Gt: ast.Lt,
+    ast.GtE: ast.LtE,
+}
+""" Operator with swapped operands, a < b is b > a """
+
+OUTCOME_OPS = {
+    frozenset([1]): ast.Gt,
+    frozenset([-1]): ast.Lt,
+    frozenset([0]): ast.Eq,
+    frozenset([0, 1]): ast.GtE,
+    frozenset([-1, 0]): ast.LtE,
+    frozenset([-1, 1]): ast.NotEq,
+}
+""" Comparison operator matching a set of compareTo() results """
+
+
+class DecimalCompare(ast.Compare):
+    """ Comparison of two BigDecimal values, a rewritten
+        ``left.compareTo(right) <op> <int>``
+    """
+    pass
+
+
+def _int_value(node):
+    """ Value of an integer literal (including negative ones) or None """
+    sign = 1
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        if isinstance(node.op, ast.USub):
+            sign = -1
+        node = node.operand
+    if isinstance(node, ast.Num) and type(node.n) is int:
+        return sign * node.n
+    return None
+
+
+def _compare_to(node):
+    """ Return (receiver, argument) of a x.compareTo(y) call or None """
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and \
+            node.func.attr == 'compareTo' and len(node.args) == 1:
+        return (node.func.value, node.args[0])
+    return None
+
+
+class CompareRewriter(ast.NodeTransformer):
+    """ Replaces comparisons of compareTo() results with an integer
+        literal by a DecimalCompare of the compared values
+    """
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) != 1:
+            return node
+        op_type = type(node.ops[0])
+        (left, right) = (node.left, node.comparators[0])
+        if _compare_to(left) is None and _compare_to(right) is not None:
+            (left, right) = (right, left)
+            op_type = SWAPPED[op_type]
+        operands = _compare_to(left)
+        value = _int_value(right)
+        if operands is None or value is None or op_type not in CMP_FUNCS:
+            return node
+        outcomes = frozenset(
+            res for res in (-1, 0, 1) if CMP_FUNCS[op_type](res, value)
+        )
+        if outcomes not in OUTCOME_OPS:
+            # always true or always false, keep it as it is
+            return node
+        return ast.copy_location(DecimalCompare(
+            left=operands[0],
+            ops=[OUTCOME_OPS[outcomes]()],
+            comparators=[operands[1]]
+        ), node)
+
+
+def rewrite_comparisons(node):
+    """ Rewrite all compareTo() comparisons of an AST node """
+    return CompareRewriter().visit(node)
@@ -0,0 +1,195 @@
+# coding: utf-8
+"""
+Common subexpression elimination
+
+A BigDecimal computation that is evaluated more than once, while none
+of the variables it reads are assigned in between, is stored in a new
+internal variable at its first occurrence and read from there
+afterwards. Occurrences in nested IF branches reuse a value computed
+before the IF, values computed inside a branch are only reused within
+that branch.
+"""
+import ast
+from collections import deque
+
+from .. import (
+    Var,
+    EvalStmt,
+    IfStmt,
+    ThenStmt,
+    ElseStmt,
+    ExecuteStmt,
+)
+from ..analysis import MethodEffects, node_names, executed_methods
+from .source import (
+    to_source,
+    stmt_tree,
+    update_stmt,
+    iter_stmts,
+)
+
+TEMP_PREFIX = 'CSE'
+""" Name prefix of temporary variables, followed by a sequence number """
+
+DECIMAL_METHODS = ('add', 'subtract', 'multiply', 'divide', 'setScale', 'valueOf')
+""" Pure methods returning a BigDecimal """
+
+
+class Expression(object):
+    """ A subexpression and the statements evaluating it while it
+        keeps its value
+    """
+
+    def __init__(self, source, names, body, stmt):
+        self.source = source
+        self.names = names
+        self.body = body
+        self.uses = [stmt]
+        self.name = None
+
+
+class SubexpressionEliminator(object):
+    """ Stores repeated BigDecimal computations in temporary variables """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.effects = MethodEffects(parser)
+        self.var_names = self.effects.var_names
+        self.names = parser.constant_names | self.var_names
+        self.expressions = []
+        self._counter = 0
+
+    def _candidates(self, node):
+        """ Source of all pure BigDecimal calls of a node which read at
+            least one variable, outermost first, and whether they are
+            evaluated whenever the node is
+        """
+        for (sub, always) in _walk_evaluated(node):
+            if isinstance(sub, ast.Call) and isinstance(sub.func, ast.Attribute) and \
+                    sub.func.attr in DECIMAL_METHODS:
+                names = node_names(sub) & self.var_names
+                if names:
+                    yield (to_source(sub), names, always)
+
+    def _use(self, body, stmt, node, available):
+        for (source, names, always) in self._candidates(node):
+            if source in available:
+                available[source].uses.append(stmt)
+            elif always:
+                # the value is computed before the statement, a call
+                # guarded by an earlier && or || operand must stay behind it
+                expression = Expression(source, names, body, stmt)
+                self.expressions.append(expression)
+                available[source] = expression
+
+    @staticmethod
+    def _kill(available, written):
+        for (source, expression) in list(available.items()):
+            if expression.names & written:
+                del available[source]
+
+    def _writes(self, stmt):
+        """ Variables possibly written by an IF statement """
+        written = set()
+        for part in iter_stmts(stmt):
+            if isinstance(part, EvalStmt):
+                written.add(stmt_tree(part)[0])
+        for name in executed_methods(stmt):
+            written |= self.effects.writes[name]
+        return written
+
+    def _scan(self, body, available):
+        for part in body:
+            if isinstance(part, EvalStmt):
+                (target, node) = stmt_tree(part)
+                self._use(body, part, node, available)
+                self._kill(available, set([target]))
+            elif isinstance(part, IfStmt):
+                self._use(body, part, stmt_tree(part)[1], available)
+                for branch in part.body:
+                    if isinstance(branch, (ThenStmt, ElseStmt)):
+                        self._scan(branch.body, dict(available))
+                self._kill(available, self._writes(part))
+            elif isinstance(part, ExecuteStmt):
+                self._kill(available, self.effects.writes[part.method_name])
+
+    def _new_name(self):
+        while True:
+            self._counter += 1
+            name = '{}{}'.format(TEMP_PREFIX, self._counter)
+            if name not in self.names:
+                return name
+
+    def _selected(self):
+        repeated = [expr for expr in self.expressions if len(expr.uses) > 1]
+        ret = []
+        for expr in repeated:
+            # only evaluated as part of a larger repeated expression
+            redundant = any(
+                other is not expr and expr.source in other.source and
+                [id(use) for use in other.uses] == [id(use) for use in expr.uses]
+                for other in repeated
+            )
+            if not redundant:
+                ret.append(expr)
+        return ret
+
+    def run(self):
+        """ Eliminate common subexpressions in all methods """
+        for method in [self.parser.main_method] + self.parser.methods:
+            self._scan(method.body, {})
+        selected = self._selected()
+        replacements = {}
+        for expr in selected:
+            expr.name = self._new_name()
+            self.parser.internal_vars.append(Var(expr.name, 'BigDecimal'))
+            for stmt in expr.uses:
+                replacements.setdefault(id(stmt), (stmt, {}))[1][expr.source] = expr.name
+        for (stmt, mapping) in replacements.values():
+            (target, node) = stmt_tree(stmt)
+            update_stmt(stmt, target, _replace(node, mapping))
+        # shorter (inner) expressions are defined first
+        for expr in sorted(selected, key=lambda expr: len(expr.source)):
+            anchor = expr.uses[0]
+            definition = EvalStmt(expr='{} = {}'.format(expr.name, expr.source))
+            mapping = dict(replacements[id(anchor)][1])
+            del mapping[expr.source]
+            (target, node) = stmt_tree(definition)
+            update_stmt(definition, target, _replace(node, mapping, root=False))
+            expr.body.insert(expr.body.index(anchor), definition)
+
+
+def _walk_evaluated(node):
+    """ Like ast.walk, yields (node, always) pairs, always is False for
+        the nodes behind the first operand of a && or || which are only
+        evaluated depending on it
+    """
+    todo = deque([(node, True)])
+    while todo:
+        (node, always) = todo.popleft()
+        yield (node, always)
+        if isinstance(node, ast.BoolOp):
+            todo.append((node.values[0], always))
+            todo.extend((value, False) for value in node.values[1:])
+        else:
+            todo.extend((child, always) for child in ast.iter_child_nodes(node))
+
+
+def _replace(node, mapping, root=True):
+    """ Replace subexpressions by the variables in mapping (source: name) """
+    class Replacer(ast.NodeTransformer):
+        def visit(self, sub):
+            if (root or sub is not node) and isinstance(sub, ast.Call):
+                name = mapping.get(to_source(sub))
+                if name is not None:
+                    return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), sub)
+            return super(Replacer, self).visit(sub)
+    return Replacer().visit(node)
+
+
+def eliminate_subexpressions(parser):
+    """ Store repeated BigDecimal computations of a parsed PAP in
+        temporary variables in place, returns the parser
+    """
+    SubexpressionEliminator(parser).run()
+    return parser
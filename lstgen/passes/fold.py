@@ -0,0 +1,372 @@
+# coding: utf-8
+"""
+Constant folding and hoisting of invariant subexpressions
+
+``BigDecimal.valueOf(100)`` or ``ZAHL100.multiply(BigDecimal.valueOf(12))``
+create new BigDecimal objects each time they are evaluated. Subexpressions
+that only depend on literals and scalar CONSTANTs are evaluated at
+generation time where this is exact, and hoisted into new CONSTANTs,
+so each of them is created once per class (or instance) instead of
+once per calculation.
+"""
+import ast
+import copy
+import decimal
+from fractions import Fraction
+
+from .. import (
+    Const,
+    EvalStmt,
+    IfStmt,
+    ExecuteStmt,
+    ThenStmt,
+    ElseStmt,
+)
+from ..analysis import MethodEffects, stmt_names, executed_methods
+from .source import (
+    to_source,
+    parse_expr,
+    stmt_tree,
+    update_stmt,
+    iter_stmts,
+)
+
+HOISTED_PREFIX = 'HOISTED'
+""" Name prefix of hoisted constants, followed by a sequence number """
+
+DECIMAL_METHODS = ('valueOf', 'add', 'subtract', 'multiply', 'divide', 'setScale')
+""" Pure methods returning a BigDecimal """
+
+INT_METHODS = ('longValue', 'intValue', 'compareTo')
+""" Pure methods returning an integer """
+
+BD_CONSTANTS = {
+    'ZERO': 0,
+    'ONE': 1,
+    'TEN': 10,
+}
+
+ROUNDING_MODES = ('ROUND_UP', 'ROUND_DOWN')
+
+LONG_LIMIT = 2 ** 63
+
+
+def _round(value, scale, rounding):
+    """ Round a Fraction to scale decimal places like BigDecimal """
+    scaled = value * 10 ** scale
+    # int() truncates towards zero (ROUND_DOWN)
+    truncated = int(scaled)
+    if rounding == 'ROUND_UP' and truncated != scaled:
+        truncated += 1 if scaled > 0 else -1
+    return decimal.Decimal(truncated).scaleb(-scale)
+
+
+def literal_source(value):
+    """ Return a BigDecimal.valueOf() expression creating exactly
+        the given Decimal (including its scale) or None
+    """
+    exponent = value.as_tuple().exponent
+    if exponent == 0 and abs(value) < LONG_LIMIT:
+        return 'BigDecimal.valueOf({})'.format(int(value))
+    if exponent < 0 and decimal.Decimal('0.001') <= abs(value) < decimal.Decimal('1E7'):
+        source = str(value)
+        # valueOf(double) uses Double.toString(), which needs to reproduce the digits
+        if repr(float(source)) == source:
+            return 'BigDecimal.valueOf({})'.format(source)
+    return None
+
+
+class ConstantFolder(object):
+    """ Folds and hoists constant subexpressions of a parsed PAP """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.names = parser.constant_names | set(
+            var.name for var in parser.input_vars + parser.output_vars + parser.internal_vars
+        )
+        self.scalars = dict(
+            (const.name, parse_expr(const.value))
+            for const in parser.constants if not const.type.endswith('[]')
+        )
+        self.hoisted = {}
+        self._counter = 0
+
+    def is_constant(self, node):
+        """ True if a node only depends on literals and constants """
+        if isinstance(node, ast.Num):
+            return True
+        if isinstance(node, ast.Name):
+            return node.id in self.scalars or node.id == 'BigDecimal'
+        if isinstance(node, ast.Attribute):
+            return isinstance(node.value, ast.Name) and node.value.id == 'BigDecimal' and \
+                node.attr in tuple(BD_CONSTANTS) + ROUNDING_MODES
+        if isinstance(node, ast.UnaryOp):
+            return self.is_constant(node.operand)
+        if isinstance(node, ast.BinOp):
+            return self.is_constant(node.left) and self.is_constant(node.right)
+        if isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name):
+                if func.id != 'BigDecimalConstructor':
+                    return False
+            elif not (func.attr in DECIMAL_METHODS + INT_METHODS and
+                      self.is_constant(func.value)):
+                return False
+            return all(self.is_constant(arg) for arg in node.args)
+        return False
+
+    def evaluate(self, node):
+        """ Evaluate a constant node with java semantics, returns an int,
+            a float, a Decimal (for BigDecimals) or None if the value
+            cannot be determined exactly
+        """
+        if isinstance(node, ast.Num):
+            return node.n
+        if isinstance(node, ast.Name):
+            if node.id in self.scalars:
+                return self.evaluate(self.scalars[node.id])
+            return None
+        if isinstance(node, ast.Attribute):
+            if node.attr in BD_CONSTANTS:
+                return decimal.Decimal(BD_CONSTANTS[node.attr])
+            return None
+        if isinstance(node, ast.UnaryOp):
+            value = self.evaluate(node.operand)
+            if value is None:
+                return None
+            return -value if isinstance(node.op, ast.USub) else value
+        if isinstance(node, ast.BinOp):
+            return self._evaluate_binop(node)
+        if isinstance(node, ast.Call):
+            return self._evaluate_call(node)
+        return None
+
+    def _evaluate_binop(self, node):
+        left = self.evaluate(node.left)
+        right = self.evaluate(node.right)
+        if type(left) is not int or type(right) is not int:
+            return None
+        if isinstance(node.op, ast.Add):
+            return left + right
+        if isinstance(node.op, ast.Sub):
+            return left - right
+        if isinstance(node.op, ast.Mult):
+            return left * right
+        if isinstance(node.op, ast.Div) and right != 0:
+            # java's integer division truncates
+            return int(Fraction(left, right))
+        return None
+
+    def _evaluate_call(self, node):
+        func = node.func
+        args = [self.evaluate(arg) for arg in node.args]
+        if None in args and not (isinstance(func, ast.Attribute) and func.attr in DECIMAL_METHODS):
+            return None
+        if isinstance(func, ast.Name):
+            # new BigDecimal(x), a double argument is converted exactly
+            if len(args) == 1 and isinstance(args[0], (int, float)):
+                return decimal.Decimal(args[0])
+            return None
+        if func.attr == 'valueOf':
+            if len(args) == 1 and type(args[0]) is int:
+                return decimal.Decimal(args[0])
+            if len(args) == 1 and type(args[0]) is float:
+                return decimal.Decimal(repr(args[0]))
+            return None
+        value = self.evaluate(func.value)
+        if not isinstance(value, decimal.Decimal):
+            return None
+        if func.attr == 'compareTo':
+            if len(args) == 1 and isinstance(args[0], decimal.Decimal):
+                return (value > args[0]) - (value < args[0])
+            return None
+        if func.attr in INT_METHODS:
+            return int(value)
+        rounding = None
+        if node.args and isinstance(node.args[-1], ast.Attribute):
+            rounding = node.args[-1].attr
+        if func.attr == 'setScale' and len(args) == 2 and type(args[0]) is int and \
+                rounding in ROUNDING_MODES:
+            return _round(Fraction(value), args[0], rounding)
+        if any(not isinstance(arg, decimal.Decimal) for arg in args[:1]):
+            return None
+        if func.attr == 'divide' and len(args) == 3 and type(args[1]) is int and \
+                rounding in ROUNDING_MODES and args[0] != 0:
+            return _round(Fraction(value) / Fraction(args[0]), args[1], rounding)
+        if len(args) != 1:
+            return None
+        # exact, the result has the same scale as the one of java
+        with decimal.localcontext(decimal.Context(prec=decimal.MAX_PREC)):
+            if func.attr == 'add':
+                return value + args[0]
+            if func.attr == 'subtract':
+                return value - args[0]
+            if func.attr == 'multiply':
+                return value * args[0]
+        return None
+
+    def _inline_constants(self, node):
+        """ Replace constant names by their values, hoisted constants must
+            not depend on other fields (e.g. in go's struct initializer)
+        """
+        class Inliner(ast.NodeTransformer):
+            def visit_Name(inner, name):
+                if name.id in self.scalars:
+                    return inner.visit(copy.deepcopy(self.scalars[name.id]))
+                return name
+        return Inliner().visit(copy.deepcopy(node))
+
+    def _new_name(self):
+        while True:
+            self._counter += 1
+            name = '{}{}'.format(HOISTED_PREFIX, self._counter)
+            if name not in self.names:
+                return name
+
+    def constant_source(self, node):
+        """ Source code of the folded value of a constant node """
+        value = self.evaluate(node)
+        source = literal_source(value) if isinstance(value, decimal.Decimal) else None
+        if source is None:
+            source = to_source(self._inline_constants(node))
+        return source
+
+    def hoist(self, node):
+        """ Return the name of the constant holding the value of a node """
+        source = self.constant_source(node)
+        if source not in self.hoisted:
+            name = self._new_name()
+            self.hoisted[source] = name
+            self.scalars[name] = parse_expr(source)
+            self.parser.constants.append(Const(name, 'BigDecimal', source))
+        return self.hoisted[source]
+
+    def _hoistable(self, node):
+        if not isinstance(node, ast.Call) or not self.is_constant(node):
+            return False
+        func = node.func
+        return isinstance(func, ast.Name) or func.attr in DECIMAL_METHODS
+
+    def rewrite(self, node):
+        """ Return a node with all constant BigDecimal subexpressions
+            replaced by hoisted constants and integer arithmetic folded
+        """
+        folder = self
+
+        class Rewriter(ast.NodeTransformer):
+            def visit(self, sub):
+                if folder._hoistable(sub):
+                    return ast.copy_location(ast.Name(id=folder.hoist(sub), ctx=ast.Load()), sub)
+                return super(Rewriter, self).visit(sub)
+
+            def visit_BinOp(self, sub):
+                self.generic_visit(sub)
+                value = folder.evaluate(sub)
+                if type(value) is int:
+                    folded = ast.Num(n=abs(value))
+                    if value < 0:
+                        folded = ast.UnaryOp(op=ast.USub(), operand=folded)
+                    return ast.copy_location(folded, sub)
+                return sub
+
+        return Rewriter().visit(node)
+
+    def run(self):
+        """ Rewrite all statements of the PAP """
+        for method in [self.parser.main_method] + self.parser.methods:
+            for stmt in iter_stmts(method):
+                (target, node) = stmt_tree(stmt)
+                update_stmt(stmt, target, self.rewrite(node))
+        precompute_methods(self.parser, self)
+
+
+def _constant_assignments(folder, method):
+    """ Return {target: value source} if a method only assigns constant
+        values to BigDecimal or int variables, else None
+    """
+    var_types = dict(
+        (var.name, var.type) for var in folder.parser.output_vars + folder.parser.internal_vars
+    )
+    values = {}
+    for part in method.body:
+        if isinstance(part, ExecuteStmt) or isinstance(part, (IfStmt, ThenStmt, ElseStmt)):
+            return None
+        if not isinstance(part, EvalStmt):
+            continue
+        (target, node) = stmt_tree(part)
+        value = folder.evaluate(node)
+        if var_types.get(target) == 'BigDecimal' and isinstance(value, decimal.Decimal):
+            source = literal_source(value)
+        elif var_types.get(target) == 'int' and type(value) is int:
+            source = str(value)
+        else:
+            return None
+        if source is None or target in values:
+            return None
+        values[target] = source
+    return values or None
+
+
+def _remove_executes(stmt, method_name):
+    stmt.body = [
+        part for part in stmt.body
+        if not (isinstance(part, ExecuteStmt) and part.method_name == method_name)
+    ]
+    for part in stmt.body:
+        if isinstance(part, (IfStmt, ThenStmt, ElseStmt)):
+            _remove_executes(part, method_name)
+
+
+def precompute_methods(parser, folder):
+    """ Turn methods that only assign constants into default values.
+
+        This is done if MAIN executes the method before anything reads
+        the assigned variables, and nothing else writes them.
+    """
+    effects = MethodEffects(parser)
+    for method in list(parser.methods):
+        values = _constant_assignments(folder, method)
+        if values is None:
+            continue
+        targets = set(values)
+        written_elsewhere = any(
+            stmt_names(stmt)[1] & targets
+            for other in [parser.main_method] + parser.methods if other is not method
+            for stmt in iter_stmts(other)
+        )
+        if written_elsewhere:
+            continue
+        safe = False
+        for part in parser.main_method.body:
+            if isinstance(part, ExecuteStmt):
+                if part.method_name == method.name:
+                    safe = True
+                    break
+                if effects.reads[part.method_name] & targets:
+                    break
+            elif isinstance(part, EvalStmt):
+                if stmt_names(part)[0] & targets:
+                    break
+            elif isinstance(part, IfStmt):
+                if any(stmt_names(stmt)[0] & targets for stmt in [part] + list(iter_stmts(part))):
+                    break
+                if any(effects.reads[name] & targets for name in executed_methods(part)):
+                    break
+        if not safe:
+            continue
+        for var in parser.output_vars + parser.internal_vars:
+            if var.name in values:
+                var.default = values[var.name]
+        _remove_executes(parser.main_method, method.name)
+        for other in parser.methods:
+            _remove_executes(other, method.name)
+        parser.methods.remove(method)
+        effects = MethodEffects(parser)
+
+
+def fold_constants(parser):
+    """ Fold and hoist the constant subexpressions of a parsed PAP
+        in place, returns the parser
+    """
+    ConstantFolder(parser).run()
+    return parser
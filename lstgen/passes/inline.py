@@ -0,0 +1,94 @@
+# coding: utf-8
+"""
+Inlining of small or rarely executed PAP methods
+
+PAP methods have neither parameters nor local variables, so an EXECUTE
+can be replaced by the body of the executed method without changing
+the meaning of the program.
+"""
+import copy
+
+from .. import (
+    EvalStmt,
+    IfStmt,
+    ThenStmt,
+    ElseStmt,
+    ExecuteStmt,
+)
+from ..analysis import MethodEffects
+
+INLINE_MAX_CALLS = 1
+""" Methods executed from at most this many places are always inlined """
+
+INLINE_MAX_SIZE = 3
+""" Methods with at most this many statements are inlined everywhere """
+
+
+def method_size(stmt):
+    """ Number of EVAL, IF and EXECUTE statements of a body, including
+        the ones of nested branches
+    """
+    size = 0
+    for part in stmt.body:
+        if isinstance(part, (EvalStmt, IfStmt, ExecuteStmt)):
+            size += 1
+        if isinstance(part, (IfStmt, ThenStmt, ElseStmt)):
+            size += method_size(part)
+    return size
+
+
+class MethodInliner(object):
+    """ Replaces EXECUTEs of methods selected by the thresholds
+        by copies of their bodies
+    """
+
+    def __init__(self, parser, max_calls=INLINE_MAX_CALLS, max_size=INLINE_MAX_SIZE):
+        self.parser = parser
+        effects = MethodEffects(parser)
+        call_sites = effects.call_sites()
+        self.inlined = set(
+            method.name for method in parser.methods
+            if method.name in call_sites and not effects.is_recursive(method.name) and (
+                call_sites[method.name] <= max_calls or
+                method_size(method) <= max_size
+            )
+        )
+        self.methods = dict((method.name, method) for method in parser.methods)
+        self._expanded = {}
+
+    def _expanded_body(self, name):
+        """ Body of a method with its inlined EXECUTEs expanded """
+        if name not in self._expanded:
+            self._expanded[name] = self._expand(self.methods[name].body)
+        return self._expanded[name]
+
+    def _expand(self, body):
+        ret = []
+        for part in body:
+            if isinstance(part, ExecuteStmt) and part.method_name in self.inlined:
+                ret.extend(copy.deepcopy(self._expanded_body(part.method_name)))
+                continue
+            if isinstance(part, (IfStmt, ThenStmt, ElseStmt)):
+                part.body = self._expand(part.body)
+            ret.append(part)
+        return ret
+
+    def run(self):
+        """ Inline the selected methods and drop them """
+        main = self.parser.main_method
+        main.body = self._expand(main.body)
+        for method in self.parser.methods:
+            if method.name not in self.inlined:
+                method.body = self._expand(method.body)
+        # inlined methods are not executed anymore
+        self.parser.methods[:] = [
+            method for method in self.parser.methods if method.name not in self.inlined
+        ]
+
+
+def inline_methods(parser, max_calls=INLINE_MAX_CALLS, max_size=INLINE_MAX_SIZE):
+    """ Inline methods executed from at most max_calls places or
+        having at most max_size statements in place, returns the parser
+    """
+    MethodInliner(parser, max_calls, max_size).run()
+    return parser
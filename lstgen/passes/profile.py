@@ -0,0 +1,178 @@
+# coding: utf-8
+"""
+Profile guided layout of the branches of a PAP
+
+A calculator generated with ``profile=True`` (python only) counts how
+often the condition of each IF statement, and each operand of a
+top-level ``&&``/``||`` condition, evaluates to true or false. The
+counts are keyed by branch ids numbered in the order of the original
+PAP, ``METHOD:N`` for the N-th IF of a method and ``METHOD:N.I`` for
+its I-th operand, and saved as JSON::
+
+    {"MRE4JL:0": [taken, not_taken], "MRE4JL:0.1": [true, false], ...}
+
+apply_profile() uses such a profile for the layout of another build:
+IF statements that mostly take their ELSE branch are inverted, and
+the operands of ``&&``/``||`` conditions are reordered so that the
+operand deciding the result most often is evaluated first.
+"""
+import ast
+import json
+
+from .. import (
+    IfStmt,
+    ThenStmt,
+    ElseStmt,
+)
+from .source import stmt_tree, update_stmt, iter_stmts
+
+NEGATED_OPS = {
+    ast.Eq: ast.NotEq,
+    ast.NotEq: ast.Eq,
+    ast.Lt: ast.GtE,
+    ast.GtE: ast.Lt,
+    ast.Gt: ast.LtE,
+    ast.LtE: ast.Gt,
+}
+
+
+def number_branches(parser):
+    """ Set the branch_id of all IF statements that do not have one yet,
+        must run before the passes that remove or copy statements
+    """
+    for method in [parser.main_method] + parser.methods:
+        ifs = [stmt for stmt in iter_stmts(method) if isinstance(stmt, IfStmt)]
+        for (num, stmt) in enumerate(ifs):
+            if getattr(stmt, 'branch_id', None) is None:
+                stmt.branch_id = '{}:{}'.format(method.name, num)
+    return parser
+
+
+def load_profile(path):
+    """ Read the branch counts of a profile file """
+    with open(path) as profile_file:
+        data = json.load(profile_file)
+    if not isinstance(data, dict):
+        raise ValueError("Invalid profile: {}".format(path))
+    return data
+
+
+def save_profile(counts, path):
+    """ Add the branch counts recorded by a profiling calculator
+        (the _PROFILE dict of its module) to a profile file
+    """
+    try:
+        data = load_profile(path)
+    except (IOError, OSError):
+        data = {}
+    for (key, (taken, not_taken)) in counts.items():
+        (prev_taken, prev_not_taken) = data.get(key, (0, 0))
+        data[key] = [prev_taken + taken, prev_not_taken + not_taken]
+    with open(path, 'w') as profile_file:
+        json.dump(data, profile_file, indent=1, sort_keys=True)
+    return data
+
+
+def negate(node):
+    """ Return the negated condition or None if it cannot be negated
+        without a not operator (which is not part of the PAP syntax)
+    """
+    if isinstance(node, ast.Compare) and len(node.ops) == 1:
+        return ast.Compare(
+            left=node.left,
+            ops=[NEGATED_OPS[type(node.ops[0])]()],
+            comparators=node.comparators
+        )
+    if isinstance(node, ast.BoolOp):
+        values = [negate(value) for value in node.values]
+        if any(value is None for value in values):
+            return None
+        oper = ast.And() if isinstance(node.op, ast.Or) else ast.Or()
+        return ast.BoolOp(op=oper, values=values)
+    return None
+
+
+def _is_safe(node):
+    """ True if evaluating an operand cannot fail, operands guarding
+        a division or an array access by an earlier one must stay behind it
+    """
+    for child in ast.walk(node):
+        if isinstance(child, ast.Subscript):
+            return False
+        if isinstance(child, ast.BinOp) and isinstance(child.op, ast.Div):
+            return False
+        if isinstance(child, ast.Attribute) and child.attr == 'divide':
+            return False
+    return True
+
+
+class BranchLayout(object):
+    """ Inverts IF statements and reorders conditions by branch counts """
+
+    def __init__(self, parser, counts):
+        self.parser = parser
+        self.counts = counts
+
+    def _ratio(self, key):
+        """ Fraction of evaluations that were true, 0.5 if unknown """
+        (true, false) = self.counts.get(key, (0, 0))
+        if true + false == 0:
+            return 0.5
+        return float(true) / (true + false)
+
+    def reorder(self, stmt, node):
+        """ Sort the operands of a && (||) condition, the ones most
+            often false (true) first, returns True if the order changed
+        """
+        if not isinstance(node, ast.BoolOp) or not all(_is_safe(value) for value in node.values):
+            return False
+        sign = -1 if isinstance(node.op, ast.Or) else 1
+        keys = ['{}.{}'.format(stmt.branch_id, idx) for idx in range(len(node.values))]
+        order = sorted(range(len(node.values)), key=lambda idx: sign * self._ratio(keys[idx]))
+        if order == list(range(len(node.values))):
+            return False
+        node.values = [node.values[idx] for idx in order]
+        return True
+
+    def invert(self, stmt, node):
+        """ Swap the branches of an IF that mostly takes its ELSE branch,
+            returns the negated condition or None
+        """
+        (taken, not_taken) = self.counts.get(stmt.branch_id, (0, 0))
+        then = [part for part in stmt.body if isinstance(part, ThenStmt)]
+        other = [part for part in stmt.body if isinstance(part, ElseStmt)]
+        if not_taken <= taken or not then or not other or \
+                not then[0].body or not other[0].body:
+            return None
+        # ELSE IF chains keep their order, the chain itself is the hot path
+        if len(other[0].body) == 1 and isinstance(other[0].body[0], IfStmt):
+            return None
+        negated = negate(node)
+        if negated is None:
+            return None
+        (then[0].body, other[0].body) = (other[0].body, then[0].body)
+        return negated
+
+    def run(self):
+        """ Rearrange all IF statements with recorded counts """
+        parser = self.parser
+        for method in [parser.main_method] + parser.methods:
+            for stmt in iter_stmts(method):
+                if not isinstance(stmt, IfStmt) or getattr(stmt, 'branch_id', None) is None:
+                    continue
+                node = stmt_tree(stmt)[1]
+                changed = self.reorder(stmt, node)
+                negated = self.invert(stmt, node)
+                if negated is not None:
+                    (node, changed) = (negated, True)
+                if changed:
+                    update_stmt(stmt, None, node)
+
+
+def apply_profile(parser, counts):
+    """ Lay out the branches of a parsed PAP in place for the branch
+        counts of a profile (see load_profile()), returns the parser
+    """
+    number_branches(parser)
+    BranchLayout(parser, counts).run()
+    return parser
@@ -0,0 +1,117 @@
+# coding: utf-8
+"""
+Slicing of a PAP on a subset of its outputs
+
+Only the EVALs whose targets the selected outputs (transitively) depend
+on are kept, together with the IFs deciding about them and the methods
+executing them. The analysis does not consider the order of statements,
+so it keeps every assignment of a needed variable.
+Outputs that are not selected become internal variables if they are
+still needed, else they are removed like unused internal variables.
+"""
+from .. import (
+    EvalStmt,
+    IfStmt,
+    ThenStmt,
+    ElseStmt,
+    ExecuteStmt,
+)
+from ..analysis import MethodEffects, stmt_names, executed_methods
+from .source import iter_stmts
+
+
+class OutputSlicer(object):
+    """ Removes everything the selected outputs do not depend on """
+
+    def __init__(self, parser, outputs):
+        self.parser = parser
+        names = [var.name for var in parser.output_vars]
+        unknown = [name for name in outputs if name not in names]
+        if unknown:
+            raise ValueError("Unknown outputs: {}".format(', '.join(unknown)))
+        self.outputs = set(outputs)
+        self.effects = MethodEffects(parser)
+        self.needed = set(outputs)
+
+    def _relevant(self, stmt):
+        """ True if an IF assigns a needed variable """
+        for part in iter_stmts(stmt):
+            if stmt_names(part)[1] & self.needed:
+                return True
+        return any(self.effects.writes[name] & self.needed for name in executed_methods(stmt))
+
+    def _mark(self, stmt):
+        """ Add the variables read by the needed statements of a body,
+            returns True if anything was added
+        """
+        before = len(self.needed)
+        for part in stmt.body:
+            if isinstance(part, EvalStmt):
+                (reads, writes) = stmt_names(part)
+                if writes & self.needed:
+                    self.needed |= reads
+            elif isinstance(part, IfStmt):
+                if self._relevant(part):
+                    self.needed |= stmt_names(part)[0]
+                for branch in part.body:
+                    if isinstance(branch, (ThenStmt, ElseStmt)):
+                        self._mark(branch)
+        return len(self.needed) != before
+
+    def _prune(self, body):
+        ret = []
+        for part in body:
+            if isinstance(part, EvalStmt):
+                if not stmt_names(part)[1] & self.needed:
+                    continue
+            elif isinstance(part, IfStmt):
+                for branch in part.body:
+                    if isinstance(branch, (ThenStmt, ElseStmt)):
+                        branch.body = self._prune(branch.body)
+                part.body = [
+                    branch for branch in part.body
+                    if not (isinstance(branch, ElseStmt) and not branch.body)
+                ]
+                if not any(branch.body for branch in part.body
+                           if isinstance(branch, (ThenStmt, ElseStmt))):
+                    continue
+            elif isinstance(part, ExecuteStmt):
+                if not self.effects.writes[part.method_name] & self.needed:
+                    continue
+            ret.append(part)
+        return ret
+
+    def run(self):
+        """ Slice all methods, drop the methods, outputs and internal
+            variables which are not needed anymore
+        """
+        parser = self.parser
+        methods = [parser.main_method] + parser.methods
+        changed = True
+        while changed:
+            changed = False
+            for method in methods:
+                changed = self._mark(method) or changed
+        for method in methods:
+            method.body = self._prune(method.body)
+        reachable = MethodEffects(parser).reachable()
+        parser.methods[:] = [method for method in parser.methods if method.name in reachable]
+        used = set(self.outputs)
+        for method in [parser.main_method] + parser.methods:
+            for stmt in iter_stmts(method):
+                (reads, writes) = stmt_names(stmt)
+                used |= reads | writes
+        # outputs that other outputs depend on are still calculated
+        parser.internal_vars.extend(
+            var for var in parser.output_vars if var.name not in self.outputs and var.name in used
+        )
+        parser.output_vars[:] = [var for var in parser.output_vars if var.name in self.outputs]
+        parser.internal_vars[:] = [var for var in parser.internal_vars if var.name in used]
+
+
+def slice_outputs(parser, outputs):
+    """ Remove everything but the computation of the given outputs
+        from a parsed PAP in place, returns the parser
+    """
+    OutputSlicer(parser, outputs).run()
+    return parser
@@ -0,0 +1,148 @@
+# coding: utf-8
+"""
+Conversion between PAP statements and AST nodes
+
+Passes rewrite the AST of a statement and store it back as java-like
+PAP source, so that every generator consumes the result as it would
+consume the original XML.
+"""
+import ast
+
+from .. import (
+    prepare_expr,
+    remove_size_literal,
+    EvalStmt,
+    IfStmt,
+    ThenStmt,
+    ElseStmt,
+)
+from .compare import DecimalCompare
+
+BINOP_SYMBOLS = {
+    ast.Add: '+',
+    ast.Sub: '-',
+    ast.Mult: '*',
+    ast.Div: '/',
+}
+
+CMP_SYMBOLS = {
+    ast.Eq: '==',
+    ast.NotEq: '!=',
+    ast.Lt: '<',
+    ast.LtE: '<=',
+    ast.Gt: '>',
+    ast.GtE: '>=',
+}
+
+PRECEDENCE_OR = 1
+PRECEDENCE_AND = 2
+PRECEDENCE_CMP = 3
+PRECEDENCE_ADD = 4
+PRECEDENCE_MULT = 5
+PRECEDENCE_UNARY = 6
+PRECEDENCE_ATOM = 7
+
+
+def _precedence(node):
+    if isinstance(node, ast.BoolOp):
+        return PRECEDENCE_OR if isinstance(node.op, ast.Or) else PRECEDENCE_AND
+    if isinstance(node, ast.Compare):
+        return PRECEDENCE_CMP
+    if isinstance(node, ast.BinOp):
+        return PRECEDENCE_MULT if isinstance(node.op, (ast.Mult, ast.Div)) else PRECEDENCE_ADD
+    if isinstance(node, ast.UnaryOp):
+        return PRECEDENCE_UNARY
+    return PRECEDENCE_ATOM
+
+
+def _operand(node, precedence):
+    """ Source of an operand, parenthesized if it binds weaker """
+    code = to_source(node)
+    if _precedence(node) < precedence:
+        return '({})'.format(code)
+    return code
+
+
+def to_source(node):
+    """ Convert an AST node back to java-like PAP source """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Num):
+        return repr(node.n)
+    if isinstance(node, ast.Str):
+        return '"{}"'.format(node.s)
+    if isinstance(node, ast.Attribute):
+        return '{}.{}'.format(_operand(node.value, PRECEDENCE_ATOM), node.attr)
+    if isinstance(node, ast.Call):
+        args = ', '.join(to_source(arg) for arg in node.args)
+        if isinstance(node.func, ast.Name) and node.func.id == 'BigDecimalConstructor':
+            return 'new BigDecimal({})'.format(args)
+        return '{}({})'.format(_operand(node.func, PRECEDENCE_ATOM), args)
+    if isinstance(node, ast.Subscript):
+        try:
+            idx = node.slice.value
+        except AttributeError:
+            # python3.9 deprecated the ast.Index class for slices
+            idx = node.slice
+        return '{}[{}]'.format(_operand(node.value, PRECEDENCE_ATOM), to_source(idx))
+    if isinstance(node, ast.UnaryOp):
+        oper = '-' if isinstance(node.op, ast.USub) else '+'
+        return oper + _operand(node.operand, PRECEDENCE_UNARY)
+    if isinstance(node, ast.BinOp):
+        precedence = _precedence(node)
+        # operators are left associative, a - (b - c) needs its parenthesis
+        return '{} {} {}'.format(
+            _operand(node.left, precedence),
+            BINOP_SYMBOLS[type(node.op)],
+            _operand(node.right, precedence + 1)
+        )
+    if isinstance(node, DecimalCompare):
+        return '{}.compareTo({}) {} 0'.format(
+            _operand(node.left, PRECEDENCE_ATOM),
+            to_source(node.comparators[0]),
+            CMP_SYMBOLS[type(node.ops[0])]
+        )
+    if isinstance(node, ast.Compare):
+        return '{} {} {}'.format(
+            _operand(node.left, PRECEDENCE_ADD),
+            CMP_SYMBOLS[type(node.ops[0])],
+            _operand(node.comparators[0], PRECEDENCE_ADD)
+        )
+    if isinstance(node, ast.BoolOp):
+        precedence = _precedence(node)
+        oper = ' || ' if isinstance(node.op, ast.Or) else ' && '
+        return oper.join(_operand(value, precedence + 1) for value in node.values)
+    raise ValueError(u'Unknown AST element: {}'.format(ast.dump(node)))
+
+
+def parse_expr(source):
+    """ Parse a java-like expression without any rewriting """
+    return ast.parse(prepare_expr(remove_size_literal(source))).body[0].value
+
+
+def stmt_tree(stmt):
+    """ Return (target, node) of an EvalStmt or (None, node) of an IfStmt """
+    if isinstance(stmt, EvalStmt):
+        assign = ast.parse(prepare_expr(remove_size_literal(stmt.expr))).body[0]
+        return (assign.targets[0].id, assign.value)
+    return (None, parse_expr(stmt.condition))
+
+
+def update_stmt(stmt, target, node):
+    """ Store a rewritten node in an EvalStmt or IfStmt """
+    if isinstance(stmt, EvalStmt):
+        stmt.expr = '{} = {}'.format(target, to_source(node))
+    else:
+        stmt.condition = to_source(node)
+
+
+def iter_stmts(stmt):
+    """ Yield all EvalStmts and IfStmts of a statement body, including
+        the ones of nested branches
+    """
+    for part in stmt.body:
+        if isinstance(part, (EvalStmt, IfStmt)):
+            yield part
+        if isinstance(part, (IfStmt, ThenStmt, ElseStmt)):
+            for sub in iter_stmts(part):
+                yield sub
@@ -0,0 +1,213 @@
+# coding: utf-8
+"""
+Partial evaluation of a PAP for fixed input values
+
+Most calculations share a few input values, e.g. ``LZZ=2`` for monthly
+payrolls. The fixed inputs are substituted by their values and removed
+from the inputs, IF conditions that become constant are folded, only
+the branch that is taken is kept, and methods that are not executed
+anymore are dropped.
+
+Values assigned from constant expressions are propagated within a
+method body, so a condition on a variable set by an earlier constant
+branch (e.g. ``KZTAB`` for ``STKL``) is folded as well.
+"""
+import ast
+import copy
+import decimal
+
+from .. import (
+    EvalStmt,
+    IfStmt,
+    ThenStmt,
+    ElseStmt,
+    ExecuteStmt,
+)
+from ..analysis import MethodEffects, stmt_names, executed_methods
+from .fold import ConstantFolder, literal_source
+from .source import (
+    parse_expr,
+    stmt_tree,
+    update_stmt,
+    iter_stmts,
+)
+
+CMP_FUNCS = {
+    ast.Eq: lambda left, right: left == right,
+    ast.NotEq: lambda left, right: left != right,
+    ast.Lt: lambda left, right: left < right,
+    ast.LtE: lambda left, right: left <= right,
+    ast.Gt: lambda left, right: left > right,
+    ast.GtE: lambda left, right: left >= right,
+}
+
+
+def parse_values(text):
+    """ Parse "NAME=VALUE,NAME=VALUE" into an ordered list of
+        (name, value) tuples
+    """
+    ret = []
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        (name, sep, value) = part.partition('=')
+        if not sep or not name.strip() or not value.strip():
+            raise ValueError("Invalid input value: '{}', expected NAME=VALUE".format(part))
+        ret.append((name.strip(), value.strip()))
+    return ret
+
+
+def _value_source(var, value):
+    """ PAP source of a literal value of an input variable """
+    try:
+        if var.type == 'int':
+            return str(int(value))
+        if var.type == 'double':
+            return repr(float(value))
+        if var.type == 'BigDecimal':
+            source = literal_source(decimal.Decimal(value))
+            if source is not None:
+                return source
+    except (ValueError, decimal.InvalidOperation):
+        pass
+    raise ValueError("Unsupported value '{}' for input {} of type {}".format(
+        value, var.name, var.type
+    ))
+
+
+class Specializer(ConstantFolder):
+    """ Partially evaluates the methods of a PAP for fixed input values """
+
+    def __init__(self, parser, values):
+        super(Specializer, self).__init__(parser)
+        inputs = dict((var.name, var) for var in parser.input_vars)
+        self.fixed = {}
+        for (name, value) in (values.items() if isinstance(values, dict) else values):
+            if name not in inputs:
+                raise ValueError("Unknown input: {}".format(name))
+            self.fixed[name] = self.scalars[name] = parse_expr(
+                _value_source(inputs[name], str(value))
+            )
+        written = set()
+        for method in [parser.main_method] + parser.methods:
+            for stmt in iter_stmts(method):
+                written |= stmt_names(stmt)[1]
+        assigned = sorted(written & set(self.fixed))
+        if assigned:
+            raise ValueError("Inputs assigned by the PAP cannot be fixed: {}".format(
+                ', '.join(assigned)
+            ))
+        self.known = {}
+        self.effects = MethodEffects(parser)
+
+    def evaluate(self, node):
+        if isinstance(node, ast.Name) and node.id in self.known:
+            return self.known[node.id]
+        return super(Specializer, self).evaluate(node)
+
+    def _substitute(self, node):
+        fixed = self.fixed
+
+        class Substituter(ast.NodeTransformer):
+            def visit_Name(self, name):
+                if name.id in fixed:
+                    return ast.copy_location(copy.deepcopy(fixed[name.id]), name)
+                return name
+        return Substituter().visit(node)
+
+    def simplify(self, node):
+        """ Return True or False for a constant condition, else the
+            condition without its constant operands
+        """
+        if isinstance(node, ast.BoolOp):
+            # && is false if any operand is, || is true if any operand is
+            decisive = isinstance(node.op, ast.Or)
+            values = []
+            for value in node.values:
+                value = self.simplify(value)
+                if value is decisive:
+                    return decisive
+                if value is not (not decisive):
+                    values.append(value)
+            if not values:
+                return not decisive
+            if len(values) == 1:
+                return values[0]
+            node.values = values
+            return node
+        if isinstance(node, ast.Compare) and len(node.ops) == 1:
+            left = self.evaluate(node.left)
+            right = self.evaluate(node.comparators[0])
+            if left is not None and right is not None and \
+                    isinstance(left, decimal.Decimal) == isinstance(right, decimal.Decimal):
+                return CMP_FUNCS[type(node.ops[0])](left, right)
+        return node
+
+    def _writes(self, stmt):
+        written = set()
+        for part in iter_stmts(stmt):
+            written |= stmt_names(part)[1]
+        for name in executed_methods(stmt):
+            written |= self.effects.writes[name]
+        return written
+
+    def _branch(self, stmt, branch_type):
+        for branch in stmt.body:
+            if isinstance(branch, branch_type):
+                return branch.body
+        return []
+
+    def specialize_body(self, body):
+        """ Return a statement body with the fixed inputs substituted
+            and constant IF statements replaced by the branch taken
+        """
+        ret = []
+        for part in body:
+            if isinstance(part, EvalStmt):
+                (target, node) = stmt_tree(part)
+                node = self._substitute(node)
+                update_stmt(part, target, node)
+                value = self.evaluate(node)
+                if value is None:
+                    self.known.pop(target, None)
+                else:
+                    self.known[target] = value
+            elif isinstance(part, IfStmt):
+                condition = self.simplify(self._substitute(stmt_tree(part)[1]))
+                if condition is True or condition is False:
+                    taken = self._branch(part, ThenStmt if condition else ElseStmt)
+                    ret.extend(self.specialize_body(taken))
+                    continue
+                update_stmt(part, None, condition)
+                known = self.known
+                for branch in part.body:
+                    if isinstance(branch, (ThenStmt, ElseStmt)):
+                        self.known = dict(known)
+                        branch.body = self.specialize_body(branch.body)
+                self.known = known
+                for name in self._writes(part):
+                    self.known.pop(name, None)
+            elif isinstance(part, ExecuteStmt):
+                for name in self.effects.writes[part.method_name]:
+                    self.known.pop(name, None)
+            ret.append(part)
+        return ret
+
+    def run(self):
+        """ Specialize all methods and drop the ones not executed anymore """
+        parser = self.parser
+        for method in [parser.main_method] + parser.methods:
+            # methods are executed from different places with different values
+            self.known = {}
+            method.body = self.specialize_body(method.body)
+        reachable = MethodEffects(parser).reachable()
+        parser.methods[:] = [method for method in parser.methods if method.name in reachable]
+        parser.input_vars[:] = [var for var in parser.input_vars if var.name not in self.fixed]
+
+
+def specialize(parser, values):
+    """ Partially evaluate a parsed PAP in place for fixed input
+        values, a dict or (name, value) tuples, returns the parser
+    """
+    Specializer(parser, values).run()
+    return parser
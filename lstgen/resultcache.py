@@ -0,0 +1,297 @@
+# coding: utf-8
+"""
+Persistent result cache shared by processes
+
+ResultCache stores the outputs of calculations in a memory-mapped file
+holding an open-addressing hash table with a fixed number of slots.
+All processes mapping the same file (e.g. the workers of lstgen run, or
+the runs of consecutive nights) share its entries, reading them needs
+neither locks nor unpickling.
+
+A slot holds a 16 byte digest of the PAP (PapParser.xml_hash), the
+calculator options and the canonicalized inputs, followed by the
+outputs packed with struct and a CRC of both. Writers hold an exclusive
+lock on a lock file next to the cache. Readers check the CRC and treat
+torn slots of concurrent writes as misses. An entry is looked up in
+probes consecutive slots. If all of them are taken, the least recently
+used one is replaced, so the file never grows beyond its initial size.
+"""
+import os
+import sys
+import zlib
+import struct
+import decimal
+import hashlib
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # no cross process locking (e.g. windows), concurrent writes are
+    # detected as torn slots by the CRC
+    fcntl = None
+
+from lxml import etree
+
+from . import PapParser
+from .loader import load_calculator
+from .runtime import BigDecimal
+
+MAGIC = b'LSTGENRC'
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct('<8sIIIIQ')
+""" Magic, format version, number of slots, slot size, probes and the
+    use counter of the table
+"""
+
+SLOT_HEADER = struct.Struct('<BII16s')
+""" State (1 if used), CRC of digest and outputs, last use and digest """
+
+_STATE = 0
+_CRC = 1
+_TICK = 5
+_DIGEST = 9
+_VALUES = 25
+
+OUTPUT_FORMATS = {
+    'int': 'q',
+    'double': 'd',
+    'BigDecimal': 'qb',
+}
+""" struct formats of the outputs by declared type, decimal values are
+    stored as coefficient and exponent
+"""
+
+_INT64 = 2 ** 63
+
+DEFAULT_CACHE_SIZE = 2 ** 20
+""" Default number of slots, the file size is this times the slot size """
+
+
+def canonical_inputs(names, inputs):
+    """ Tuple of the input values by names, numbers of equal value
+        (e.g. 1, "1.00" and Decimal("1.0")) are represented alike
+    """
+    ret = []
+    for name in names:
+        value = inputs.get(name)
+        if value is not None and type(value) is not int:
+            if not isinstance(value, decimal.Decimal):
+                value = decimal.Decimal(str(value))
+            if value == value.to_integral_value():
+                value = int(value)
+            else:
+                value = value.normalize()
+        ret.append(value)
+    return tuple(ret)
+
+
+class ResultCache(object):
+    """ Outputs of a PAP by inputs in the memory-mapped file path with
+        size slots. namespace distinguishes calculators of the same PAP
+        whose results differ (e.g. in the numeric mode). A file created
+        with another size, probes or outputs is replaced.
+    """
+
+    decimal_class = BigDecimal
+    """ Class of decoded decimal outputs """
+
+    def __init__(self, path, parser, namespace='', size=DEFAULT_CACHE_SIZE, probes=8):
+        import mmap
+        if size < 1 or probes < 1:
+            raise ValueError("Invalid cache size {} or probes {}".format(size, probes))
+        self.path = path
+        self.input_names = [var.name for var in parser.input_vars]
+        self.output_types = [var.type for var in parser.output_vars]
+        self._decimals = [var_type == 'BigDecimal' for var_type in self.output_types]
+        self.values = struct.Struct(
+            '<' + ''.join(OUTPUT_FORMATS[var_type] for var_type in self.output_types)
+        )
+        self.slot_size = SLOT_HEADER.size + self.values.size
+        self.size = size
+        self.probes = min(probes, size)
+        self.prefix = hashlib.sha256(
+            '{}\0{}\0'.format(parser.xml_hash, namespace).encode('utf-8')
+        ).digest()
+        self.hits = 0
+        self.misses = 0
+        self._lock_path = path + '.lock'
+        with self._locked():
+            self._init_file()
+            with open(path, 'r+b') as cache_file:
+                self.mmap = mmap.mmap(cache_file.fileno(), 0)
+
+    def _header(self, counter=0):
+        return HEADER.pack(MAGIC, FORMAT_VERSION, self.size, self.slot_size, self.probes, counter)
+
+    def _init_file(self):
+        """ Create the file unless it exists with the same layout """
+        expected = self._header()[:-8]
+        try:
+            with open(self.path, 'rb') as cache_file:
+                if cache_file.read(HEADER.size)[:-8] == expected and \
+                        os.fstat(cache_file.fileno()).st_size == \
+                        HEADER.size + self.size * self.slot_size:
+                    return
+        except (IOError, OSError):
+            pass
+        directory = os.path.dirname(os.path.abspath(self.path))
+        (fd, tmp_path) = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as cache_file:
+            cache_file.write(self._header())
+            # all slots are empty (zero)
+            cache_file.truncate(HEADER.size + self.size * self.slot_size)
+        # processes mapping the old file keep using it
+        os.replace(tmp_path, self.path)
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def close(self):
+        """ Unmap the file """
+        self.mmap.close()
+
+    def digest(self, inputs):
+        """ Key of a dict of inputs """
+        key = repr(canonical_inputs(self.input_names, inputs)).encode('utf-8')
+        return hashlib.blake2b(self.prefix + key, digest_size=16).digest()
+
+    def _slots(self, digest):
+        """ Offsets of the slots an entry may be stored in """
+        first = int.from_bytes(digest[:8], 'little') % self.size
+        for idx in range(self.probes):
+            yield HEADER.size + ((first + idx) % self.size) * self.slot_size
+
+    def _counter(self):
+        return struct.unpack_from('<Q', self.mmap, HEADER.size - 8)[0]
+
+    def _encode(self, outputs):
+        """ Packed outputs or None if they cannot be stored """
+        values = []
+        for (var_type, value) in zip(self.output_types, outputs):
+            if var_type == 'BigDecimal':
+                value = decimal.Decimal(value)
+                if not value.is_finite():
+                    return None
+                exponent = value.as_tuple().exponent
+                coefficient = int(value.scaleb(-exponent))
+                if not (-_INT64 <= coefficient < _INT64 and -128 <= exponent < 128):
+                    return None
+                values.extend((coefficient, exponent))
+            elif var_type == 'int':
+                if value is None or not -_INT64 <= value < _INT64:
+                    return None
+                values.append(value)
+            else:
+                if value is None:
+                    return None
+                values.append(value)
+        return self.values.pack(*values)
+
+    def _decode(self, packed):
+        values = iter(self.values.unpack(packed))
+        return [self.decimal_class(decimal.Decimal(value).scaleb(next(values))) if is_decimal else value
+                for (is_decimal, value) in zip(self._decimals, values)]
+
+    def get(self, inputs, digest=None):
+        """ Cached outputs (a list) of a dict of inputs or None """
+        digest = digest or self.digest(inputs)
+        mm = self.mmap
+        for offset in self._slots(digest):
+            if mm[offset] == 0:
+                break
+            if mm[offset + _DIGEST:offset + _VALUES] != digest:
+                continue
+            slot = mm[offset:offset + self.slot_size]
+            if SLOT_HEADER.unpack_from(slot)[_CRC] != zlib.crc32(slot[_DIGEST:]) or \
+                    slot[_STATE] != 1:
+                # overwritten by a concurrent writer
+                break
+            # unlocked, a lost update only makes the entry look older
+            struct.pack_into('<I', mm, offset + _TICK, self._counter() & 0xffffffff)
+            self.hits += 1
+            return self._decode(slot[_VALUES:])
+        self.misses += 1
+        return None
+
+    def put(self, inputs, outputs, digest=None):
+        """ Store the outputs of a dict of inputs, returns False if they
+            cannot be stored
+        """
+        packed = self._encode(outputs)
+        if packed is None:
+            return False
+        digest = digest or self.digest(inputs)
+        mm = self.mmap
+        with self._locked():
+            counter = self._counter() + 1
+            struct.pack_into('<Q', mm, HEADER.size - 8, counter)
+            target = None
+            oldest = None
+            for offset in self._slots(digest):
+                if mm[offset] == 0 or mm[offset + _DIGEST:offset + _VALUES] == digest:
+                    target = offset
+                    break
+                # distance to the counter, it wraps around in the slots
+                age = (counter - struct.unpack_from('<I', mm, offset + _TICK)[0]) & 0xffffffff
+                if oldest is None or age > oldest[0]:
+                    oldest = (age, offset)
+            if target is None:
+                target = oldest[1]
+            mm[target] = 0
+            mm[target + _VALUES:target + self.slot_size] = packed
+            mm[target + _DIGEST:target + _VALUES] = digest
+            struct.pack_into('<II', mm, target + _CRC,
+                             zlib.crc32(digest + packed), counter & 0xffffffff)
+            mm[target] = 1
+        return True
+
+
+class CachedCalculator(object):
+    """ compute(**inputs) of a PAP (see load_calculator(),
+        mode='function') looking up the results in a ResultCache at
+        path first. The options are passed to load_calculator() and
+        distinguish the cached results.
+    """
+
+    def __init__(self, source, path, size=DEFAULT_CACHE_SIZE, probes=8, **options):
+        from . import pap
+        options['mode'] = 'function'
+        if isinstance(source, str) and source in pap.PAP_RESOURCES:
+            xml_content = pap.get_pap_xml(source)
+        else:
+            xml_content = source.encode('utf-8') if not isinstance(source, bytes) else source
+        parser = PapParser(etree.fromstring(xml_content))
+        self.compute = load_calculator(xml_content, **options)
+        namespace = ','.join(sorted('{}={}'.format(key, value) for (key, value)
+                                    in options.items() if key != 'cache_dir'))
+        self.cache = ResultCache(path, parser, namespace, size, probes)
+        if options.get('numeric') == 'fixed':
+            # from_fixed() returns plain Decimals
+            self.cache.decimal_class = decimal.Decimal
+        # hits are returned like the results of the calculator
+        module = sys.modules[self.compute.__module__]
+        self.result_class = getattr(
+            module, '{}Result'.format(options.get('class_name') or parser.internal_name)
+        )
+
+    def __call__(self, **inputs):
+        cache = self.cache
+        digest = cache.digest(inputs)
+        outputs = cache.get(inputs, digest)
+        if outputs is not None:
+            return self.result_class(*outputs)
+        result = self.compute(**inputs)
+        cache.put(inputs, result, digest)
+        return result
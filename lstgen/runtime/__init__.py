@@ -0,0 +1,13 @@
+# coding: utf-8
+"""
+Runtime support for generated python code.
+
+Generated modules either contain a copy of these modules
+or import them from here (see PythonGenerator's ``runtime`` option).
+"""
+from .bd import BigDecimal, idiv
+
+__all__ = [
+    'BigDecimal',
+    'idiv',
+]
@@ -1,14 +1,29 @@
 import decimal
 
+
+def idiv(num, den):
+    """ Integer division truncating towards zero like java's "/" """
+    if (num < 0) == (den < 0):
+        return num // den
+    return -(-num // den)
+
+
 class BigDecimal(decimal.Decimal):
     """ Compatibility class for decimal.Decimal """
 
     ROUND_DOWN = decimal.ROUND_DOWN
     ROUND_UP = decimal.ROUND_UP
 
+    _exponents = {}
+    """ Cache of quantize exponents, keyed by scale """
+
     @classmethod
     def _mk_exp(cls, prec):
-        return cls('0.' + '0' * prec)
+        try:
+            return cls._exponents[prec]
+        except KeyError:
+            exp = cls._exponents[prec] = decimal.Decimal('0.' + '0' * prec)
+            return exp
 
     def divide(self, other, scale=None, rounding=None):
         if not scale and not rounding:
@@ -20,6 +35,10 @@ class BigDecimal(decimal.Decimal):
 
     @classmethod
     def valueOf(cls, value):
+        if type(value) is float:
+            # java's BigDecimal.valueOf(double) uses the canonical
+            # string representation, not the exact binary fraction
+            return cls(repr(value))
         return cls(value)
 
     def multiply(self, other):
@@ -39,7 +58,7 @@ class BigDecimal(decimal.Decimal):
         return int(self)
 
     def compareTo(self, other):
-        return BigDecimal(self.compare(other))
+        return (self > other) - (self < other)
 
 BigDecimal.ZERO = BigDecimal(0)
 BigDecimal.ONE = BigDecimal(1)
@@ -0,0 +1,32 @@
+import decimal
+
+def div_down(num, den):
+    """ Integer division rounding towards zero (BigDecimal.ROUND_DOWN) """
+    if (num < 0) == (den < 0):
+        return num // den
+    return -(-num // den)
+
+def div_up(num, den):
+    """ Integer division rounding away from zero (BigDecimal.ROUND_UP) """
+    if (num < 0) == (den < 0):
+        return -(-num // den)
+    return num // den
+
+def compare(left, right):
+    """ Same as BigDecimal.compareTo for scaled integers """
+    return (left > right) - (left < right)
+
+def to_fixed(value, scale):
+    """ Convert a number to an integer scaled by 10**scale """
+    if type(value) is int:
+        return value * 10 ** scale
+    if type(value) is float:
+        value = repr(value)
+    scaled = decimal.Decimal(value).scaleb(scale)
+    if scaled != scaled.to_integral_value():
+        raise ValueError("{} has more than {} decimal places".format(value, scale))
+    return int(scaled)
+
+def from_fixed(value, scale):
+    """ Convert an integer scaled by 10**scale back to a Decimal """
+    return decimal.Decimal(value).scaleb(-scale)
@@ -0,0 +1,113 @@
+import decimal
+
+import numpy as np
+
+INT64_LIMIT = 2 ** 62
+""" Products estimated above this magnitude are computed with python ints """
+
+def _narrow(value):
+    """ Convert an object array back to int64 if all of its values fit """
+    if value.dtype == object and value.size and \
+            -INT64_LIMIT < value.min() and value.max() < INT64_LIMIT:
+        return value.astype(np.int64)
+    return value
+
+def mul(mask, left, right):
+    """ Overflow safe product of two int64 arrays or numbers, only
+        the rows selected by the mask need to be exact
+    """
+    left = np.asarray(left)
+    right = np.asarray(right)
+    if left.dtype != object and right.dtype != object:
+        estimate = np.abs(left.astype(np.float64) * right.astype(np.float64))
+        if mask is not None and estimate.ndim:
+            # values of rows outside of the mask are discarded, so they may wrap around
+            estimate = np.where(mask, estimate, 0)
+        if not estimate.size or estimate.max() < INT64_LIMIT:
+            with np.errstate(over='ignore'):
+                return left * right
+    return left.astype(object) * right.astype(object)
+
+def div_down(num, den):
+    """ Elementwise integer division rounding towards zero (BigDecimal.ROUND_DOWN) """
+    num = np.asarray(num)
+    # rows masked out by a condition may divide by zero, their result is discarded
+    den = np.where(np.asarray(den) == 0, 1, den)
+    quot = num // den
+    return _narrow(quot + ((quot < 0) & (quot * den != num)))
+
+def div_up(num, den):
+    """ Elementwise integer division rounding away from zero (BigDecimal.ROUND_UP) """
+    num = np.asarray(num)
+    den = np.where(np.asarray(den) == 0, 1, den)
+    quot = num // den
+    return _narrow(quot + ((quot >= 0) & (quot * den != num)))
+
+def compare(left, right):
+    """ Elementwise BigDecimal.compareTo for scaled integers """
+    return (np.asarray(left > right, dtype=np.int8) - np.asarray(left < right, dtype=np.int8))
+
+def take(array, index):
+    """ Elementwise array lookup, indices of masked out rows are clipped """
+    return array.take(index, mode='clip')
+
+def restrict(mask, cond):
+    """ Combine the mask of the enclosing block with a condition """
+    if mask is None:
+        return np.asarray(cond, dtype=bool)
+    return mask & cond
+
+def active(mask):
+    """ True if any row is selected by the mask """
+    return mask is None or bool(mask.any())
+
+def where(mask, value, current):
+    """ Assign value to the rows selected by the mask """
+    if mask is None:
+        return value
+    return np.where(mask, value, current)
+
+def rows(columns):
+    """ Number of rows of the given columns (scalars are broadcast) """
+    shape = np.broadcast_shapes(*[np.shape(value) for value in columns])
+    if len(shape) > 1:
+        raise ValueError("Expected one dimensional columns")
+    return shape[0] if shape else 1
+
+def column(value, size):
+    """ Broadcast a value to a column of the given size """
+    return np.array(np.broadcast_to(value, (size,)))
+
+def to_fixed(value, scale):
+    """ Convert a column to int64 scaled by 10**scale, like the scalar
+        to_fixed() floats stand for their shortest repr and values with
+        more decimal places raise a ValueError
+    """
+    value = np.asarray(value)
+    if value.dtype.kind in 'biu':
+        return mul(None, value.astype(np.int64), 10 ** scale)
+    if value.dtype.kind == 'f':
+        scaled = np.rint(value * 10 ** scale)
+        # the nearest float of the scaled integer is the value itself
+        # if its shortest repr has no more than scale decimal places
+        inexact = scaled / 10 ** scale != value
+        if inexact.any():
+            raise ValueError("{!r} has more than {} decimal places".format(
+                float(value[inexact].flat[0]), scale
+            ))
+        return scaled.astype(np.int64)
+    scaled = [decimal.Decimal(repr(val) if type(val) is float else val).scaleb(scale)
+              for val in value.ravel()]
+    for val in scaled:
+        if val != val.to_integral_value():
+            raise ValueError("{} has more than {} decimal places".format(val.scaleb(-scale), scale))
+    return _narrow(np.array([int(val) for val in scaled], dtype=object).reshape(value.shape))
+
+def to_int(value):
+    """ Convert a column to int64 """
+    return np.asarray(value).astype(np.int64)
+
+def from_fixed(value, scale):
+    """ Convert a column of integers scaled by 10**scale to Decimals """
+    return np.array([decimal.Decimal(int(val)).scaleb(-scale) for val in np.ravel(value)],
+                    dtype=object)
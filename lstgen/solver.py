@@ -0,0 +1,237 @@
+# coding: utf-8
+"""
+Gross pay for a target net pay
+
+The net pay of a PAP rises with the gross pay RE4, apart from steps of
+a few cents where rounded taxes jump. GrossSolver brackets the target
+with the zone boundaries of the income tax tariff (the constants UPTAB
+compares the taxable income X to) and narrows the bracket down to the
+cent. Inside a zone the net pay is nearly linear, so the bisection
+tries the interpolated cent first and falls back to the middle of the
+bracket if that does not shrink it from both sides. A solve usually
+takes less than a dozen calculations, and in a batch the previous
+solution is a good starting point for the next one::
+
+    solver = GrossSolver('2025_1')
+    print(solver.solve(300000, STKL=1, LZZ=2).RE4)
+"""
+import ast
+from collections import namedtuple
+
+from lxml import etree
+
+from . import PapParser, EvalStmt, IfStmt
+from .loader import load_calculator
+from .passes.fold import ConstantFolder
+from .passes.source import iter_stmts, stmt_tree, parse_expr
+from .analysis import node_names
+
+TARIFF_PREFIX = 'UPTAB'
+""" Name prefix of the methods calculating the income tax tariff """
+
+TAXABLE_INCOME = 'X'
+""" Variable the tariff zones are defined on, annual euros """
+
+PERIODS = {
+    1: 1,
+    2: 12,
+    3: 360.0 / 7,
+    4: 360,
+}
+""" Payroll periods per year by LZZ """
+
+GrossSolution = namedtuple('GrossSolution', ['RE4', 'net', 'result', 'evaluations'])
+""" Gross pay in cents, its net pay, the outputs of the PAP for it and
+    the number of calculations the solver needed
+"""
+
+
+def default_net(gross, result):
+    """ Gross pay minus income tax and solidarity surcharge """
+    return gross - result.LSTLZZ - result.SOLZLZZ
+
+
+def _compared_value(node, name):
+    """ The node a comparison of name is comparing it to or None """
+    if not isinstance(node, ast.Compare) or len(node.ops) != 1:
+        return None
+    left = node.left
+    if isinstance(left, ast.Name) and left.id == name:
+        return node.comparators[0]
+    if isinstance(left, ast.Call) and isinstance(left.func, ast.Attribute) and \
+            left.func.attr == 'compareTo' and isinstance(left.func.value, ast.Name) and \
+            left.func.value.id == name and len(left.args) == 1:
+        return left.args[0]
+    return None
+
+
+def zone_boundaries(parser, prefix=TARIFF_PREFIX, name=TAXABLE_INCOME):
+    """ Sorted values a variable is compared to in the methods starting
+        with prefix, as far as they are constant. Variables assigned
+        once with a constant value (e.g. GFB) count as constants.
+    """
+    folder = ConstantFolder(parser)
+    assignments = {}
+    for method in [parser.main_method] + parser.methods:
+        for stmt in iter_stmts(method):
+            if isinstance(stmt, EvalStmt):
+                (target, node) = stmt_tree(stmt)
+                assignments.setdefault(target, []).append(node)
+    inputs = set(var.name for var in parser.input_vars)
+    for (target, nodes) in assignments.items():
+        if len(nodes) == 1 and target not in inputs and target not in node_names(nodes[0]):
+            folder.scalars.setdefault(target, nodes[0])
+    ret = set()
+    for method in parser.methods:
+        if not method.name.startswith(prefix):
+            continue
+        for stmt in iter_stmts(method):
+            if not isinstance(stmt, IfStmt):
+                continue
+            for node in ast.walk(parse_expr(stmt.condition)):
+                compared = _compared_value(node, name)
+                if compared is None:
+                    continue
+                try:
+                    value = folder.evaluate(compared)
+                except RecursionError:
+                    # variables assigned from each other
+                    value = None
+                if value is not None:
+                    ret.add(float(value))
+    return sorted(ret)
+
+
+class GrossSolver(object):
+    """ Solves for the gross pay RE4 (cents per payroll period) with a
+        target net pay, calculated by net(gross, result) from the
+        outputs of the PAP (default_net() by default). pap is a PAP
+        version or the contents of a PAP XML file, the options are
+        passed to load_calculator().
+    """
+
+    def __init__(self, pap, net=default_net, **options):
+        from . import pap as paps
+        if isinstance(pap, str) and pap in paps.PAP_RESOURCES:
+            xml_content = paps.get_pap_xml(pap)
+        else:
+            xml_content = pap.encode('utf-8') if not isinstance(pap, bytes) else pap
+        options['mode'] = 'function'
+        self.compute = load_calculator(xml_content, **options)
+        self.net = net
+        self.boundaries = zone_boundaries(PapParser(etree.fromstring(xml_content)))
+
+    def candidates(self, lzz):
+        """ Gross pays in cents where a payroll period of LZZ reaches
+            the tariff zones, twice for the splitting tariff
+        """
+        periods = PERIODS.get(lzz or 1, 1)
+        ret = set()
+        for boundary in self.boundaries:
+            for factor in (1, 2):
+                ret.add(int(boundary * factor * 100 / periods))
+        return sorted(value for value in ret if value > 0)
+
+    def solve(self, target_net, start=None, **inputs):
+        """ Return a GrossSolution with a gross pay in cents whose net
+            pay is at least target_net while the one of a cent less is
+            below it. Taxes rounded to full euros may allow several such
+            gross pays a few cents apart. start is an estimate of the
+            gross pay, e.g. a previous solution.
+        """
+        calculated = {}
+
+        def net_at(gross):
+            if gross not in calculated:
+                inputs['RE4'] = gross
+                result = self.compute(**inputs)
+                calculated[gross] = (self.net(gross, result), result)
+            return calculated[gross][0]
+
+        if (target_net <= 0 or self.net is not default_net) and net_at(0) >= target_net:
+            (lower, upper) = (None, 0)
+        elif start is not None and start > 0:
+            (lower, upper) = self._expand(net_at, target_net, int(start))
+        else:
+            (lower, upper) = self._bracket(net_at, target_net, inputs.get('LZZ'))
+        if lower is not None:
+            upper = self._bisect(net_at, target_net, lower, upper)
+        (net, result) = calculated[upper]
+        return GrossSolution(upper, net, result, len(calculated))
+
+    def _bracket(self, net_at, target_net, lzz):
+        """ (lower, upper) gross pays with net pays below and not below
+            the target, bracketed by the zone boundaries
+        """
+        candidates = [0] + self.candidates(lzz)
+        (lower, upper) = (0, len(candidates))
+        # net_at(candidates[lower]) < target_net, upper is the first
+        # candidate known to reach it
+        while upper - lower > 1:
+            middle = (lower + upper) // 2
+            if net_at(candidates[middle]) < target_net:
+                lower = middle
+            else:
+                upper = middle
+        if upper < len(candidates):
+            return (candidates[lower], candidates[upper])
+        return self._expand(net_at, target_net, max(candidates[-1], 100))
+
+    def _expand(self, net_at, target_net, start):
+        """ (lower, upper) found by doubling steps away from start """
+        step = max(int(abs(target_net - net_at(start))), 100)
+        if net_at(start) < target_net:
+            lower = start
+            while net_at(lower + step) < target_net:
+                lower += step
+                step *= 2
+            return (lower, lower + step)
+        upper = start
+        while upper > 0 and net_at(max(upper - step, 0)) >= target_net:
+            upper = max(upper - step, 0)
+            step *= 2
+        return (max(upper - step, 0), upper)
+
+    def _bisect(self, net_at, target_net, lower, upper):
+        """ Narrow net_at(lower) < target_net <= net_at(upper) down to
+            adjacent cents, returns upper
+        """
+        last_moved = None
+        repeated = False
+        while upper - lower > 1:
+            (low_net, high_net) = (net_at(lower), net_at(upper))
+            if repeated or high_net == low_net:
+                gross = (lower + upper) // 2
+            else:
+                gross = lower + int((target_net - low_net) * (upper - lower) / (high_net - low_net))
+                gross = min(max(gross, lower + 1), upper - 1)
+            moved = 'lower' if net_at(gross) < target_net else 'upper'
+            if moved == 'lower':
+                lower = gross
+            else:
+                upper = gross
+            # interpolation approaching from one side only
+            repeated = moved == last_moved and not repeated
+            last_moved = moved
+        return upper
+
+    def solve_all(self, targets):
+        """ Yield the GrossSolution of each (target_net, inputs) pair,
+            starting from the previous solution scaled to the target
+        """
+        previous = None
+        for (target_net, inputs) in targets:
+            start = None
+            if previous is not None and previous[0] > 0 and previous[1].RE4 > 0:
+                start = previous[1].RE4 * target_net / previous[0]
+            solution = self.solve(target_net, start=start, **dict(inputs))
+            previous = (target_net, solution)
+            yield solution
+
+
+def solve_gross(pap, target_net, **inputs):
+    """ Return the GrossSolution for a target net pay in cents per
+        payroll period, see GrossSolver.solve(). Use a GrossSolver to
+        solve several targets without loading the PAP again.
+    """
+    return GrossSolver(pap).solve(target_net, **inputs)
@@ -0,0 +1,206 @@
+# coding: utf-8
+"""
+Calculations of one set of inputs over many values of a single input
+
+Most of a PAP does not depend on the gross pay (e.g. MPARA or the setup
+of the tax class). SweepCompiler finds the statements of a PAP that do
+not depend on the swept input, neither through the variables they read
+nor through the branches or method calls they are executed in (see
+SweepCompiler.dependent). Consecutive independent statements are
+grouped into runs, which are executed for the first value only. The
+values they assign are recorded and restored in order for the other
+values, all remaining statements are executed for each value. The
+results are the ones of lstgen.engine::
+
+    sweep = Sweep(PapParser(etree.fromstring(xml_content)))
+    for result in sweep.run(range(100000, 10000000, 100), STKL=1, LZZ=1):
+        print(result.LSTLZZ)
+"""
+from contextlib import contextmanager
+
+from . import EvalStmt, IfStmt, ThenStmt, ElseStmt, ExecuteStmt
+from .analysis import MethodEffects, stmt_names, expr_names
+from .engine import ClosureCompiler
+
+
+class SweepCompiler(ClosureCompiler):
+    """ Compiles a PAP into closures executing the statements that do
+        not depend on the input name once per sweep
+    """
+
+    def __init__(self, parser, name='RE4'):
+        self.name = name
+        self.effects = MethodEffects(parser)
+        self.dependent = set([name])
+        """ Variables whose values may depend on the swept input """
+        self.dependent_methods = set()
+        """ Methods executed in branches depending on the swept input """
+        changed = True
+        while changed:
+            changed = self._propagate(parser.main_method, False)
+            for method in parser.methods:
+                changed = self._propagate(method, method.name in self.dependent_methods) or changed
+        self._independent_methods = {}
+        # independent runs are compiled without grouping, into plain closures
+        self.plain = ClosureCompiler(parser)
+        self.trace = []
+        """ Values assigned by the independent runs, in execution order """
+        self.replaying = False
+        self.position = 0
+        self._in_dependent = False
+        super(SweepCompiler, self).__init__(parser)
+
+    def _propagate(self, stmt, dependent):
+        """ Add the variables and methods depending on the swept input
+            in a statement body, returns True if any were added
+        """
+        changed = False
+        for part in stmt.body:
+            if isinstance(part, ExecuteStmt):
+                if dependent and part.method_name not in self.dependent_methods:
+                    self.dependent_methods.add(part.method_name)
+                    changed = True
+            elif isinstance(part, EvalStmt):
+                (reads, writes) = stmt_names(part)
+                if (dependent or reads & self.dependent) and not writes <= self.dependent:
+                    self.dependent |= writes
+                    changed = True
+            elif isinstance(part, IfStmt):
+                branch = dependent or bool(expr_names(part.condition) & self.dependent)
+                changed = self._propagate(part, branch) or changed
+            elif isinstance(part, (ThenStmt, ElseStmt)):
+                changed = self._propagate(part, dependent) or changed
+        return changed
+
+    def is_independent(self, stmt):
+        """ True if a statement assigns the same values for every value
+            of the swept input
+        """
+        if isinstance(stmt, EvalStmt):
+            return not stmt_names(stmt)[0] & self.dependent
+        if isinstance(stmt, IfStmt):
+            return not expr_names(stmt.condition) & self.dependent and \
+                all(self.is_independent(part) for part in stmt.body)
+        if isinstance(stmt, (ThenStmt, ElseStmt)):
+            return all(self.is_independent(part) for part in stmt.body)
+        if isinstance(stmt, ExecuteStmt):
+            return self._is_independent_method(stmt.method_name)
+        return False
+
+    def _is_independent_method(self, name):
+        if name not in self._independent_methods:
+            method = self.effects.methods[name]
+            self._independent_methods[name] = name not in self.dependent_methods and \
+                all(self.is_independent(part) for part in method.body)
+        return self._independent_methods[name]
+
+    def _writes(self, stmts):
+        """ Variables assigned by statements, including called methods """
+        ret = set()
+        for stmt in stmts:
+            if isinstance(stmt, EvalStmt):
+                ret |= stmt_names(stmt)[1]
+            elif isinstance(stmt, ExecuteStmt):
+                ret |= self.effects.writes[stmt.method_name]
+            elif isinstance(stmt, (IfStmt, ThenStmt, ElseStmt)):
+                ret |= self._writes(stmt.body)
+        return ret
+
+    def _independent_run(self, stmts):
+        """ Compile consecutive independent statements, executed and
+            recorded while recording, restored while replaying
+        """
+        run = self.plain.body(stmts)
+        slots = tuple(sorted(self.slots[name] for name in self._writes(stmts)
+                             if name in self.slots))
+        trace = self.trace
+
+        def run_independent(env):
+            if self.replaying:
+                values = trace[self.position]
+                self.position += 1
+                for (slot, value) in zip(slots, values):
+                    env[slot] = value
+            else:
+                run(env)
+                trace.append(tuple([env[slot] for slot in slots]))
+        return run_independent
+
+    @contextmanager
+    def _dependent_context(self, dependent=True):
+        """ Compile statements whose execution depends on the swept input """
+        (previous, self._in_dependent) = (self._in_dependent, self._in_dependent or dependent)
+        try:
+            yield
+        finally:
+            self._in_dependent = previous
+
+    def method(self, method):
+        with self._dependent_context(method.name in self.dependent_methods):
+            return super(SweepCompiler, self).method(method)
+
+    def stmt(self, stmt):
+        if isinstance(stmt, IfStmt):
+            with self._dependent_context(bool(expr_names(stmt.condition) & self.dependent)):
+                return super(SweepCompiler, self).stmt(stmt)
+        return super(SweepCompiler, self).stmt(stmt)
+
+    def body(self, body):
+        """ Compile a statement body, grouping independent statements """
+        if self._in_dependent:
+            return super(SweepCompiler, self).body(body)
+        stmts = []
+        run = []
+        for part in body:
+            if self.is_independent(part):
+                run.append(part)
+                continue
+            if run:
+                stmts.append(self._independent_run(run))
+                run = []
+            stmts.append(self.stmt(part))
+        if run:
+            stmts.append(self._independent_run(run))
+        stmts = tuple(stmts)
+        if len(stmts) == 1:
+            return stmts[0]
+
+        def run_body(env):
+            for stmt in stmts:
+                stmt(env)
+        return run_body
+
+
+class Sweep(object):
+    """ Calculates a PAP for many values of the input name with the
+        other inputs fixed. Instances are not thread-safe and run one
+        sweep at a time.
+    """
+
+    def __init__(self, parser, name='RE4'):
+        self.compiler = SweepCompiler(parser, name)
+        self.compute = self.compiler.compute_function()
+        self.name = name
+
+    def run(self, values, **inputs):
+        """ Yield the results of the inputs for each of values, as
+            namedtuples like the ones of lstgen.engine.compile_pap()
+        """
+        compiler = self.compiler
+        del compiler.trace[:]
+        compiler.replaying = False
+        try:
+            for value in values:
+                compiler.position = 0
+                inputs[self.name] = value
+                yield self.compute(**inputs)
+                compiler.replaying = True
+        finally:
+            compiler.replaying = False
+
+
+def sweep(parser, name, values, **inputs):
+    """ Yield the results of a parsed PAP for each of values of the input
+        name, see Sweep.run()
+    """
+    return Sweep(parser, name).run(values, **inputs)
@@ -51,6 +51,7 @@ setup(name='LstGen',
     tests_require=requires,
     extras_require = {
         'testing': testing_extras,
+        'numpy': ['numpy'],
     },
     entry_points="""\
     [console_scripts]
@@ -0,0 +1,107 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+import lstgen
+from lstgen.batch import run_batch, run_columns, input_dtype, input_array, output_scales
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+HERE = __file__
+
+INPUT_CSV = """PERSNR,RE4,STKL,LZZ,ZKF
+1,4000000,1,1,
+2,500000,3,2,1.5
+3,2000000,6,1,0
+"""
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(HERE), 'data/tariff_pap.xml')
+        with open(path, 'rb') as xml_file:
+            self.xml = xml_file.read()
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _run(self, **options):
+        out = StringIO()
+        count = run_batch(self.xml, StringIO(INPUT_CSV), out, cache_dir=self.cache_dir,
+                          **options)
+        assert count == 3
+        return out.getvalue().splitlines()
+
+    def test_run(self):
+        lines = self._run(processes=1)
+        assert lines[0] == 'PERSNR,BK,LSTLZZ,SOLZLZZ,VKVLZZ'
+        compute = lstgen.load_calculator(self.xml, mode='function', cache_dir=self.cache_dir)
+        assert lines[1] == '1,' + ','.join(str(value) for value in compute(
+            RE4=4000000, STKL=1, LZZ=1))
+        assert [line.split(',')[0] for line in lines[1:]] == ['1', '2', '3']
+
+    def test_pool(self):
+        # results of the worker processes are written in input order
+        assert self._run(processes=2, chunk_size=1) == self._run(processes=1)
+        fixed = self._run(processes=1, numeric='fixed')
+        assert self._run(processes=2, numeric='fixed') == fixed
+
+    def test_empty(self):
+        out = StringIO()
+        assert run_batch(self.xml, StringIO(''), out, processes=1) == 0
+        assert out.getvalue() == ''
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_columns(self):
+        inputs = input_array(self.xml, 3, [('PERSNR', '<i8')])
+        assert inputs.dtype.names[1:] == input_dtype(self.xml).names
+        # defaults of the PAP
+        assert (list(inputs['af']), list(inputs['f']), list(inputs['KRV'])) == \
+            ([1] * 3, [1.0] * 3, [0] * 3)
+        inputs['PERSNR'] = [1, 2, 3]
+        inputs['RE4'] = [4000000, 500000, 2000000]
+        inputs['STKL'] = [1, 3, 6]
+        inputs['LZZ'] = [1, 2, 1]
+        inputs['ZKF'] = [0, 1.5, 0]
+        input_path = os.path.join(self.cache_dir, 'inputs.npy')
+        output_path = os.path.join(self.cache_dir, 'outputs.npy')
+        np.save(input_path, inputs)
+        for processes in (1, 2):
+            assert run_columns(self.xml, input_path, output_path, processes=processes,
+                               chunk_size=2, cache_dir=self.cache_dir) == 3
+            outputs = np.load(output_path, mmap_mode='r')
+            assert list(outputs['PERSNR']) == [1, 2, 3]
+            scales = output_scales(outputs.dtype)
+            assert sorted(scales) == ['BK', 'LSTLZZ', 'SOLZLZZ', 'VKVLZZ']
+            assert outputs['LSTLZZ'][0] == 489000 * 10 ** scales['LSTLZZ']
+            rows = self._run(processes=1)[1:]
+            assert [int(line.split(',')[2].split('.')[0]) for line in rows] == \
+                list(outputs['LSTLZZ'] // 10 ** scales['LSTLZZ'])
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_missing_columns(self):
+        # f is missing and uses its default 1.0, not zero
+        inputs = np.zeros(2, [('RE4', '<f8'), ('STKL', '<i8'), ('LZZ', '<i8'), ('af', '<i8')])
+        inputs['af'] = 1
+        inputs['RE4'] = [4000000, 2000000]
+        inputs['STKL'] = [4, 4]
+        inputs['LZZ'] = [1, 1]
+        input_path = os.path.join(self.cache_dir, 'inputs.npy')
+        output_path = os.path.join(self.cache_dir, 'outputs.npy')
+        np.save(input_path, inputs)
+        run_columns(self.xml, input_path, output_path, processes=1, cache_dir=self.cache_dir)
+        outputs = np.load(output_path)
+        compute = lstgen.load_calculator(self.xml, mode='function', cache_dir=self.cache_dir)
+        scale = output_scales(outputs.dtype)['LSTLZZ']
+        assert list(outputs['LSTLZZ']) == [
+            int(compute(RE4=re4, STKL=4, LZZ=1).LSTLZZ.scaleb(scale)) for re4 in (4000000, 2000000)
+        ]
+        assert outputs['LSTLZZ'][0] == 489000 * 10 ** scale
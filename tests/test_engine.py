@@ -0,0 +1,64 @@
+# coding: utf-8
+import os
+import decimal
+import unittest
+from io import StringIO
+from lxml import etree
+from lstgen import PapParser
+from lstgen.engine import compile_pap
+from lstgen.passes import optimize
+from lstgen.generators.python import PythonGenerator
+
+
+HERE = __file__
+
+DIVISION_PAP = """
+<PAP name="Division">
+<VARIABLES>
+    <INPUTS><INPUT name="N" type="int"/><INPUT name="A" type="BigDecimal"/></INPUTS>
+    <OUTPUTS>
+        <OUTPUT name="Q" type="int" default="0"/>
+        <OUTPUT name="X" type="BigDecimal" default="BigDecimal.ZERO"/>
+    </OUTPUTS>
+</VARIABLES>
+<CONSTANTS><CONSTANT name="TAB" type="BigDecimal[]" value="{BigDecimal.valueOf (1.5), BigDecimal.valueOf (3)}"/></CONSTANTS>
+<METHODS>
+    <MAIN>
+        <EVAL exec="Q = N / 2"/>
+        <IF expr="A.compareTo(BigDecimal.ZERO) == 1 &amp;&amp; N &gt; 0">
+            <THEN><EVAL exec="X = A.multiply(TAB[1]).divide(TAB[0], 2, BigDecimal.ROUND_DOWN)"/></THEN>
+        </IF>
+    </MAIN>
+</METHODS>
+</PAP>
+"""
+
+
+class TestEngine(unittest.TestCase):
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(HERE), 'data/tariff_pap.xml')
+        self.pap_xml = open(path).read()
+
+    def _generated(self, parser):
+        out = StringIO()
+        PythonGenerator(parser, out, mode='function').generate()
+        namespace = {'__name__': 'lohnsteuer'}
+        exec(out.getvalue(), namespace)
+        return namespace['compute']
+
+    def test_same_results(self):
+        reference = self._generated(PapParser(etree.fromstring(self.pap_xml)))
+        for level in (0, 3):
+            compute = compile_pap(optimize(PapParser(etree.fromstring(self.pap_xml)), level))
+            for (re4, stkl, lzz) in [(0, 1, 1), (500000, 3, 2), (2000000, 6, 1), (9999999, 5, 4)]:
+                inputs = dict(RE4=re4, STKL=stkl, LZZ=lzz, ZKF=decimal.Decimal('1.5'))
+                assert compute(**inputs) == reference(**inputs)
+        assert compute(RE4=4000000, STKL=1, LZZ=1).LSTLZZ == 489000
+
+    def test_division(self):
+        compute = compile_pap(PapParser(etree.fromstring(DIVISION_PAP)))
+        assert compute(N=-7, A=1) == (-3, 0)
+        assert compute(N=10 ** 17 + 3, A=0).Q == 5 * 10 ** 16 + 1
+        assert compute(N=7, A=decimal.Decimal('1.01')) == (3, decimal.Decimal('2.02'))
+        self.assertRaises(TypeError, compute, M=1)
@@ -0,0 +1,96 @@
+# coding: utf-8
+import unittest
+import os
+import itertools
+from decimal import Decimal
+from lxml import etree
+from io import StringIO
+from six import u
+from lstgen import PapParser
+from lstgen.generators.python import PythonGenerator
+
+
+HERE = __file__
+
+OUTPUTS = ('BK', 'LSTLZZ', 'SOLZLZZ', 'VKVLZZ')
+
+
+def load_class(parser, **kwargs):
+    out = StringIO()
+    PythonGenerator(parser, out, class_name='Lohnsteuer2099', **kwargs).generate()
+    namespace = {'__name__': 'lohnsteuer2099'}
+    exec(out.getvalue(), namespace)
+    return namespace['Lohnsteuer2099']
+
+
+class TestFixed(unittest.TestCase):
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(HERE), 'data/tariff_pap.xml')
+        pap_xml = open(path).read()
+        self.parser = PapParser(etree.fromstring(pap_xml))
+
+    def test_generate(self):
+        out = StringIO()
+        PythonGenerator(self.parser, out, numeric='fixed').generate()
+        val = out.getvalue()
+        assert u('def div_down(num, den):') in val
+        assert u('class BigDecimal') not in val
+
+        out = StringIO()
+        PythonGenerator(self.parser, out, numeric='fixed', runtime='import').generate()
+        assert u('from lstgen.runtime.fixed import') in out.getvalue()
+
+    def test_invalid_mode(self):
+        self.assertRaises(ValueError, PythonGenerator, self.parser, StringIO(), numeric='float')
+
+    def test_same_results(self):
+        decimal_cls = load_class(self.parser)
+        fixed_cls = load_class(self.parser, numeric='fixed')
+        for (re4, stkl, lzz, zkf, krv, f) in itertools.product(
+                (0, 99999, 2500000, 12345678), range(1, 7), range(1, 5),
+                ('0', '1.5'), (0, 1), (1.0, 0.713)):
+            kwargs = dict(RE4=re4, STKL=stkl, LZZ=lzz, ZKF=Decimal(zkf), KRV=krv, f=f,
+                          KVZ=Decimal('1.7'), AJAHR=2010, ALTER1=stkl % 2, R=1)
+            expected = decimal_cls(**kwargs)
+            expected.MAIN()
+            calc = fixed_cls(**kwargs)
+            calc.MAIN()
+            for name in OUTPUTS:
+                getter = 'get' + name.capitalize()
+                assert getattr(calc, getter)() == getattr(expected, getter)(), (kwargs, name)
+
+    def test_function_mode(self):
+        decimal_cls = load_class(self.parser)
+        for numeric in PythonGenerator.numeric_modes:
+            out = StringIO()
+            PythonGenerator(self.parser, out, class_name='Lohnsteuer2099',
+                            numeric=numeric, mode='function').generate()
+            namespace = {'__name__': 'lohnsteuer2099'}
+            exec(out.getvalue(), namespace)
+            compute = namespace['compute']
+            for (re4, stkl, zkf) in itertools.product((0, 2500000, 12345678), range(1, 7), ('0', '1.5')):
+                kwargs = dict(RE4=re4, STKL=stkl, LZZ=2, ZKF=Decimal(zkf), KVZ=Decimal('1.7'), AJAHR=2010)
+                expected = decimal_cls(**kwargs)
+                expected.MAIN()
+                result = compute(**kwargs)
+                for name in OUTPUTS:
+                    assert getattr(result, name) == getattr(expected, name), (kwargs, name)
+
+    def test_constant_divisions(self):
+        # TAB2[J].divide(ZAHL12) has no fixed scale, the quotients are folded
+        path = os.path.join(os.path.dirname(HERE), 'data/prorata_pap.xml')
+        parser = PapParser(etree.fromstring(open(path, 'rb').read()))
+        out = StringIO()
+        PythonGenerator(parser, out, numeric='fixed').generate()
+        assert u('(0, 250, 240, 125, 120,)[self.J]') in out.getvalue()
+        decimal_cls = load_class(parser)
+        fixed_cls = load_class(parser, numeric='fixed')
+        for (j, zmvb, vbez) in itertools.product(range(5), range(1, 13), ('0', '33.33', '1234')):
+            kwargs = dict(J=j, ZMVB=zmvb, VBEZ=Decimal(vbez))
+            (expected, calc) = (decimal_cls(**kwargs), fixed_cls(**kwargs))
+            expected.MAIN()
+            calc.MAIN()
+            for name in ('HFVB', 'FVBZ', 'FVB'):
+                getter = 'get' + name.capitalize()
+                assert getattr(calc, getter)() == getattr(expected, getter)(), (kwargs, name)
@@ -0,0 +1,135 @@
+# coding: utf-8
+import sys
+import unittest
+import os
+import shutil
+import subprocess
+import tempfile
+import lstgen
+from lstgen import loader
+from lstgen.adaptive import AdaptiveCalculator
+
+
+HERE = __file__
+
+
+class TestLoader(unittest.TestCase):
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(HERE), 'data/tariff_pap.xml')
+        with open(path, 'rb') as xml_file:
+            self.xml = xml_file.read()
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _calculate(self, cls):
+        calc = cls(RE4=4000000, STKL=1, LZZ=1)
+        calc.MAIN()
+        return calc.getLstlzz()
+
+    def test_load_and_cache(self):
+        cls = lstgen.load_calculator(self.xml, cache_dir=self.cache_dir)
+        assert cls.__name__ == 'Lohnsteuer2099'
+        expected = self._calculate(cls)
+        assert len(os.listdir(self.cache_dir)) == 1
+
+        # a warm cache does not generate code again
+        generate_code = loader.generate_code
+        loader.generate_code = None
+        try:
+            cached = lstgen.load_calculator(self.xml, cache_dir=self.cache_dir)
+        finally:
+            loader.generate_code = generate_code
+        assert self._calculate(cached) == expected
+
+        # different options are cached separately
+        cls = lstgen.load_calculator(self.xml, cache_dir=self.cache_dir, class_name='Lst',
+                                     numeric='fixed')
+        assert cls.__name__ == 'Lst'
+        assert self._calculate(cls) == expected
+        assert len(os.listdir(self.cache_dir)) == 2
+
+    def test_cache_key(self):
+        lstgen.load_calculator(self.xml, cache_dir=self.cache_dir)
+        # the same XML as text or with other whitespace shares the entry
+        lstgen.load_calculator(self.xml.decode('utf-8') + '\n', cache_dir=self.cache_dir)
+        assert len(os.listdir(self.cache_dir)) == 1
+
+        # changed generator sources invalidate the entry
+        source_hash = loader.source_hash()
+        assert len(source_hash) == 64
+        loader._SOURCE_HASH = 'changed'
+        try:
+            lstgen.load_calculator(self.xml, cache_dir=self.cache_dir)
+        finally:
+            loader._SOURCE_HASH = source_hash
+        assert len(os.listdir(self.cache_dir)) == 2
+
+    def test_function_mode(self):
+        compute = lstgen.load_calculator(self.xml.decode('utf-8'), cache_dir=self.cache_dir,
+                                         mode='function')
+        assert compute(RE4=4000000, STKL=1, LZZ=1).LSTLZZ == 489000
+
+    def test_broken_cache(self):
+        lstgen.load_calculator(self.xml, cache_dir=self.cache_dir)
+        for name in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, name), 'wb') as cache_file:
+                cache_file.write(b'broken')
+        cls = lstgen.load_calculator(self.xml, cache_dir=self.cache_dir)
+        assert self._calculate(cls) == 489000
+
+    def test_invalid_language(self):
+        self.assertRaises(ValueError, lstgen.load_calculator, self.xml, lang='java',
+                          cache_dir=self.cache_dir)
+
+    def test_lazy_exports(self):
+        # importing lstgen does not load the runtime helpers
+        code = 'import sys, lstgen; print(sorted(set(["lstgen.loader", "lstgen.solver"]) & set(sys.modules)))'
+        output = subprocess.check_output([sys.executable, '-c', code])
+        assert output.strip() == b'[]'
+        assert lstgen.solve_gross is lstgen.solver.solve_gross
+        self.assertRaises(AttributeError, getattr, lstgen, 'missing')
+
+    def test_memoize(self):
+        compute = lstgen.load_calculator(self.xml, mode='function', memoize=2,
+                                         cache_dir=self.cache_dir)
+        module = sys.modules[compute.__module__]
+        results = [compute(RE4=re4, STKL=1, LZZ=1) for re4 in (4000000, 4000000, 5000000)]
+        assert results[0] == results[1]
+        assert results[0].LSTLZZ == 489000
+        assert module.MEMO_STATS == {"hits": 1, "misses": 2}
+        compute(RE4=6000000, STKL=1, LZZ=1)
+        # the least recently used result is dropped
+        assert list(module._MEMO) == [
+            (None, None, None, None, None, None, 1, None, None, None, None, 5000000, 1, None),
+            (None, None, None, None, None, None, 1, None, None, None, None, 6000000, 1, None),
+        ]
+        cls = lstgen.load_calculator(self.xml, memoize=2, cache_dir=self.cache_dir)
+        for _ in range(2):
+            calc = cls(RE4=4000000, STKL=1, LZZ=1)
+            calc.MAIN()
+            assert calc.LSTLZZ == 489000
+        assert cls.MEMO_STATS == {"hits": 1, "misses": 1}
+        self.assertRaises(ValueError, lstgen.load_calculator, self.xml, memoize=0,
+                          cache_dir=self.cache_dir)
+
+    def test_adaptive(self):
+        calc = AdaptiveCalculator(self.xml, threshold=2, max_variants=1,
+                                  cache_dir=self.cache_dir)
+        assert calc.keys == ('STKL', 'LZZ', 'KRV', 'PKV', 'R', 'af')
+        inputs = dict(RE4=4000000, STKL=1, LZZ=1, KRV=0, PKV=0, R=0, af=1)
+        results = [calc(**inputs).LSTLZZ for _ in range(3)]
+        assert results == [489000] * 3
+        assert (calc.hits, calc.misses) == (1, 2)
+        assert list(calc.variants) == [(1, 1, 0, 0, 0, 1)]
+        # the least recently used variant is dropped
+        inputs['STKL'] = 3
+        for _ in range(2):
+            assert calc(**inputs) == calc.generic(**inputs)
+        assert list(calc.variants) == [(3, 1, 0, 0, 0, 1)]
+        # inputs with default values are not specialized
+        del inputs['R']
+        assert calc(**inputs) == calc.generic(**inputs)
+        self.assertRaises(ValueError, AdaptiveCalculator, self.xml, mode='class')
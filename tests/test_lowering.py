@@ -0,0 +1,52 @@
+# coding: utf-8
+import unittest
+import os
+from lxml import etree
+from io import StringIO
+from six import u
+from lstgen import PapParser
+from lstgen.generators.python import PythonGenerator
+
+
+HERE = __file__
+
+
+class TestLowering(unittest.TestCase):
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(HERE), 'data/tariff_pap.xml')
+        pap_xml = open(path).read()
+        self.parser = PapParser(etree.fromstring(pap_xml))
+        self.out = StringIO()
+
+    def test_generate(self):
+        PythonGenerator(self.parser, self.out, class_name='Lohnsteuer2099').generate()
+        val = self.out.getvalue()
+        for method in ('add', 'subtract', 'multiply', 'divide', 'setScale', 'longValue'):
+            assert u('.{}('.format(method)) not in val.split('class Lohnsteuer2099')[1], method
+        assert u("_SCALE6 = BigDecimal('1E-6')") in val
+        assert u("= BigDecimal('0.07')") in val
+        assert u("self.RW = (self.RW * self.Y)") in val
+        assert u(".quantize(_SCALE0, 'ROUND_DOWN')") in val
+        # integers are not boxed for arithmetic with decimals
+        assert u("self.ST = (self.ST * self.KZTAB)") in val
+
+    def test_fixed_mode_unchanged(self):
+        PythonGenerator(self.parser, self.out, numeric='fixed').generate()
+        assert u('_SCALE') not in self.out.getvalue()
+
+    def test_output_types(self):
+        # lowered operators return plain Decimals, outputs are BigDecimals again
+        for mode in ('class', 'function'):
+            out = StringIO()
+            PythonGenerator(self.parser, out, class_name='Lohnsteuer2099', mode=mode).generate()
+            namespace = {'__name__': 'lohnsteuer'}
+            exec(out.getvalue(), namespace)
+            if mode == 'class':
+                calc = namespace['Lohnsteuer2099'](RE4=4000000, STKL=1, LZZ=1)
+                calc.MAIN()
+                value = calc.getLstlzz()
+            else:
+                value = namespace['compute'](RE4=4000000, STKL=1, LZZ=1).LSTLZZ
+            assert type(value) is namespace['BigDecimal'], mode
+            assert value.setScale(2, 'ROUND_DOWN').compareTo(namespace['BigDecimal'](489000)) == 0
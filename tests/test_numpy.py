@@ -0,0 +1,133 @@
+# coding: utf-8
+import unittest
+import os
+import itertools
+from decimal import Decimal
+from lxml import etree
+from io import StringIO
+from six import u
+from lstgen import PapParser
+from lstgen.generators.python import PythonGenerator
+from lstgen.generators.python.vectorized import PythonNumpyGenerator
+from lstgen.runtime import fixed
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+HERE = __file__
+
+OUTPUTS = ('BK', 'LSTLZZ', 'SOLZLZZ', 'VKVLZZ')
+
+
+def load_module(generator):
+    generator.generate()
+    namespace = {'__name__': 'lohnsteuer2099'}
+    exec(generator.writer.outfile.getvalue(), namespace)
+    return namespace
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestNumpy(unittest.TestCase):
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(HERE), 'data/tariff_pap.xml')
+        pap_xml = open(path).read()
+        self.parser = PapParser(etree.fromstring(pap_xml))
+
+    def test_generate(self):
+        out = StringIO()
+        PythonNumpyGenerator(self.parser, out, runtime='import').generate()
+        val = out.getvalue()
+        assert u('from lstgen.runtime.vectorized import (') in val
+        assert u('def compute(**columns):') in val
+        assert u('def MAIN(self, m=None):') in val
+
+    def test_same_results(self):
+        rows = list(itertools.product(
+            (0, 99999, 2500000, 12345678, 150000000), range(1, 7), range(1, 5),
+            ('0', '1.5'), (0, 1), (1.0, 0.713)
+        ))
+        columns = dict(
+            RE4=np.array([row[0] for row in rows]),
+            STKL=np.array([row[1] for row in rows]),
+            LZZ=np.array([row[2] for row in rows]),
+            ZKF=np.array([Decimal(row[3]) for row in rows], dtype=object),
+            KRV=np.array([row[4] for row in rows]),
+            f=np.array([row[5] for row in rows]),
+            KVZ=Decimal('1.7'),
+            AJAHR=2010,
+            R=1
+        )
+        namespace = load_module(PythonNumpyGenerator(self.parser, StringIO(), 'Lohnsteuer2099'))
+        result = namespace['compute'](**columns)
+        scales = namespace['Lohnsteuer2099'].OUTPUT_SCALES
+
+        decimal_cls = load_module(PythonGenerator(self.parser, StringIO(), 'Lohnsteuer2099'))['Lohnsteuer2099']
+        for (idx, (re4, stkl, lzz, zkf, krv, f)) in enumerate(rows):
+            expected = decimal_cls(RE4=re4, STKL=stkl, LZZ=lzz, ZKF=Decimal(zkf), KRV=krv, f=f,
+                                   KVZ=Decimal('1.7'), AJAHR=2010, R=1)
+            expected.MAIN()
+            for name in OUTPUTS:
+                value = Decimal(int(getattr(result, name)[idx])).scaleb(-scales[name])
+                assert value == getattr(expected, name), (rows[idx], name)
+
+    def test_constant_divisions(self):
+        # TAB2[J].divide(ZAHL12) like the MRE4 of real PAPs
+        path = os.path.join(os.path.dirname(HERE), 'data/prorata_pap.xml')
+        parser = PapParser(etree.fromstring(open(path, 'rb').read()))
+        rows = list(itertools.product(range(5), range(1, 13), ('0', '33.33', '1234')))
+        namespace = load_module(PythonNumpyGenerator(parser, StringIO(), 'ProRata'))
+        result = namespace['compute'](
+            J=np.array([row[0] for row in rows]),
+            ZMVB=np.array([row[1] for row in rows]),
+            VBEZ=np.array([Decimal(row[2]) for row in rows], dtype=object)
+        )
+        scales = namespace['ProRata'].OUTPUT_SCALES
+        decimal_cls = load_module(PythonGenerator(parser, StringIO(), 'ProRata'))['ProRata']
+        for (idx, (j, zmvb, vbez)) in enumerate(rows):
+            expected = decimal_cls(J=j, ZMVB=zmvb, VBEZ=Decimal(vbez))
+            expected.MAIN()
+            for name in ('HFVB', 'FVBZ', 'FVB'):
+                value = Decimal(int(getattr(result, name)[idx])).scaleb(-scales[name])
+                assert value == getattr(expected, name), (rows[idx], name)
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestVectorizedRuntime(unittest.TestCase):
+
+    def setUp(self):
+        from lstgen.runtime import vectorized
+        self.rt = vectorized
+
+    def test_division_rounding(self):
+        num = np.array([7, -7, 7, -7, 6, 0])
+        den = np.array([2, 2, -2, -2, 2, 5])
+        assert self.rt.div_down(num, den).tolist() == [3, -3, -3, 3, 3, 0]
+        assert self.rt.div_up(num, den).tolist() == [4, -4, -4, 4, 3, 0]
+
+    def test_mul_overflow(self):
+        big = np.array([2 ** 40, 3])
+        res = self.rt.mul(None, big, big)
+        assert res.tolist() == [2 ** 80, 9]
+        # rows outside of the mask do not need to be exact
+        res = self.rt.mul(np.array([False, True]), big, big)
+        assert res.dtype == np.int64
+        assert res[1] == 9
+        assert self.rt.div_down(self.rt.mul(None, big, big), 2 ** 40).dtype == np.int64
+
+    def test_conversion(self):
+        assert self.rt.to_fixed(np.array([1, -2]), 2).tolist() == [100, -200]
+        assert self.rt.to_fixed(np.array([0.1, 1.005]), 3).tolist() == [100, 1005]
+        assert self.rt.to_fixed(np.array(['1.25'], dtype=object), 2).tolist() == [125]
+        self.assertRaises(ValueError, self.rt.to_fixed, np.array(['1.255'], dtype=object), 2)
+        # floats with more decimal places raise like the scalar to_fixed()
+        for (value, scale) in [(1.255, 2), (0.1, 0), (float('nan'), 2)]:
+            self.assertRaises(ValueError, self.rt.to_fixed, np.array([2.0, value]), scale)
+            if value == value:
+                self.assertRaises(ValueError, fixed.to_fixed, value, scale)
+        assert self.rt.to_fixed(np.array([0.07, -1234567.89]), 2).tolist() == [7, -123456789]
+        assert [str(val) for val in self.rt.from_fixed(np.array([-125]), 2)] == ['-1.25']
+        assert self.rt.rows([np.zeros(3), 1]) == 3
@@ -0,0 +1,458 @@
+# coding: utf-8
+import ast
+import os
+import decimal
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from lxml import etree
+from lstgen import PapParser, IfStmt, parse_condition_stmt
+from lstgen.passes import optimize
+from lstgen.passes.compare import DecimalCompare
+from lstgen.passes.fold import ConstantFolder, literal_source
+from lstgen.passes.inline import inline_methods, method_size
+from lstgen.passes.cse import eliminate_subexpressions
+from lstgen.passes.source import to_source, parse_expr, iter_stmts
+from lstgen.passes.specialize import specialize, parse_values
+from lstgen.passes.slicing import slice_outputs
+from lstgen.passes.profile import number_branches, apply_profile, save_profile
+from lstgen.generators.python import PythonGenerator
+
+
+HERE = __file__
+
+PRECOMPUTE_PAP = """
+<PAP name="Precompute">
+<VARIABLES>
+    <INPUTS><INPUT name="IN" type="BigDecimal"/></INPUTS>
+    <OUTPUTS><OUTPUT name="OUT" type="BigDecimal"/></OUTPUTS>
+    <INTERNALS>
+        <INTERNAL name="RATE" type="BigDecimal"/>
+        <INTERNAL name="DAYS" type="int"/>
+    </INTERNALS>
+</VARIABLES>
+<CONSTANTS><CONSTANT name="ZAHL100" type="BigDecimal" value="new BigDecimal(100)"/></CONSTANTS>
+<METHODS>
+    <MAIN>
+        <EXECUTE method="MPARA"/>
+        <EVAL exec="OUT = IN.multiply(RATE).add(BigDecimal.valueOf(DAYS))"/>
+    </MAIN>
+    <METHOD name="MPARA">
+        <EVAL exec="RATE = BigDecimal.valueOf(7).divide(ZAHL100, 2, BigDecimal.ROUND_UP)"/>
+        <EVAL exec="DAYS = 360 / 7"/>
+    </METHOD>
+</METHODS>
+</PAP>
+"""
+
+CSE_PAP = """
+<PAP name="Cse">
+<VARIABLES>
+    <INPUTS><INPUT name="A" type="BigDecimal"/><INPUT name="B" type="BigDecimal"/></INPUTS>
+    <OUTPUTS><OUTPUT name="X" type="BigDecimal"/><OUTPUT name="Y" type="BigDecimal"/></OUTPUTS>
+    <INTERNALS><INTERNAL name="Z" type="BigDecimal"/></INTERNALS>
+</VARIABLES>
+<CONSTANTS><CONSTANT name="ZAHL2" type="BigDecimal" value="new BigDecimal(2)"/></CONSTANTS>
+<METHODS>
+    <MAIN>
+        <EVAL exec="X = A.add(B).multiply(ZAHL2)"/>
+        <EVAL exec="Y = A.add(B).multiply(ZAHL2).add(A)"/>
+        <IF expr="X.compareTo(Y) == 1">
+            <THEN><EVAL exec="Z = A.add(B).multiply(ZAHL2).subtract(Y.add(B))"/></THEN>
+        </IF>
+        <EVAL exec="Z = Y.add(B).multiply(Y.add(B))"/>
+        <EXECUTE method="MSETA"/>
+        <EVAL exec="X = A.add(B).multiply(ZAHL2)"/>
+    </MAIN>
+    <METHOD name="MSETA">
+        <EVAL exec="A = B"/>
+    </METHOD>
+</METHODS>
+</PAP>
+"""
+
+GUARDED_PAP = """
+<PAP name="Guarded">
+<VARIABLES>
+    <INPUTS><INPUT name="A" type="BigDecimal"/><INPUT name="B" type="BigDecimal"/></INPUTS>
+    <OUTPUTS><OUTPUT name="D" type="BigDecimal" default="new BigDecimal(0)"/></OUTPUTS>
+</VARIABLES>
+<CONSTANTS/>
+<METHODS>
+    <MAIN>
+        <IF expr="A.compareTo(BigDecimal.ZERO) != 0 &amp;&amp; B.divide(A, 2, BigDecimal.ROUND_DOWN).compareTo(BigDecimal.ONE) == 1">
+            <THEN><EVAL exec="D = B.divide(A, 2, BigDecimal.ROUND_DOWN)"/></THEN>
+        </IF>
+        <EVAL exec="D = D.add(B.multiply(B))"/>
+        <IF expr="A.compareTo(BigDecimal.ZERO) == 0 || B.multiply(B).compareTo(D) == 1">
+            <THEN><EVAL exec="D = D.add(B)"/></THEN>
+        </IF>
+    </MAIN>
+</METHODS>
+</PAP>
+"""
+
+SLICE_PAP = """
+<PAP name="Slice">
+<VARIABLES>
+    <INPUTS><INPUT name="A" type="BigDecimal"/><INPUT name="N" type="int"/></INPUTS>
+    <OUTPUTS>
+        <OUTPUT name="X" type="BigDecimal"/>
+        <OUTPUT name="Y" type="BigDecimal"/>
+        <OUTPUT name="Z" type="BigDecimal"/>
+    </OUTPUTS>
+    <INTERNALS><INTERNAL name="T" type="BigDecimal"/><INTERNAL name="U" type="BigDecimal"/></INTERNALS>
+</VARIABLES>
+<METHODS>
+    <MAIN>
+        <EXECUTE method="MT"/>
+        <EXECUTE method="MU"/>
+        <IF expr="N == 1">
+            <THEN><EVAL exec="Y = T"/></THEN>
+            <ELSE><EVAL exec="Z = U"/></ELSE>
+        </IF>
+        <EVAL exec="X = Y.add(A)"/>
+    </MAIN>
+    <METHOD name="MT"><EVAL exec="T = A.multiply(A)"/></METHOD>
+    <METHOD name="MU"><EVAL exec="U = A.subtract(A)"/></METHOD>
+</METHODS>
+</PAP>
+"""
+
+PROFILE_PAP = """
+<PAP name="Profile">
+<VARIABLES>
+    <INPUTS><INPUT name="A" type="BigDecimal"/><INPUT name="N" type="int"/></INPUTS>
+    <OUTPUTS><OUTPUT name="X" type="BigDecimal"/><OUTPUT name="Y" type="BigDecimal"/></OUTPUTS>
+</VARIABLES>
+<CONSTANTS><CONSTANT name="ZAHL0" type="BigDecimal" value="BigDecimal.valueOf(0)"/></CONSTANTS>
+<METHODS>
+    <MAIN>
+        <IF expr="N == 1 || A.compareTo(ZAHL0) == 1">
+            <THEN><EVAL exec="X = A"/></THEN>
+            <ELSE><EVAL exec="X = ZAHL0"/></ELSE>
+        </IF>
+        <IF expr="N == 2">
+            <THEN><EVAL exec="Y = A"/></THEN>
+            <ELSE><EVAL exec="Y = ZAHL0"/></ELSE>
+        </IF>
+    </MAIN>
+</METHODS>
+</PAP>
+"""
+
+
+class TestCompareRewrite(unittest.TestCase):
+
+    def assert_rewritten(self, source, op_type, left='A', right='B'):
+        node = parse_condition_stmt(source)
+        assert isinstance(node, DecimalCompare), source
+        assert isinstance(node.ops[0], op_type), source
+        assert node.left.id == left
+        assert node.comparators[0].id == right
+
+    def test_rewrite(self):
+        self.assert_rewritten('A.compareTo(B) == 1', ast.Gt)
+        self.assert_rewritten('A.compareTo(B) == -1', ast.Lt)
+        self.assert_rewritten('A.compareTo(B) == 0', ast.Eq)
+        self.assert_rewritten('A.compareTo(B) != 1', ast.LtE)
+        self.assert_rewritten('A.compareTo(B) != -1', ast.GtE)
+        self.assert_rewritten('A.compareTo(B) != 0', ast.NotEq)
+        self.assert_rewritten('A.compareTo(B) >= 0', ast.GtE)
+        self.assert_rewritten('A.compareTo(B) < 1', ast.LtE)
+        self.assert_rewritten('1 == A.compareTo(B)', ast.Gt)
+        self.assert_rewritten('0 > A.compareTo(B)', ast.Lt)
+
+    def test_nested(self):
+        node = parse_condition_stmt('A.compareTo(B) == 1 && (C == 2 || A.compareTo(C) != 1)')
+        assert isinstance(node.values[0], DecimalCompare)
+        assert isinstance(node.values[1].values[1], DecimalCompare)
+        assert not isinstance(node.values[1].values[0], DecimalCompare)
+
+    def test_unchanged(self):
+        for source in ('A.compareTo(B) == 2', 'A.compareTo(B) > -2', 'A == 1', 'A.compareTo(B) == C'):
+            assert not isinstance(parse_condition_stmt(source), DecimalCompare), source
+
+
+class TestSource(unittest.TestCase):
+
+    def test_roundtrip(self):
+        for source in (
+                'A.add(B).divide(C, 2, BigDecimal.ROUND_DOWN)',
+                'new BigDecimal(0.5)',
+                '(A - B) * C - (D - E)',
+                '-(A + 1)',
+                'A == 1 && (B == 2 || C == 3)',
+                'TAB[K - 1].compareTo(X) > 0',
+        ):
+            assert to_source(parse_expr(source)) == source, source
+        assert to_source(parse_condition_stmt('A.compareTo(B) == 1')) == 'A.compareTo(B) > 0'
+
+
+class TestFold(unittest.TestCase):
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(HERE), 'data/tariff_pap.xml')
+        self.pap_xml = open(path).read()
+
+    def _parser(self, level=0):
+        return optimize(PapParser(etree.fromstring(self.pap_xml)), level)
+
+    def _calculator(self, parser):
+        out = StringIO()
+        PythonGenerator(parser, out, class_name='Lohnsteuer2099').generate()
+        namespace = {'__name__': 'lohnsteuer'}
+        exec(out.getvalue(), namespace)
+        return namespace['Lohnsteuer2099']
+
+    def test_literal_source(self):
+        assert literal_source(decimal.Decimal('1200')) == 'BigDecimal.valueOf(1200)'
+        assert literal_source(decimal.Decimal('0.07')) == 'BigDecimal.valueOf(0.07)'
+        # Double.toString(1.5) has one decimal place only
+        assert literal_source(decimal.Decimal('1.50')) is None
+        assert literal_source(decimal.Decimal('1E+2')) is None
+
+    def test_evaluate(self):
+        folder = ConstantFolder(self._parser())
+        def evaluate(source):
+            return folder.evaluate(parse_expr(source))
+        assert str(evaluate('ZAHL100.multiply(BigDecimal.valueOf(1.5))')) == '150.0'
+        assert str(evaluate('ZAHL7.divide(ZAHL12, 3, BigDecimal.ROUND_UP)')) == '0.584'
+        assert str(evaluate('BigDecimal.valueOf(-7).divide(ZAHL12, 3, BigDecimal.ROUND_DOWN)')) == '-0.583'
+        assert str(evaluate('BigDecimal.valueOf(1.25).setScale(1, BigDecimal.ROUND_UP)')) == '1.3'
+        assert evaluate('7 / 2') == 3
+        assert evaluate('-7 / 2') == -3
+        # not exact at any scale
+        assert evaluate('ZAHL7.divide(ZAHL12)') is None
+
+    def test_hoisting(self):
+        parser = self._parser(1)
+        constants = dict((const.name, const.value) for const in parser.constants)
+        assert constants['HOISTED1'] == 'BigDecimal.valueOf(90600)'
+        exprs = [stmt.expr for method in parser.methods for stmt in iter_stmts(method)
+                 if hasattr(stmt, 'expr')]
+        assert 'BBGRV = HOISTED1' in exprs
+        assert not any('valueOf(0.07)' in expr for expr in exprs)
+        # the same value is hoisted once
+        assert list(constants.values()).count('BigDecimal.valueOf(36)') == 1
+
+    def test_same_results(self):
+        calculators = [self._calculator(self._parser(level)) for level in (0, 1, 2, 3)]
+        for (re4, stkl, lzz) in [(0, 1, 1), (500000, 3, 2), (2000000, 6, 1), (9999999, 5, 4)]:
+            results = set()
+            for cls in calculators:
+                calc = cls(RE4=re4, STKL=stkl, LZZ=lzz, ZKF=decimal.Decimal('1.5'))
+                calc.MAIN()
+                results.add((calc.getLstlzz(), calc.getSolzlzz(), calc.getBk(), calc.getVkvlzz()))
+            assert len(results) == 1
+
+    def test_precompute_method(self):
+        parser = optimize(PapParser(etree.fromstring(PRECOMPUTE_PAP)))
+        assert [method.name for method in parser.methods] == []
+        assert len(parser.main_method.body) == 1
+        defaults = dict((var.name, var.default) for var in parser.internal_vars)
+        assert defaults == {'RATE': 'BigDecimal.valueOf(0.07)', 'DAYS': '51'}
+
+    def test_inline(self):
+        parser = self._parser(2)
+        assert [method.name for method in parser.methods] == ['MLSTJAHR', 'UPTAB', 'UPANTEIL']
+        executed = [part.method_name for part in parser.main_method.body
+                    if hasattr(part, 'method_name')]
+        assert executed == ['MLSTJAHR', 'UPANTEIL', 'UPANTEIL']
+        assert method_size(parser.main_method) > 50
+
+    def test_inline_thresholds(self):
+        parser = inline_methods(self._parser(), max_calls=0, max_size=0)
+        assert len(parser.methods) == 12
+        parser = inline_methods(self._parser(), max_calls=4, max_size=0)
+        assert [method.name for method in parser.methods] == []
+
+    def test_cse(self):
+        parser = eliminate_subexpressions(PapParser(etree.fromstring(CSE_PAP)))
+        body = parser.main_method.body
+        assert [var.name for var in parser.internal_vars] == ['Z', 'CSE1', 'CSE2']
+        assert [stmt.expr for stmt in body[:3]] == [
+            'CSE1 = A.add(B).multiply(ZAHL2)',
+            'X = CSE1',
+            'Y = CSE1.add(A)',
+        ]
+        # values computed before an IF are reused in its branches
+        assert body[3].body[0].body[0].expr == 'Z = CSE1.subtract(Y.add(B))'
+        # duplicate within a statement
+        assert [stmt.expr for stmt in body[4:6]] == ['CSE2 = Y.add(B)', 'Z = CSE2.multiply(CSE2)']
+        # A is assigned by MSETA
+        assert body[7].expr == 'X = A.add(B).multiply(ZAHL2)'
+
+    def test_cse_guarded(self):
+        # B.divide(A, ...) is only evaluated if A is not zero
+        parser = eliminate_subexpressions(PapParser(etree.fromstring(GUARDED_PAP)))
+        body = parser.main_method.body
+        assert body[0].condition.startswith('A.compareTo(BigDecimal.ZERO) != 0')
+        assert 'B.divide(A, 2, BigDecimal.ROUND_DOWN).compareTo' in body[0].condition
+        # values computed before a condition are reused behind a guard
+        assert [stmt.expr for stmt in body[1:3]] == ['CSE1 = B.multiply(B)', 'D = D.add(CSE1)']
+        assert 'CSE1.compareTo(D)' in body[3].condition
+        cls = self._calculator(parser)
+        for (value, expected) in [(0, '30'), (2, '27.50'), (-3, '25')]:
+            calc = cls(A=decimal.Decimal(value), B=decimal.Decimal(5))
+            calc.MAIN()
+            assert calc.getD() == decimal.Decimal(expected), value
+
+    def test_invalid_level(self):
+        self.assertRaises(ValueError, optimize, self._parser(), 5)
+
+
+class TestSpecialize(unittest.TestCase):
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(HERE), 'data/tariff_pap.xml')
+        self.pap_xml = open(path).read()
+
+    def _parser(self, values, level=0):
+        parser = specialize(PapParser(etree.fromstring(self.pap_xml)), values)
+        return optimize(parser, level)
+
+    def test_parse_values(self):
+        assert parse_values('LZZ=2, STKL=1,') == [('LZZ', '2'), ('STKL', '1')]
+        self.assertRaises(ValueError, parse_values, 'LZZ')
+        self.assertRaises(ValueError, parse_values, 'LZZ=')
+
+    def test_specialize(self):
+        parser = self._parser({'LZZ': 2, 'STKL': 1, 'KRV': 0, 'PKV': 0})
+        assert 'LZZ' not in [var.name for var in parser.input_vars]
+        assert 'MST5_6' not in [method.name for method in parser.methods]
+        conditions = [stmt.condition for method in [parser.main_method] + parser.methods
+                      for stmt in iter_stmts(method) if isinstance(stmt, IfStmt)]
+        for name in ('LZZ', 'STKL', 'KRV', 'PKV', 'KZTAB'):
+            assert not any(name in condition for condition in conditions), name
+        upanteil = [method for method in parser.methods if method.name == 'UPANTEIL'][0]
+        # the nested IFs on LZZ are replaced by the branch taken
+        assert [stmt.expr for stmt in upanteil.body] == [
+            'ANTEIL1 = JW.divide(ZAHL12, 0, BigDecimal.ROUND_DOWN)'
+        ]
+
+    def test_partial_condition(self):
+        parser = self._parser({'STKL': 6})
+        conditions = [stmt.condition for method in parser.methods
+                      for stmt in iter_stmts(method) if isinstance(stmt, IfStmt)]
+        assert not any('PKV' in condition for condition in conditions)
+        parser = self._parser({'STKL': 3})
+        conditions = [stmt.condition for method in parser.methods
+                      for stmt in iter_stmts(method) if isinstance(stmt, IfStmt)]
+        assert 'PKV > 0' in conditions
+
+    def test_same_results(self):
+        default = TestFold('test_same_results')
+        default.pap_xml = self.pap_xml
+        reference = default._calculator(default._parser())
+        for (values, level) in [({'LZZ': 2, 'STKL': 1}, 0), ({'LZZ': 1, 'STKL': 6, 'R': 1}, 3)]:
+            calculator = default._calculator(self._parser(values, level))
+            for re4 in (0, 500000, 2000000, 9999999):
+                ref = reference(RE4=re4, ZKF=decimal.Decimal('1.5'), **values)
+                ref.MAIN()
+                calc = calculator(RE4=re4, ZKF=decimal.Decimal('1.5'))
+                calc.MAIN()
+                assert (ref.getLstlzz(), ref.getSolzlzz(), ref.getBk()) == \
+                    (calc.getLstlzz(), calc.getSolzlzz(), calc.getBk())
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, self._parser, {'FOO': 1})
+        self.assertRaises(ValueError, self._parser, {'LZZ': 'monthly'})
+        self.assertRaises(ValueError, self._parser, {'RE4': '1E+400'})
+        parser = PapParser(etree.fromstring(CSE_PAP))
+        # A is assigned by MSETA
+        self.assertRaises(ValueError, specialize, parser, {'A': 1})
+
+
+class TestSlicing(unittest.TestCase):
+
+    def test_slice(self):
+        parser = slice_outputs(PapParser(etree.fromstring(SLICE_PAP)), ['X'])
+        assert [var.name for var in parser.output_vars] == ['X']
+        # Y is needed to calculate X, U and Z are not
+        assert [var.name for var in parser.internal_vars] == ['T', 'Y']
+        assert [method.name for method in parser.methods] == ['MT']
+        body = parser.main_method.body
+        assert [getattr(part, 'method_name', None) for part in body] == ['MT', None, None]
+        assert body[1].condition == 'N == 1'
+        assert len(body[1].body) == 1
+        assert body[2].expr == 'X = Y.add(A)'
+
+    def test_slice_branch(self):
+        parser = slice_outputs(PapParser(etree.fromstring(SLICE_PAP)), ['Z'])
+        body = parser.main_method.body
+        assert [method.name for method in parser.methods] == ['MU']
+        # the empty THEN is kept for the ELSE
+        assert [len(branch.body) for branch in body[1].body] == [0, 1]
+
+    def test_same_results(self):
+        path = os.path.join(os.path.dirname(HERE), 'data/tariff_pap.xml')
+        pap_xml = open(path).read()
+        fold = TestFold('test_same_results')
+        fold.pap_xml = pap_xml
+        reference = fold._calculator(fold._parser())
+        parser = slice_outputs(PapParser(etree.fromstring(pap_xml)), ['LSTLZZ', 'SOLZLZZ'])
+        assert [var.name for var in parser.output_vars] == ['LSTLZZ', 'SOLZLZZ']
+        calculator = fold._calculator(parser)
+        for (re4, stkl, lzz) in [(0, 1, 1), (500000, 3, 2), (2000000, 6, 1), (9999999, 5, 4)]:
+            ref = reference(RE4=re4, STKL=stkl, LZZ=lzz)
+            ref.MAIN()
+            calc = calculator(RE4=re4, STKL=stkl, LZZ=lzz)
+            calc.MAIN()
+            assert (ref.getLstlzz(), ref.getSolzlzz()) == (calc.getLstlzz(), calc.getSolzlzz())
+
+    def test_unknown_output(self):
+        self.assertRaises(
+            ValueError, slice_outputs, PapParser(etree.fromstring(SLICE_PAP)), ['X', 'T']
+        )
+
+
+class TestProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _parser(self):
+        return number_branches(PapParser(etree.fromstring(PROFILE_PAP)))
+
+    def test_number_branches(self):
+        body = self._parser().main_method.body
+        assert [stmt.branch_id for stmt in body] == ['MAIN:0', 'MAIN:1']
+
+    def test_profiling(self):
+        out = StringIO()
+        PythonGenerator(self._parser(), out, profile=True).generate()
+        namespace = {'__name__': 'profile'}
+        exec(out.getvalue(), namespace)
+        for (a, n) in [(1, 1), (-1, 0), (2, 2)]:
+            namespace['Profile'](A=a, N=n).MAIN()
+        counts = namespace['_PROFILE']
+        assert counts['MAIN:0'] == [2, 1]
+        # the second operand is evaluated if the first one is false
+        assert counts['MAIN:0.0'] == [1, 2]
+        assert counts['MAIN:0.1'] == [1, 1]
+        assert counts['MAIN:1'] == [1, 2]
+        path = os.path.join(self.tmpdir, 'profile.json')
+        save_profile(counts, path)
+        assert save_profile(counts, path)['MAIN:0'] == [4, 2]
+
+    def test_apply_profile(self):
+        counts = {
+            'MAIN:0': [1, 9],
+            'MAIN:0.0': [1, 9],
+            'MAIN:0.1': [8, 1],
+            'MAIN:1': [9, 1],
+        }
+        body = apply_profile(self._parser(), counts).main_method.body
+        # || operands most often true first, then inverted for the ELSE branch
+        assert body[0].condition == 'A.compareTo(ZAHL0) != 1 && N != 1'
+        assert body[0].body[0].body[0].expr == 'X = ZAHL0'
+        assert body[0].body[1].body[0].expr == 'X = A'
+        assert body[1].condition == 'N == 2'
+        # unknown branches are kept
+        body = apply_profile(self._parser(), {}).main_method.body
+        assert body[0].condition == 'N == 1 || A.compareTo(ZAHL0) == 1'
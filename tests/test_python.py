@@ -5,7 +5,7 @@ from lxml import etree
 from io import StringIO
 from six import u
 from lstgen import PapParser
-from lstgen.writers.python import PythonWriter
+from lstgen.generators.python import PythonGenerator
 
 
 HERE = __file__
@@ -18,7 +18,7 @@ class TestPython(unittest.TestCase):
         pap_xml = open(path).read()
         self.parser = PapParser(etree.fromstring(pap_xml))
         self.out = StringIO()
-        self.writer = PythonWriter(
+        self.writer = PythonGenerator(
             self.parser,
             self.out,
             class_name="üäö"
@@ -40,3 +40,32 @@ class TestPython(unittest.TestCase):
 
         assert u('def MFOO(self):') in val
         assert u('def MBAR(self):') in val
+
+    def test_generate_import_runtime(self):
+        writer = PythonGenerator(self.parser, self.out, runtime='import')
+        writer.generate()
+        val = self.out.getvalue()
+        assert u('from lstgen.runtime import BigDecimal') in val
+        assert u('class BigDecimal(decimal.Decimal):') not in val
+
+    def test_slots_and_reset(self):
+        writer = PythonGenerator(self.parser, self.out, class_name='Example')
+        writer.generate()
+        namespace = {'__name__': 'example'}
+        exec(self.out.getvalue(), namespace)
+        cls = namespace['Example']
+        assert cls.INPUTS == ('INFOO', 'INBAR', 'INBLAH')
+
+        calc = cls(INBAR=2, INBLAH=3, UNKNOWN=4)
+        assert not hasattr(calc, '__dict__')
+        assert (calc.INFOO, calc.INBAR, calc.INBLAH) == (1, 2, 3)
+        assert type(calc.INBAR) is namespace['BigDecimal']
+
+        calc.OUTBLAH = 5
+        calc.reset(INFOO=7)
+        assert (calc.INFOO, calc.INBAR, calc.INBLAH, calc.OUTBLAH) == (7, 0, 0, 0)
+
+        calc = cls.from_row((4, 5, 6))
+        assert (calc.INFOO, calc.INBAR, calc.INBLAH) == (4, 5, 6)
+        assert type(calc.INBAR) is namespace['BigDecimal']
+        assert calc.getOutbar() == cls().getOutbar()
@@ -0,0 +1,88 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+from lxml import etree
+import lstgen
+from lstgen import PapParser
+from lstgen.resultcache import ResultCache, CachedCalculator, canonical_inputs
+
+
+HERE = __file__
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(HERE), 'data/tariff_pap.xml')
+        with open(path, 'rb') as xml_file:
+            self.xml = xml_file.read()
+        self.parser = PapParser(etree.fromstring(self.xml))
+        self.cache_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.cache_dir, 'results.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_canonical_inputs(self):
+        names = ['RE4', 'ZKF', 'STKL']
+        assert canonical_inputs(names, dict(RE4='4000000.00', ZKF=Decimal('1.50'))) == \
+            canonical_inputs(names, dict(RE4=4000000, ZKF=1.5)) == (4000000, Decimal('1.5'), None)
+
+    def test_get_put(self):
+        cache = ResultCache(self.path, self.parser, size=16)
+        inputs = dict(RE4=4000000, STKL=1, LZZ=1)
+        assert cache.get(inputs) is None
+        assert cache.put(inputs, [Decimal('0'), Decimal('489000'), 0, Decimal('348000.00')])
+        outputs = cache.get(dict(RE4='4000000', STKL=1, LZZ=1))
+        assert [str(value) for value in outputs] == ['0', '489000', '0', '348000.00']
+        assert (cache.hits, cache.misses) == (1, 1)
+        # values not fitting into the slots are not stored
+        assert not cache.put(inputs, [Decimal('1E+200'), 0, 0, 0])
+        cache.close()
+        # shared with later instances, unless the PAP differs
+        cache = ResultCache(self.path, self.parser, size=16)
+        assert cache.get(inputs) is not None
+        self.parser.tree_root.set('name', 'Lohnsteuer2100')
+        assert ResultCache(self.path, self.parser, size=16).get(inputs) is None
+        # a different layout replaces the file
+        self.parser.tree_root.set('name', 'Lohnsteuer2099')
+        assert ResultCache(self.path, self.parser, size=32).get(inputs) is None
+
+    def test_eviction(self):
+        cache = ResultCache(self.path, self.parser, size=4, probes=4)
+        for re4 in range(6):
+            cache.put(dict(RE4=re4), [re4, 0, 0, 0])
+        assert os.path.getsize(self.path) == 32 + 4 * cache.slot_size
+        cache.get(dict(RE4=2))
+        cache.put(dict(RE4=6), [6, 0, 0, 0])
+        # the least recently used entries were replaced
+        assert [re4 for re4 in range(7) if cache.get(dict(RE4=re4))] == [2, 4, 5, 6]
+
+    def test_cached_calculator(self):
+        compute = lstgen.load_calculator(self.xml, mode='function', cache_dir=self.cache_dir)
+        calc = CachedCalculator(self.xml, self.path, size=64, cache_dir=self.cache_dir)
+        inputs = [dict(RE4=re4, STKL=stkl, LZZ=1) for re4 in (500000, 4000000)
+                  for stkl in (1, 3, 6)]
+        for _ in range(2):
+            for values in inputs:
+                assert calc(**values) == compute(**values)
+        assert (calc.cache.hits, calc.cache.misses) == (6, 6)
+        # hits are returned with the types of the calculator
+        miss = calc(RE4=123456, STKL=1, LZZ=1)
+        hit = calc(RE4=123456, STKL=1, LZZ=1)
+        assert type(hit) is type(miss)
+        assert [type(value) for value in hit] == [type(value) for value in miss]
+        assert hit.LSTLZZ.setScale(2, 'ROUND_DOWN') == miss.LSTLZZ
+        # results of other options are kept apart
+        calc = CachedCalculator(self.xml, self.path, size=64, numeric='fixed',
+                                cache_dir=self.cache_dir)
+        miss = calc(**inputs[0])
+        assert miss == compute(**inputs[0])
+        assert calc.cache.hits == 0
+        # plain Decimals in the fixed numeric mode
+        hit = calc(**inputs[0])
+        assert calc.cache.hits == 1
+        assert [type(value) for value in hit] == [type(value) for value in miss]
@@ -0,0 +1,70 @@
+# coding: utf-8
+import unittest
+from decimal import Decimal
+from lstgen.runtime import BigDecimal
+from lstgen.runtime import fixed
+
+
+class TestBigDecimal(unittest.TestCase):
+
+    def test_arithmetic_returns_bigdecimal(self):
+        a = BigDecimal('10.5')
+        b = BigDecimal(2)
+        for res in (a.add(b), a.subtract(b), a.multiply(b), a.divide(b)):
+            assert type(res) is BigDecimal
+        assert a.add(b) == Decimal('12.5')
+        assert a.subtract(b) == Decimal('8.5')
+        assert a.multiply(b) == Decimal('21.0')
+
+    def test_divide(self):
+        a = BigDecimal(10)
+        b = BigDecimal(3)
+        assert str(a.divide(b, 2, BigDecimal.ROUND_DOWN)) == '3.33'
+        assert str(a.divide(b, 2, BigDecimal.ROUND_UP)) == '3.34'
+        assert str(a.divide(b, 0, BigDecimal.ROUND_UP)) == '4'
+        self.assertRaises(ValueError, a.divide, b, 2.0, BigDecimal.ROUND_UP)
+
+    def test_set_scale(self):
+        a = BigDecimal('-1.2345')
+        assert str(a.setScale(2, BigDecimal.ROUND_DOWN)) == '-1.23'
+        assert str(a.setScale(2, BigDecimal.ROUND_UP)) == '-1.24'
+        assert str(a.setScale(6, BigDecimal.ROUND_UP)) == '-1.234500'
+
+    def test_value_of(self):
+        assert BigDecimal.valueOf(12) == 12
+        # same as java's BigDecimal.valueOf(double)
+        assert str(BigDecimal.valueOf(0.4)) == '0.4'
+        assert str(BigDecimal.valueOf(1e-05)) == '0.00001'
+
+    def test_compare_to(self):
+        a = BigDecimal(1)
+        for (other, expected) in ((0, 1), (1, 0), (2, -1)):
+            res = a.compareTo(BigDecimal(other))
+            assert type(res) is int
+            assert res == expected
+
+    def test_long_value(self):
+        assert BigDecimal('-12.9').longValue() == -12
+        assert BigDecimal('12.9').longValue() == 12
+
+
+class TestFixed(unittest.TestCase):
+
+    def test_division_rounding(self):
+        for (num, den, down, up) in ((7, 2, 3, 4), (-7, 2, -3, -4), (7, -2, -3, -4),
+                                     (-7, -2, 3, 4), (6, 2, 3, 3), (0, 5, 0, 0)):
+            assert fixed.div_down(num, den) == down
+            assert fixed.div_up(num, den) == up
+
+    def test_compare(self):
+        assert fixed.compare(10, 2) == 1
+        assert fixed.compare(2, 2) == 0
+        assert fixed.compare(-3, 2) == -1
+
+    def test_conversion(self):
+        assert fixed.to_fixed(12, 2) == 1200
+        assert fixed.to_fixed(0.1, 3) == 100
+        assert fixed.to_fixed('-1.25', 2) == -125
+        assert fixed.to_fixed(Decimal('1.5'), 1) == 15
+        self.assertRaises(ValueError, fixed.to_fixed, '1.255', 2)
+        assert str(fixed.from_fixed(-125, 2)) == '-1.25'
@@ -0,0 +1,63 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+import unittest
+from lxml import etree
+import lstgen
+from lstgen import PapParser, loader
+from lstgen.solver import GrossSolver, zone_boundaries
+
+
+HERE = __file__
+
+
+class TestSolver(unittest.TestCase):
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(HERE), 'data/tariff_pap.xml')
+        with open(path, 'rb') as xml_file:
+            self.xml = xml_file.read()
+        self.cache_dir = tempfile.mkdtemp()
+        self.solver = GrossSolver(self.xml, cache_dir=self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _net(self, gross, **inputs):
+        return self.solver.net(gross, self.solver.compute(RE4=gross, **inputs))
+
+    def test_zone_boundaries(self):
+        # GFB is assigned once, GFB.add(ZAHL1) counts as constant
+        parser = PapParser(etree.fromstring(self.xml))
+        assert zone_boundaries(parser) == [11605, 17006, 66761, 277826]
+
+    def test_solve(self):
+        for (target, inputs) in [(300000, dict(STKL=1, LZZ=2)),
+                                 (5000000, dict(STKL=3, LZZ=1)),
+                                 (50000000, dict(STKL=6, LZZ=1)),
+                                 (10000, dict(STKL=1, LZZ=4))]:
+            solution = self.solver.solve(target, **inputs)
+            assert solution.net >= target > self._net(solution.RE4 - 1, **inputs)
+            assert solution.net == self._net(solution.RE4, **inputs)
+            assert solution.evaluations < 25
+        os.environ[loader.CACHE_DIR_ENV] = self.cache_dir
+        try:
+            assert lstgen.solve_gross(self.xml, 0, STKL=1).RE4 == 0
+        finally:
+            del os.environ[loader.CACHE_DIR_ENV]
+
+    def test_solve_all(self):
+        inputs = dict(STKL=1, LZZ=2)
+        targets = [(target, inputs) for target in range(200000, 300000, 1000)]
+        solutions = list(self.solver.solve_all(targets))
+        for ((target, _), solution) in zip(targets, solutions):
+            assert solution.net >= target > self._net(solution.RE4 - 1, **inputs)
+        cold = sum(self.solver.solve(target, **inputs).evaluations for (target, _) in targets)
+        assert sum(solution.evaluations for solution in solutions) < cold
+
+    def test_custom_net(self):
+        solver = GrossSolver(self.xml, net=lambda gross, result: gross - result.LSTLZZ,
+                             cache_dir=self.cache_dir)
+        solution = solver.solve(300000, STKL=1, LZZ=2)
+        assert solution.net == solution.RE4 - solution.result.LSTLZZ >= 300000
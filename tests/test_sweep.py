@@ -0,0 +1,77 @@
+# coding: utf-8
+import os
+import unittest
+from lxml import etree
+from lstgen import PapParser
+from lstgen.engine import compile_pap
+from lstgen.sweep import Sweep, sweep
+
+
+HERE = __file__
+
+BRANCH_PAP = """
+<PAP name="Branch">
+<VARIABLES>
+    <INPUTS><INPUT name="A" type="int"/><INPUT name="B" type="int"/></INPUTS>
+    <OUTPUTS><OUTPUT name="Y" type="int" default="0"/></OUTPUTS>
+    <INTERNALS><INTERNAL name="T" type="int" default="0"/></INTERNALS>
+</VARIABLES>
+<CONSTANTS/>
+<METHODS>
+    <MAIN>
+        <EVAL exec="T = B * 2"/>
+        <IF expr="A &gt; 1">
+            <THEN><EXECUTE method="MSET"/></THEN>
+        </IF>
+        <EVAL exec="Y = Y + T"/>
+        <EVAL exec="T = B + 1"/>
+        <EVAL exec="Y = Y + T"/>
+    </MAIN>
+    <METHOD name="MSET">
+        <EVAL exec="Y = 100"/>
+    </METHOD>
+</METHODS>
+</PAP>
+"""
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self):
+        path = os.path.join(os.path.dirname(HERE), 'data/tariff_pap.xml')
+        with open(path, 'rb') as xml_file:
+            self.xml = xml_file.read()
+
+    def _parser(self, xml=None):
+        return PapParser(etree.fromstring(xml or self.xml))
+
+    def test_same_results(self):
+        compute = compile_pap(self._parser())
+        for (name, values, inputs) in [
+                ('RE4', range(0, 20000000, 99991), dict(STKL=3, LZZ=2, KRV=1)),
+                ('STKL', [1, 2, 3, 4, 5, 6], dict(RE4=4000000, LZZ=1)),
+                ('ZKF', [0, '0.5', 2], dict(RE4=6000000, STKL=1, LZZ=1, R=1)),
+        ]:
+            results = list(sweep(self._parser(), name, values, **inputs))
+            expected = [compute(**dict(inputs, **{name: value})) for value in values]
+            assert results == expected
+
+    def test_dependencies(self):
+        calc = Sweep(self._parser())
+        # parameters of the social insurances do not depend on the gross pay
+        assert 'BBGRV' not in calc.compiler.dependent
+        assert set(['ZRE4', 'ZVE', 'X', 'ST', 'LSTLZZ']) <= calc.compiler.dependent
+        list(calc.run([4000000], STKL=1, LZZ=1))
+        recorded = len(calc.compiler.trace)
+        assert recorded
+        assert [result.LSTLZZ for result in calc.run([4000000] * 5, STKL=1, LZZ=1)] == \
+            [489000] * 5
+        # the independent statements were executed for the first value only
+        assert len(calc.compiler.trace) == recorded
+
+    def test_branches(self):
+        # MSET is executed depending on A, T is assigned twice
+        compute = compile_pap(self._parser(BRANCH_PAP))
+        calc = Sweep(self._parser(BRANCH_PAP), 'A')
+        assert calc.compiler.dependent_methods == set(['MSET'])
+        assert list(calc.run([0, 2, 1, 5], B=3)) == [compute(A=a, B=3) for a in (0, 2, 1, 5)]
@@ -0,0 +1,115 @@
+# coding: utf-8
+import itertools
+import unittest
+from io import StringIO
+from lxml import etree
+from lstgen import PapParser
+from lstgen.generators.python import PythonGenerator
+from lstgen.generators.java import JavaGenerator
+from lstgen.generators.javascript import JavascriptGenerator
+from lstgen.generators.php import PhpGenerator
+from lstgen.generators.golang import GoLangGenerator
+
+
+SWITCH_PAP = """
+<PAP name="Switch">
+<VARIABLES>
+    <INPUTS><INPUT name="STKL" type="int"/><INPUT name="A" type="BigDecimal"/></INPUTS>
+    <OUTPUTS><OUTPUT name="K" type="int"/><OUTPUT name="L" type="int"/></OUTPUTS>
+</VARIABLES>
+<METHODS>
+    <MAIN>
+        <IF expr="STKL == 1 || 2 == STKL">
+            <THEN><EVAL exec="K = 10"/></THEN>
+            <ELSE>
+                <IF expr="STKL == 3">
+                    <THEN><EVAL exec="K = 30"/></THEN>
+                    <ELSE>
+                        <IF expr="STKL == 2 || STKL == 4">
+                            <THEN><EVAL exec="K = 40"/></THEN>
+                            <ELSE>
+                                <IF expr="A.compareTo(BigDecimal.ZERO) == 1">
+                                    <THEN><EVAL exec="K = 50"/></THEN>
+                                </IF>
+                            </ELSE>
+                        </IF>
+                    </ELSE>
+                </IF>
+            </ELSE>
+        </IF>
+        <IF expr="STKL == 1">
+            <THEN><EVAL exec="L = 1"/></THEN>
+            <ELSE>
+                <IF expr="STKL == 2">
+                    <THEN><EVAL exec="L = 2"/></THEN>
+                </IF>
+            </ELSE>
+        </IF>
+    </MAIN>
+</METHODS>
+</PAP>
+"""
+
+
+class TestSwitch(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = PapParser(etree.fromstring(SWITCH_PAP))
+
+    def _generate(self, cls, **options):
+        out = StringIO()
+        cls(self.parser, out, class_name='Switch', **options).generate()
+        return out.getvalue()
+
+    def test_java(self):
+        code = self._generate(JavaGenerator)
+        assert code.count('switch (this.STKL) {') == 1
+        for label in ('case 1:', 'case 2:', 'case 3:', 'case 4:', 'default:'):
+            assert code.count(label) == 1, label
+        assert 'if (this.A.compareTo(BigDecimal.ZERO) > 0) {' in code
+        # chains with less than switch_min_cases cases stay IFs
+        assert 'if (this.STKL == 2) {' in code
+
+    def test_other_languages(self):
+        code = self._generate(GoLangGenerator)
+        assert 'switch t.STKL {' in code
+        assert 'case 1, 2:' in code
+        assert 'break' not in code
+        assert '$this->STKL) {' in self._generate(PhpGenerator)
+        assert 'switch (Number(this.STKL)) {' in self._generate(JavascriptGenerator)
+
+    def test_python(self):
+        for (numeric, mode) in itertools.product(('decimal', 'fixed'), ('class', 'function')):
+            code = self._generate(PythonGenerator, numeric=numeric, mode=mode)
+            # the case functions are looked up by value
+            assert '_SWITCH1 = {1: _switch1_1, 2: _switch1_1, 3: _switch1_2, 4: _switch1_3}' in code
+            assert 'elif ' not in code
+            namespace = {'__name__': 'switch'}
+            exec(code, namespace)
+            for (stkl, a, expected) in [(1, 0, 10), (2, 0, 10), (3, 0, 30), (4, 0, 40),
+                                        (5, 1, 50), (5, 0, 0)]:
+                if mode == 'function':
+                    assert namespace['compute'](STKL=stkl, A=a).K == expected, stkl
+                    continue
+                calc = namespace['Switch'](STKL=stkl, A=a)
+                calc.MAIN()
+                assert calc.getK() == expected, stkl
+
+    def test_python_profile(self):
+        # profiles count every condition, the chain is written as if/elif/else
+        code = self._generate(PythonGenerator, profile=True)
+        assert '_SWITCH1' not in code
+        # the IF ending the chain becomes an elif as well
+        assert code.count('elif ') == 3
+
+    def test_size_literals(self):
+        # long literals like 3L are allowed in the compared values
+        self.parser = PapParser(etree.fromstring(SWITCH_PAP.replace('STKL == 3', 'STKL == 3L')))
+        assert 'case 3:' in self._generate(JavaGenerator)
+        code = self._generate(PythonGenerator)
+        assert '3: _switch1_2' in code
+        namespace = {'__name__': 'switch'}
+        exec(code, namespace)
+        calc = namespace['Switch'](STKL=3, A=0)
+        calc.MAIN()
+        assert calc.getK() == 30
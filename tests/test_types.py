@@ -0,0 +1,151 @@
+# coding: utf-8
+import ast
+import unittest
+from io import StringIO
+from lxml import etree
+from lstgen import PapParser
+from lstgen.analysis import TypeInference, DefiniteAssignment
+from lstgen.passes.source import parse_expr
+from lstgen.generators.python import PythonGenerator
+from lstgen.generators.javascript import JavascriptGenerator
+from lstgen.generators.php import PhpGenerator
+from lstgen.generators.golang import GoLangGenerator
+from lstgen.generators.java import JavaGenerator
+
+
+TYPES_PAP = """
+<PAP name="Types">
+<VARIABLES>
+    <INPUTS>
+        <INPUT name="A" type="BigDecimal"/>
+        <INPUT name="N" type="int"/>
+        <INPUT name="F" type="double"/>
+    </INPUTS>
+    <OUTPUTS><OUTPUT name="M" type="int"/></OUTPUTS>
+</VARIABLES>
+<CONSTANTS>
+    <CONSTANT name="ZAHL2" type="BigDecimal" value="new BigDecimal(2)"/>
+    <CONSTANT name="TAB" type="BigDecimal[]" value="{BigDecimal.valueOf (0), BigDecimal.valueOf (1)}"/>
+</CONSTANTS>
+<METHODS>
+    <MAIN>
+        <EVAL exec="M = N / 2"/>
+        <EVAL exec="A = A.multiply(BigDecimal.valueOf(N - 1))"/>
+    </MAIN>
+</METHODS>
+</PAP>
+"""
+
+
+class TestTypeInference(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = PapParser(etree.fromstring(TYPES_PAP))
+        self.types = TypeInference(self.parser)
+
+    def assert_type(self, source, expected):
+        assert self.types.type_of(parse_expr(source)) == expected, source
+
+    def test_type_of(self):
+        self.assert_type('A', 'BigDecimal')
+        self.assert_type('ZAHL2', 'BigDecimal')
+        self.assert_type('TAB[N - 1]', 'BigDecimal')
+        self.assert_type('BigDecimal.ZERO', 'BigDecimal')
+        self.assert_type('BigDecimal.ROUND_UP', 'int')
+        self.assert_type('A.add(ZAHL2).longValue()', 'int')
+        self.assert_type('N * 2 - 1', 'int')
+        self.assert_type('N / 2', 'int')
+        self.assert_type('-N', 'int')
+        self.assert_type('N * 0.5', 'double')
+        self.assert_type('F + 1', 'double')
+        self.assert_type('1.5', 'double')
+        self.assert_type('A.compareTo(ZAHL2)', 'int')
+        self.assert_type('new BigDecimal(F)', 'BigDecimal')
+        self.assert_type('UNKNOWN + 1', None)
+
+    def test_annotate(self):
+        node = self.types.annotate(parse_expr('A.multiply(BigDecimal.valueOf(N))'))
+        assert node.pap_type == 'BigDecimal'
+        assert node.args[0].args[0].pap_type == 'int'
+        assert isinstance(node.args[0].args[0], ast.Name)
+
+    def _generate(self, cls, **options):
+        out = StringIO()
+        cls(self.parser, out, class_name='Types', **options).generate()
+        return out.getvalue()
+
+    def test_integer_division(self):
+        python = self._generate(PythonGenerator)
+        assert 'self.M = idiv(self.N, 2)' in python
+        assert 'Math.trunc(' in self._generate(JavascriptGenerator)
+        assert 'intdiv($this->N, 2)' in self._generate(PhpGenerator)
+        # go's integer division truncates
+        assert 't.M = t.N / 2' in self._generate(GoLangGenerator)
+        # exact beyond the precision of floats, truncating like java
+        namespace = {'__name__': 'types'}
+        exec(python, namespace)
+        for (value, expected) in [(10 ** 17 + 3, 5 * 10 ** 16 + 1), (-7, -3), (7, 3)]:
+            calc = namespace['Types'](N=value)
+            calc.MAIN()
+            assert calc.getM() == expected
+
+    def test_go_constructor(self):
+        assert 'NewFromInt(t.N - 1)' in self._generate(GoLangGenerator)
+
+
+ASSIGN_PAP = """
+<PAP name="Assign">
+<VARIABLES>
+    <INPUTS><INPUT name="N" type="int"/></INPUTS>
+    <OUTPUTS><OUTPUT name="OUT" type="BigDecimal"/></OUTPUTS>
+    <INTERNALS>
+        <INTERNAL name="BOTH" type="BigDecimal"/>
+        <INTERNAL name="THEN" type="BigDecimal"/>
+        <INTERNAL name="LATE" type="BigDecimal"/>
+        <INTERNAL name="METHOD" type="int"/>
+        <INTERNAL name="UNUSED" type="int"/>
+    </INTERNALS>
+</VARIABLES>
+<METHODS>
+    <MAIN>
+        <EXECUTE method="MSET"/>
+        <IF expr="N == 1">
+            <THEN><EVAL exec="BOTH = BigDecimal.ONE"/><EVAL exec="THEN = BigDecimal.ONE"/></THEN>
+            <ELSE><EVAL exec="BOTH = BigDecimal.TEN"/></ELSE>
+        </IF>
+        <EVAL exec="OUT = BOTH.add(THEN).add(LATE).add(BigDecimal.valueOf(METHOD))"/>
+        <EVAL exec="LATE = OUT"/>
+    </MAIN>
+    <METHOD name="MSET"><EVAL exec="METHOD = N + 1"/></METHOD>
+</METHODS>
+</PAP>
+"""
+
+
+class TestDefiniteAssignment(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = PapParser(etree.fromstring(ASSIGN_PAP))
+
+    def test_assigned_before_read(self):
+        assigned = DefiniteAssignment(self.parser).assigned_before_read()
+        assert assigned == set(['BOTH', 'METHOD', 'UNUSED'])
+
+    def test_generators(self):
+        out = StringIO()
+        JavaGenerator(self.parser, out, class_name='Assign').generate()
+        java = out.getvalue()
+        assert 'protected BigDecimal BOTH;' in java
+        assert 'protected BigDecimal THEN = new BigDecimal(0);' in java
+        out = StringIO()
+        GoLangGenerator(self.parser, out, class_name='Assign').generate()
+        assert 'BOTH:' not in out.getvalue()
+        assert 'THEN:' in out.getvalue()
+        out = StringIO()
+        PythonGenerator(self.parser, out, class_name='Assign').generate()
+        namespace = {'__name__': 'assign'}
+        exec(out.getvalue(), namespace)
+        calc = namespace['Assign'](N=1)
+        calc.MAIN()
+        assert calc.getOut() == 4
+        assert not hasattr(namespace['Assign'](N=1), 'BOTH')
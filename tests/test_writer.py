@@ -1,6 +1,6 @@
 # coding: utf-8
 import unittest
-from lstgen.writers.base import Writer
+from lstgen.generators.base import Writer
 from io import StringIO
 from six import u
 